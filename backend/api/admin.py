@@ -1,3 +1,19 @@
 from django.contrib import admin
+from .models import IngestJob
 
-# Register your models here.
+@admin.register(IngestJob)
+class IngestJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "status",
+        "total_documents",
+        "processed_chunks",
+        "total_chunks",
+        "created_by",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status",)
+    exclude = ("documents",)
+    readonly_fields = ("result", "error")
+    date_hierarchy = "created_at"
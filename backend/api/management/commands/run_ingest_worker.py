@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from ragchat.config import RAGSettings
+from api.services.job_service import next_queued_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued ingest jobs from the database (INGEST_JOB_MODE=worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit")
+        parser.add_argument("--poll", type=float, default=2.0, help="Seconds between queue polls")
+        parser.add_argument(
+            "--stale-after", type=float, default=RAGSettings.ingest_job_stale_after,
+            help="Requeue running jobs with no progress for this many seconds (0 = never)",
+        )
+
+    def handle(self, *args, **options):
+        if options["stale_after"] > 0:
+            requeued = requeue_stale_jobs(options["stale_after"])
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale ingest job(s)")
+
+        self.stdout.write("Ingest worker started")
+        while True:
+            close_old_connections()
+            job_id = next_queued_job()
+            if job_id is not None:
+                self.stdout.write(f"Running ingest job {job_id}")
+                run_job(job_id, claimed=True)
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["poll"])
@@ -17,3 +17,53 @@ class ChatHistory(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.question[:50]}..."
+
+class IngestJob(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="ingest_jobs"
+    )
+    documents = models.JSONField(default=list, help_text="Input documents, cleared once the job finishes.")
+    total_documents = models.IntegerField(default=0)
+    total_chunks = models.IntegerField(default=0)
+    processed_chunks = models.IntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    @property
+    def throughput(self):
+        """Processed chunks per second while running / over the whole run."""
+        if not self.started_at:
+            return 0.0
+        from django.utils import timezone
+
+        end = self.finished_at or timezone.now()
+        seconds = (end - self.started_at).total_seconds()
+        return self.processed_chunks / seconds if seconds > 0 else 0.0
+
+    def __str__(self):
+        return f"IngestJob {self.pk} ({self.status}, {self.total_documents} docs)"
@@ -0,0 +1,189 @@
+import threading
+import time
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from ragchat.config import RAGSettings
+from ragchat.logger import logger
+from ..models import IngestJob
+from .rag_service import ingest_documents
+
+# progress is written at most this often, not once per upsert batch
+PROGRESS_INTERVAL_S = 1.0
+# a running job touches updated_at this many times per stale window
+HEARTBEATS_PER_STALE_WINDOW = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=RAGSettings.ingest_job_workers, thread_name_prefix="ingest-job"
+                )
+                _recover_jobs(executor)
+                _executor = executor
+    return _executor
+
+def _recover_jobs(executor: ThreadPoolExecutor) -> None:
+    """
+    Thread mode has no separate worker to pick up jobs a previous server
+    process left behind: requeue its stale running jobs and resubmit every
+    queued job (claim_job keeps a job from running twice).
+    """
+    try:
+        requeued = requeue_stale_jobs(RAGSettings.ingest_job_stale_after)
+        queued = list(
+            IngestJob.objects.filter(status=IngestJob.STATUS_QUEUED)
+            .order_by("created_at").values_list("pk", flat=True)
+        )
+        for job_id in queued:
+            executor.submit(_run_in_thread, job_id)
+        if requeued or queued:
+            logger.info(f"Recovered ingest jobs: {requeued} stale requeued, {len(queued)} queued resubmitted")
+    except Exception as e:
+        logger.error(f"Failed to recover ingest jobs: {e}")
+
+def start_job_runner() -> None:
+    """
+    Start the in-process runner (and recover old jobs) in thread mode; no-op
+    in worker mode. Called once at server startup (wsgi.py / asgi.py).
+    """
+    if RAGSettings.ingest_job_mode == "thread":
+        _get_executor()
+
+def should_run_async(documents: List[Dict[str, Any]]) -> bool:
+    """Large ingests (INGEST_ASYNC_MIN_CHARS of text or more) run as background jobs."""
+    return sum(len(doc.get("text") or "") for doc in documents) >= RAGSettings.ingest_async_min_chars
+
+def enqueue_ingest_job(documents: List[Dict[str, Any]], user=None) -> IngestJob:
+    """
+    Persist an ingest job and hand it to a runner.
+
+    - INGEST_JOB_MODE=thread : run in this process's background thread pool
+    - INGEST_JOB_MODE=worker : leave it queued for `manage.py run_ingest_worker`
+    """
+    job = IngestJob.objects.create(
+        documents=documents,
+        total_documents=len(documents),
+        created_by=user if getattr(user, "is_authenticated", False) else None,
+    )
+    if RAGSettings.ingest_job_mode == "thread":
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job.pk))
+    logger.info(f"Queued ingest job {job.pk} ({len(documents)} documents, mode={RAGSettings.ingest_job_mode})")
+    return job
+
+def _run_in_thread(job_id: int) -> None:
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+def claim_job(job_id: int) -> bool:
+    """Atomically move a queued job to running; False if someone else got it."""
+    return IngestJob.objects.filter(pk=job_id, status=IngestJob.STATUS_QUEUED).update(
+        status=IngestJob.STATUS_RUNNING, started_at=timezone.now(), updated_at=timezone.now()
+    ) == 1
+
+def next_queued_job() -> Optional[int]:
+    """Claim the oldest queued job, or None when the queue is empty."""
+    queued = IngestJob.objects.filter(status=IngestJob.STATUS_QUEUED).order_by("created_at")
+    for job_id in queued.values_list("pk", flat=True)[:10]:
+        if claim_job(job_id):
+            return job_id
+    return None
+
+def _heartbeat_interval() -> float:
+    return max(1.0, RAGSettings.ingest_job_stale_after / HEARTBEATS_PER_STALE_WINDOW)
+
+def _touch_job(job_id: int) -> None:
+    IngestJob.objects.filter(pk=job_id, status=IngestJob.STATUS_RUNNING).update(updated_at=timezone.now())
+
+def _heartbeat(job_id: int, stop: threading.Event, interval: float) -> None:
+    """
+    Keep updated_at fresh while the job runs, including phases that report
+    no progress (chunking, near-duplicate checks, existing-ID lookups), so
+    requeue_stale_jobs never hands a live job to another runner.
+    """
+    try:
+        while not stop.wait(interval):
+            try:
+                _touch_job(job_id)
+            except Exception as e:
+                logger.warning(f"Ingest job {job_id} heartbeat failed: {e}")
+    finally:
+        close_old_connections()
+
+def run_job(job_id: int, claimed: bool = False) -> None:
+    """Run one ingest job, recording progress, result and errors on its row."""
+    if not claimed and not claim_job(job_id):
+        return
+    _touch_job(job_id)
+    job = IngestJob.objects.get(pk=job_id)
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(job_id, stop, _heartbeat_interval()),
+        name=f"ingest-job-{job_id}-heartbeat", daemon=True,
+    )
+    heartbeat.start()
+    last_write = [0.0]
+
+    def progress(done: int, total: int) -> None:
+        now = time.monotonic()
+        if done < total and now - last_write[0] < PROGRESS_INTERVAL_S:
+            return
+        last_write[0] = now
+        IngestJob.objects.filter(pk=job_id).update(
+            processed_chunks=done, total_chunks=total, updated_at=timezone.now()
+        )
+
+    try:
+        result = ingest_documents(job.documents, progress=progress)
+        IngestJob.objects.filter(pk=job_id).update(
+            status=IngestJob.STATUS_SUCCEEDED,
+            result=result,
+            processed_chunks=result["embedded_chunks"],
+            total_chunks=result["embedded_chunks"],
+            documents=[],
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        logger.info(f"Ingest job {job_id} finished: {result['embedded_chunks']} chunks")
+    except Exception as e:
+        logger.error(f"Ingest job {job_id} failed: {e}")
+        IngestJob.objects.filter(pk=job_id).update(
+            status=IngestJob.STATUS_FAILED,
+            error=str(e),
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+    finally:
+        stop.set()
+        heartbeat.join()
+
+def requeue_stale_jobs(older_than_s: float) -> int:
+    """Put running jobs that stopped updating (crashed worker) back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=older_than_s)
+    return IngestJob.objects.filter(status=IngestJob.STATUS_RUNNING, updated_at__lt=cutoff).update(
+        status=IngestJob.STATUS_QUEUED, processed_chunks=0, updated_at=timezone.now()
+    )
+
+def job_status(job: IngestJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.pk,
+        "status": job.status,
+        "total_documents": job.total_documents,
+        "total_chunks": job.total_chunks,
+        "processed_chunks": job.processed_chunks,
+        "chunks_per_sec": round(job.throughput, 2),
+        "error": job.error or None,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "result": job.result,
+    }
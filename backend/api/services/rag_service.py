@@ -1,45 +1,215 @@
+import atexit
 import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
 from ragchat.config import RAGSettings
-from ragchat.core.embeddings import TextEmbedder
-from ragchat.storage.qdrant_index import QdrantIndex
-from ragchat.data.utils import normalize_arabic_text, make_hash_id
+from ragchat.core.registry import get_doc_store, get_embedder, get_index
+from ragchat.data.near_dedup import NearDuplicateIndex, index_path_for
+from ragchat.data.preprocessing import chunk_contexts
+from ragchat.data.utils import fit_token_budget, normalize_arabic_text, normalize_batch, make_hash_id
+from ragchat.logger import logger
 
+_near_index = None
+_near_index_lock = threading.Lock()
+# throttled saves: (last save time, unsaved additions)
+_near_save_state = {"saved_at": 0.0, "dirty": False}
+_near_save_lock = threading.Lock()
 
-def ingest_text_to_qdrant(text: str):
+def _near_index_path() -> str:
+    return index_path_for(RAGSettings.near_dup_index_path, RAGSettings.contexts_col)
+
+def get_near_duplicate_index():
+    """
+    Process-wide near-duplicate index of the contexts collection, loaded
+    from NEAR_DUP_INDEX_PATH (written by embed-contexts). None when
+    NEAR_DUP_THRESHOLD is 0.
     """
-    Clean, embed, hash, and upsert new text into Qdrant.
-    Uses SHA-256 as the stable unique ID for ingestion.
+    global _near_index
+    if RAGSettings.near_dup_threshold <= 0:
+        return None
+    if _near_index is None:
+        with _near_index_lock:
+            if _near_index is None:
+                _near_index = NearDuplicateIndex.load_or_create(
+                    _near_index_path(), threshold=RAGSettings.near_dup_threshold
+                )
+    return _near_index
+
+def save_near_duplicate_index(force: bool = False) -> None:
+    """
+    Persist the near-duplicate index at most every NEAR_DUP_SAVE_INTERVAL
+    seconds (force=True saves now, e.g. after a bulk ingest). Saves merge
+    what other worker processes wrote, so none of them loses signatures.
     """
+    if _near_index is None:
+        return
+    with _near_save_lock:
+        _near_save_state["dirty"] = True
+        now = time.monotonic()
+        if not force and now - _near_save_state["saved_at"] < RAGSettings.near_dup_save_interval:
+            return
+        try:
+            _near_index.save(_near_index_path())
+            _near_save_state.update(saved_at=now, dirty=False)
+        except Exception as e:
+            logger.error(f"Failed to save near-duplicate index: {e}")
 
-    if not text or not text.strip():
-        return {"status": "error", "message": "Empty text."}
+@atexit.register
+def _flush_near_duplicate_index() -> None:
+    if _near_save_state["dirty"]:
+        save_near_duplicate_index(force=True)
 
-    clean = normalize_arabic_text(text)
-    uid = make_hash_id(clean)
 
-    embedder = TextEmbedder(RAGSettings.emb_model)
-    vector = embedder.embed_text(clean)
+def ingest_text_to_qdrant(text: str):
+    """
+    Ingest one text through the same chunked path as bulk ingestion
+    (ingest_documents) and answer in the single-text response shape:
+    - ok        : inserted_id (document hash), chunk_ids, skipped duplicates
+    - duplicate : every chunk is a near-duplicate of stored chunks
+    - error     : empty text
+    """
+    clean = normalize_arabic_text(text or "")
+    result = ingest_documents([{"text": clean, "source": "user_ingest"}])
+    doc = result["documents"][0]
+    if doc["status"] != "ok":
+        return {"status": "error", "message": doc.get("message", "Ingest failed.")}
 
-    payload = {
-        "id": uid,
-        "context_text": clean,
-        "raw_context": clean,
-        "source": "user_ingest",
-        "hash": uid,
+    if not doc["chunk_ids"] and doc["duplicates"]:
+        first = doc["duplicates"][0]
+        return {
+            "status": "duplicate",
+            "duplicate_of": first["duplicate_of"],
+            "similarity": first["similarity"],
+            "duplicates": doc["duplicates"],
+            "text": clean,
+        }
+    return {
+        "status": "ok",
+        "inserted_id": doc["doc_id"],
+        "chunk_ids": doc["chunk_ids"],
+        "chunks": len(doc["chunk_ids"]),
+        "duplicates": doc["duplicates"],
+        "text": clean,
     }
 
-    index = QdrantIndex(RAGSettings.qdrant_url, RAGSettings.qdrant_api_key)
 
-    # Insert (or overwrite) hashed ID
-    index.upsert(
-        name=RAGSettings.contexts_col,
-        vectors=[vector],
-        payloads=[payload],
-        start_id=None
-    )
+def ingest_documents(
+    documents: List[Dict[str, Any]],
+    batch_size: int = 32,
+    upsert_batch_size: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+):
+    """
+    Bulk ingestion of many documents ({"text": ..., optional "id" / "source"}):
+    - normalize and chunk with the offline pipeline's normalizer / chunker
+    - drop repeated chunks and near-duplicates (of earlier ingests and
+      within this request) before embedding
+    - embed in batches and upsert in large batches
+    - progress(done_chunks, total_chunks) is called after each upsert
+    Returns per-document chunk IDs.
+    """
+    started = time.perf_counter()
+    upsert_batch_size = upsert_batch_size or RAGSettings.ingest_upsert_batch
+    embedder = get_embedder(RAGSettings.emb_model)
+    index = get_index(RAGSettings.qdrant_url, RAGSettings.qdrant_api_key)
+
+    texts = normalize_batch([(doc.get("text") or "") for doc in documents])
+    tokenizer, max_tokens = None, RAGSettings.ingest_max_tokens
+    if max_tokens > 0:
+        tokenizer = embedder.tokenizer
+        max_tokens = fit_token_budget(max_tokens, tokenizer, embedder.max_seq_length)
+    chunk_lists = chunk_contexts(texts, RAGSettings.ingest_group_size, tokenizer, max_tokens)
+
+    near_index = get_near_duplicate_index()
+    request_index = NearDuplicateIndex(threshold=near_index.threshold) if near_index is not None else None
+
+    results: List[Dict[str, Any]] = []
+    docs, chunk_texts, payloads = [], [], []
+    planned = set()
+    for i, (doc, text, chunks) in enumerate(zip(documents, texts, chunk_lists)):
+        result: Dict[str, Any] = {"index": i, "chunk_ids": [], "duplicates": []}
+        if doc.get("id") is not None:
+            result["id"] = doc["id"]
+        if not text.strip():
+            result.update(status="error", message="Empty text.")
+            results.append(result)
+            continue
+
+        doc_id = make_hash_id(text)
+        source = doc.get("source") or "user_ingest"
+        result.update(status="ok", doc_id=doc_id)
+        docs.append((doc_id, text, source))
+
+        for j, chunk in enumerate(chunks):
+            uid = make_hash_id(chunk)
+            if uid in planned:
+                result["chunk_ids"].append(uid)
+                continue
+            if near_index is not None:
+                # a match on its own uid is the same text, not a near-duplicate;
+                # whether it is stored is checked against the collection below
+                match = near_index.query(chunk)
+                if match is None or match[0] == uid:
+                    match = request_index.check_and_add(uid, chunk)
+                if match is not None:
+                    result["duplicates"].append(
+                        {"chunk_index": j, "duplicate_of": match[0], "similarity": round(match[1], 3)}
+                    )
+                    continue
 
+            planned.add(uid)
+            result["chunk_ids"].append(uid)
+            chunk_texts.append(chunk)
+            payload = {
+                "id": uid,
+                "doc_id": doc_id,
+                "chunk_index": j,
+                "context_text": chunk,
+                "source": source,
+                "hash": uid,
+            }
+            if not RAGSettings.doc_store_path:
+                payload["raw_context"] = text
+            payloads.append(payload)
+        results.append(result)
+
+    if RAGSettings.doc_store_path and docs:
+        get_doc_store(RAGSettings.doc_store_path).put_documents(docs)
+
+    # chunks already in the collection (re-ingested text) are not embedded again
+    stored = index.existing_ids(RAGSettings.contexts_col, [p["id"] for p in payloads]) if payloads else set()
+    if stored:
+        kept = [k for k, p in enumerate(payloads) if p["id"] not in stored]
+        chunk_texts = [chunk_texts[k] for k in kept]
+        payloads = [payloads[k] for k in kept]
+
+    total = len(chunk_texts)
+    for start in range(0, total, upsert_batch_size):
+        batch_texts = chunk_texts[start:start + upsert_batch_size]
+        vectors = embedder.embed_batch(batch_texts, batch_size=batch_size)
+        index.upsert(
+            name=RAGSettings.contexts_col,
+            vectors=vectors,
+            payloads=payloads[start:start + upsert_batch_size],
+            start_id=None
+        )
+        if near_index is not None:
+            for payload, chunk in zip(payloads[start:start + upsert_batch_size], batch_texts):
+                near_index.add(payload["id"], chunk)
+        if progress is not None:
+            progress(min(start + upsert_batch_size, total), total)
+
+    if near_index is not None and total:
+        save_near_duplicate_index(force=True)
+
+    seconds = time.perf_counter() - started
+    logger.info(
+        f"Bulk ingest: {len(documents)} documents, {total} chunks embedded in {seconds:.1f}s"
+    )
     return {
         "status": "ok",
-        "inserted_id": uid,
-        "text": clean
+        "documents": results,
+        "embedded_chunks": total,
+        "seconds": round(seconds, 3),
     }
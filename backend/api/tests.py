@@ -1,3 +1,367 @@
+import threading
+import time
+import json
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from ragchat.config import RAGSettings
+from .models import IngestJob
+from .services import job_service, rag_service
 
-# Create your tests here.
+DOCUMENTS = [{"text": "نص تجريبي", "source": "test"}]
+
+def _result(chunks: int) -> dict:
+    return {"documents": [], "total_documents": 1, "embedded_chunks": chunks}
+
+class IngestJobQueueTests(TestCase):
+    def test_enqueue_in_worker_mode_leaves_job_queued(self):
+        with mock.patch.object(RAGSettings, "ingest_job_mode", "worker"), \
+                mock.patch.object(job_service, "_get_executor") as get_executor:
+            job = job_service.enqueue_ingest_job(DOCUMENTS)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestJob.STATUS_QUEUED)
+        self.assertEqual(job.total_documents, 1)
+        self.assertEqual(job.documents, DOCUMENTS)
+        get_executor.assert_not_called()
+
+    def test_enqueue_in_thread_mode_submits_after_commit(self):
+        executor = mock.Mock()
+        with mock.patch.object(RAGSettings, "ingest_job_mode", "thread"), \
+                mock.patch.object(job_service, "_get_executor", return_value=executor):
+            with self.captureOnCommitCallbacks(execute=True):
+                job = job_service.enqueue_ingest_job(DOCUMENTS)
+                executor.submit.assert_not_called()
+
+        executor.submit.assert_called_once_with(job_service._run_in_thread, job.pk)
+
+    def test_claim_is_atomic(self):
+        job = IngestJob.objects.create(documents=DOCUMENTS, total_documents=1)
+
+        self.assertTrue(job_service.claim_job(job.pk))
+        self.assertFalse(job_service.claim_job(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestJob.STATUS_RUNNING)
+        self.assertIsNotNone(job.started_at)
+
+    def test_next_queued_job_claims_oldest_first(self):
+        first = IngestJob.objects.create(documents=DOCUMENTS, total_documents=1)
+        second = IngestJob.objects.create(documents=DOCUMENTS, total_documents=1)
+
+        self.assertEqual(job_service.next_queued_job(), first.pk)
+        self.assertEqual(job_service.next_queued_job(), second.pk)
+        self.assertIsNone(job_service.next_queued_job())
+
+    def test_run_job_records_progress_and_result(self):
+        job = IngestJob.objects.create(documents=DOCUMENTS, total_documents=1)
+        seen = []
+
+        def fake_ingest(documents, progress=None):
+            self.assertEqual(documents, DOCUMENTS)
+            progress(4, 10)
+            row = IngestJob.objects.get(pk=job.pk)
+            seen.append((row.status, row.processed_chunks, row.total_chunks))
+            progress(10, 10)
+            return _result(10)
+
+        with mock.patch.object(job_service, "ingest_documents", side_effect=fake_ingest):
+            job_service.run_job(job.pk)
+
+        self.assertEqual(seen, [(IngestJob.STATUS_RUNNING, 4, 10)])
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.processed_chunks, 10)
+        self.assertEqual(job.result["embedded_chunks"], 10)
+        self.assertEqual(job.documents, [])
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(job_service.job_status(job)["status"], IngestJob.STATUS_SUCCEEDED)
+
+    def test_run_job_heartbeats_before_first_progress(self):
+        job = IngestJob.objects.create(documents=DOCUMENTS, total_documents=1)
+        touched = threading.Event()
+
+        def touch_job(job_id):
+            if threading.current_thread() is not threading.main_thread():
+                touched.set()
+
+        def slow_pre_phase(documents, progress=None):
+            # chunking / dedup: no progress() call until the first upsert
+            self.assertTrue(touched.wait(5))
+            return _result(0)
+
+        with mock.patch.object(job_service, "_heartbeat_interval", return_value=0.01), \
+                mock.patch.object(job_service, "_touch_job", side_effect=touch_job) as touch, \
+                mock.patch.object(job_service, "ingest_documents", side_effect=slow_pre_phase):
+            job_service.run_job(job.pk)
+            calls = touch.call_count
+            time.sleep(0.05)
+            # the heartbeat stops with the job
+            self.assertEqual(touch.call_count, calls)
+
+        self.assertGreaterEqual(calls, 2)
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestJob.STATUS_SUCCEEDED)
+
+    def test_run_job_records_failure(self):
+        job = IngestJob.objects.create(documents=DOCUMENTS, total_documents=1)
+
+        with mock.patch.object(job_service, "ingest_documents", side_effect=RuntimeError("qdrant down")):
+            job_service.run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestJob.STATUS_FAILED)
+        self.assertEqual(job.error, "qdrant down")
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(job.documents, DOCUMENTS)
+
+    def test_run_job_skips_job_claimed_elsewhere(self):
+        job = IngestJob.objects.create(documents=DOCUMENTS, total_documents=1)
+        job_service.claim_job(job.pk)
+
+        with mock.patch.object(job_service, "ingest_documents") as ingest:
+            job_service.run_job(job.pk)
+
+        ingest.assert_not_called()
+
+    def test_requeue_stale_jobs(self):
+        stale = IngestJob.objects.create(documents=DOCUMENTS, total_documents=1)
+        fresh = IngestJob.objects.create(documents=DOCUMENTS, total_documents=1)
+        for job in (stale, fresh):
+            job_service.claim_job(job.pk)
+        # .update() bypasses auto_now, so the old timestamp sticks
+        IngestJob.objects.filter(pk=stale.pk).update(
+            processed_chunks=7, updated_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(job_service.requeue_stale_jobs(600), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.status, IngestJob.STATUS_QUEUED)
+        self.assertEqual(stale.processed_chunks, 0)
+        self.assertEqual(fresh.status, IngestJob.STATUS_RUNNING)
+
+    def test_thread_runner_recovers_stale_and_queued_jobs(self):
+        stale = IngestJob.objects.create(documents=DOCUMENTS, total_documents=1)
+        queued = IngestJob.objects.create(documents=DOCUMENTS, total_documents=1)
+        job_service.claim_job(stale.pk)
+        IngestJob.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        executor = mock.Mock()
+
+        job_service._recover_jobs(executor)
+
+        submitted = [c.args for c in executor.submit.call_args_list]
+        self.assertEqual(
+            sorted(submitted), sorted([(job_service._run_in_thread, stale.pk), (job_service._run_in_thread, queued.pk)])
+        )
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, IngestJob.STATUS_QUEUED)
+
+    def test_should_run_async(self):
+        with mock.patch.object(RAGSettings, "ingest_async_min_chars", 10):
+            self.assertFalse(job_service.should_run_async([{"text": "short"}]))
+            self.assertTrue(job_service.should_run_async([{"text": "short"}, {"text": "enough"}]))
+
+class IngestEndpointTests(TestCase):
+    def setUp(self):
+        staff = get_user_model().objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_login(staff)
+
+    def _post(self, text, query=""):
+        return self.client.post(
+            f"/api/ingest-api/{query}", data=json.dumps({"text": text}), content_type="application/json"
+        )
+
+    def test_large_text_is_ingested_synchronously_by_default(self):
+        from . import views
+
+        text = "نص " * 20000
+        with mock.patch.object(views, "ingest_text_to_qdrant", return_value={"status": "ok"}) as ingest, \
+                mock.patch.object(views, "enqueue_ingest_job") as enqueue:
+            res = self._post(text)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {"status": "ok"})
+        ingest.assert_called_once_with(text.strip())
+        enqueue.assert_not_called()
+
+    def test_async_opt_in_queues_a_job(self):
+        from . import views
+
+        job = IngestJob.objects.create(documents=DOCUMENTS, total_documents=1)
+        with mock.patch.object(views, "ingest_text_to_qdrant") as ingest, \
+                mock.patch.object(views, "enqueue_ingest_job", return_value=job) as enqueue:
+            res = self._post("نص قصير", query="?async=1")
+
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(res.json()["job_id"], job.pk)
+        self.assertEqual(enqueue.call_args.args[0], [{"text": "نص قصير", "source": "user_ingest"}])
+        ingest.assert_not_called()
+
+class IngestTextTests(TestCase):
+    def _ingest(self, document_result):
+        result = {"status": "ok", "documents": [document_result], "embedded_chunks": 0, "seconds": 0.0}
+        with mock.patch.object(rag_service, "ingest_documents", return_value=result) as ingest:
+            response = rag_service.ingest_text_to_qdrant("  ذَهَبَ   الطالب  ")
+        return response, ingest
+
+    def test_uses_the_chunked_bulk_path(self):
+        response, ingest = self._ingest(
+            {"index": 0, "status": "ok", "doc_id": "d1", "chunk_ids": ["c1", "c2"], "duplicates": []}
+        )
+
+        ingest.assert_called_once_with([{"text": "ذهب الطالب", "source": "user_ingest"}])
+        self.assertEqual(response["status"], "ok")
+        self.assertEqual(response["inserted_id"], "d1")
+        self.assertEqual(response["chunk_ids"], ["c1", "c2"])
+        self.assertEqual(response["chunks"], 2)
+        self.assertEqual(response["text"], "ذهب الطالب")
+
+    def test_all_chunks_near_duplicate(self):
+        duplicate = {"chunk_index": 0, "duplicate_of": "old", "similarity": 0.93}
+        response, _ = self._ingest(
+            {"index": 0, "status": "ok", "doc_id": "d1", "chunk_ids": [], "duplicates": [duplicate]}
+        )
+
+        self.assertEqual(response["status"], "duplicate")
+        self.assertEqual(response["duplicate_of"], "old")
+        self.assertEqual(response["similarity"], 0.93)
+
+    def test_empty_text(self):
+        response, _ = self._ingest({"index": 0, "status": "error", "message": "Empty text.", "chunk_ids": []})
+
+        self.assertEqual(response, {"status": "error", "message": "Empty text."})
+
+class BulkIngestEndpointTests(TestCase):
+    def setUp(self):
+        staff = get_user_model().objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_login(staff)
+
+    def _post(self, data, content_type="application/json", query=""):
+        from . import views
+
+        with mock.patch.object(views, "ingest_documents", return_value={"status": "ok"}) as ingest, \
+                mock.patch.object(views, "should_run_async", return_value=False):
+            res = self.client.post(f"/api/ingest-bulk/{query}", data=data, content_type=content_type)
+        return res, ingest
+
+    def test_json_list_and_documents_object(self):
+        for body in (["نص أول", {"text": "نص ثان", "id": 7}], {"documents": ["نص أول", {"text": "نص ثان", "id": 7}]}):
+            res, ingest = self._post(json.dumps(body))
+
+            self.assertEqual(res.status_code, 200)
+            ingest.assert_called_once_with([{"text": "نص أول"}, {"text": "نص ثان", "id": 7}])
+
+    def test_ndjson_and_plain_text(self):
+        res, ingest = self._post('"نص أول"\n\n{"text": "نص ثان"}\n', content_type="application/x-ndjson")
+        self.assertEqual(res.status_code, 200)
+        ingest.assert_called_once_with([{"text": "نص أول"}, {"text": "نص ثان"}])
+
+        res, ingest = self._post("سطر أول\nسطر ثان", content_type="text/plain")
+        self.assertEqual(res.status_code, 200)
+        ingest.assert_called_once_with([{"text": "سطر أول\nسطر ثان"}])
+
+    def test_multipart_upload(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from . import views
+
+        files = [
+            SimpleUploadedFile("a.jsonl", '{"text": "من jsonl"}\n"سطر"\n'.encode("utf-8")),
+            SimpleUploadedFile("b.json", json.dumps({"documents": ["من json"]}).encode("utf-8")),
+            SimpleUploadedFile("c.txt", "ملف نصي".encode("utf-8")),
+        ]
+        with mock.patch.object(views, "ingest_documents", return_value={"status": "ok"}) as ingest, \
+                mock.patch.object(views, "should_run_async", return_value=False):
+            res = self.client.post("/api/ingest-bulk/", data={"files": files})
+
+        self.assertEqual(res.status_code, 200)
+        ingest.assert_called_once_with(
+            [{"text": "من jsonl"}, {"text": "سطر"}, {"text": "من json"}, {"text": "ملف نصي", "id": "c.txt"}]
+        )
+
+    def test_invalid_bodies_are_rejected(self):
+        for body in ('"نص"', '{"documents": "نص"}', "42", "null", "[1, 2]", "{not json", "[]"):
+            res, ingest = self._post(body)
+
+            self.assertEqual(res.status_code, 400, body)
+            ingest.assert_not_called()
+
+    def test_async_modes(self):
+        from . import views
+
+        job = IngestJob.objects.create(documents=DOCUMENTS, total_documents=1)
+        body = json.dumps(["نص"])
+        with mock.patch.object(views, "enqueue_ingest_job", return_value=job) as enqueue, \
+                mock.patch.object(views, "ingest_documents", return_value={"status": "ok"}) as ingest, \
+                mock.patch.object(views, "should_run_async", return_value=True):
+            queued = self.client.post("/api/ingest-bulk/", data=body, content_type="application/json")
+            forced = self.client.post("/api/ingest-bulk/?async=0", data=body, content_type="application/json")
+
+        self.assertEqual(queued.status_code, 202)
+        self.assertEqual(queued.json()["status_url"], f"/api/ingest-jobs/{job.pk}/")
+        self.assertEqual(enqueue.call_count, 1)
+        self.assertEqual(forced.status_code, 200)
+        ingest.assert_called_once_with([{"text": "نص"}])
+
+        res, _ = self._post(body, query="?async=yes")
+        self.assertEqual(res.status_code, 202)
+
+    def test_requires_post(self):
+        self.assertEqual(self.client.get("/api/ingest-bulk/").status_code, 405)
+
+class FakeEmbedder:
+    def embed_batch(self, texts, batch_size=32):
+        return [[float(len(t)), 1.0] for t in texts]
+
+class FakeIndex:
+    def __init__(self, stored=()):
+        self.stored = set(stored)
+        self.upserts = []
+
+    def existing_ids(self, name, ids):
+        return self.stored.intersection(ids)
+
+    def upsert(self, name, vectors, payloads, start_id=None):
+        self.upserts.append((name, vectors, payloads))
+
+class IngestDocumentsTests(TestCase):
+    def _ingest(self, documents, index=None, **kwargs):
+        index = index or FakeIndex()
+        with mock.patch.object(rag_service, "get_embedder", return_value=FakeEmbedder()), \
+                mock.patch.object(rag_service, "get_index", return_value=index), \
+                mock.patch.object(rag_service, "get_near_duplicate_index", return_value=None), \
+                mock.patch.object(RAGSettings, "doc_store_path", ""), \
+                mock.patch.object(RAGSettings, "ingest_max_tokens", 0), \
+                mock.patch.object(RAGSettings, "ingest_group_size", 1):
+            return rag_service.ingest_documents(documents, **kwargs), index
+
+    def test_chunks_each_document_and_embeds_repeats_once(self):
+        progress = []
+        result, index = self._ingest(
+            [{"text": "جملة أولى. جملة ثانية", "id": "a"}, {"text": "  "}, {"text": "جملة ثانية. جملة ثالثة"}],
+            upsert_batch_size=2,
+            progress=lambda done, total: progress.append((done, total)),
+        )
+
+        first, empty, third = result["documents"]
+        self.assertEqual((first["id"], first["status"], len(first["chunk_ids"])), ("a", "ok", 2))
+        self.assertEqual(empty["status"], "error")
+        # "جملة ثانية" is shared: referenced by both documents, embedded once
+        self.assertEqual(third["chunk_ids"][0], first["chunk_ids"][1])
+        self.assertEqual(result["embedded_chunks"], 3)
+        self.assertEqual([len(payloads) for _, _, payloads in index.upserts], [2, 1])
+        self.assertEqual(progress, [(2, 3), (3, 3)])
+        payload = index.upserts[0][2][0]
+        self.assertEqual(payload["raw_context"], "جملة أولى. جملة ثانية")
+        self.assertEqual(payload["doc_id"], first["doc_id"])
+
+    def test_chunks_already_stored_are_not_embedded_again(self):
+        result, _ = self._ingest([{"text": "جملة أولى. جملة ثانية"}])
+        stored = result["documents"][0]["chunk_ids"][:1]
+
+        again, index = self._ingest([{"text": "جملة أولى. جملة ثانية"}], index=FakeIndex(stored))
+
+        self.assertEqual(again["documents"][0]["chunk_ids"], result["documents"][0]["chunk_ids"])
+        self.assertEqual(again["embedded_chunks"], 1)
+        self.assertEqual([p["context_text"] for p in index.upserts[0][2]], ["جملة ثانية"])
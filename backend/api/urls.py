@@ -12,5 +12,7 @@ urlpatterns = [
     path('chat-history/', views.chat_history, name='chat_history'),
     path('clear-chat-history/', views.clear_chat_history, name='clear_chat_history'),
     path("ingest-api/", views.ingest),
+    path("ingest-bulk/", views.ingest_bulk),
+    path("ingest-jobs/<int:job_id>/", views.ingest_job),
     path("evaluate/", views.evaluate),
 ]
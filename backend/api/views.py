@@ -3,26 +3,29 @@ import time
 from analytics.services import log_chat_event
 from django.http import JsonResponse
 from ragchat.core.pipeline import RagPipeline
-from ragchat.core.embeddings import TextEmbedder
-from ragchat.core.retriever import Retriever
-from ragchat.core.generator import Generator
-from ragchat.storage.qdrant_index import QdrantIndex
+from ragchat.core.retriever import Retriever, SOURCE_FIELDS
+from ragchat.core.registry import get_embedder, get_generator, get_index, warmup
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.admin.views.decorators import staff_member_required
 from ragchat.config import RAGSettings
 from ragchat.logger import logger
 import json
-from .services.rag_service import ingest_text_to_qdrant
+from .services.rag_service import ingest_text_to_qdrant, ingest_documents
 from .services.eval_service import evaluate_prediction
+from .services.job_service import enqueue_ingest_job, job_status, should_run_async
 from django.contrib.auth.decorators import login_required
-from .models import ChatHistory
+from .models import ChatHistory, IngestJob
 
 try:
-    embedder = TextEmbedder(RAGSettings.emb_model)
-    index = QdrantIndex(RAGSettings.qdrant_url, RAGSettings.qdrant_api_key)
-    retriever = Retriever(embedder, index, RAGSettings.contexts_col, RAGSettings.top_k)
-    generator = Generator(RAGSettings.gen_model)
+    embedder = get_embedder(RAGSettings.emb_model)
+    index = get_index(RAGSettings.qdrant_url, RAGSettings.qdrant_api_key)
+    # chat history keeps the source question / answer of each chunk, not the raw context
+    retriever = Retriever(
+        embedder, index, RAGSettings.contexts_col, RAGSettings.top_k, payload_fields=SOURCE_FIELDS
+    )
+    generator = get_generator(RAGSettings.gen_model)
     pipeline = RagPipeline(embedder, retriever, generator, RAGSettings.top_k)
+    warmup()
 except Exception as e:
     pipeline = None
     logger.error(f"Failed to initialize RAG pipeline: {e}")
@@ -118,6 +121,11 @@ def ask(request):
 @csrf_exempt
 @staff_member_required
 def ingest(request):
+    """
+    Chunk, embed and store one text (same chunker as /api/ingest-bulk/) and
+    answer synchronously. With ?async=1 the text is queued as an IngestJob
+    instead and the response (202) carries the job ID to poll.
+    """
     if request.method != "POST":
         return JsonResponse({"error": "POST required"}, status=405)
 
@@ -128,12 +136,117 @@ def ingest(request):
         if not text:
             return JsonResponse({"error": "Text is required"}, status=400)
 
+        if request.GET.get("async") in ASYNC_TRUE:
+            documents = [{"text": text, "source": "user_ingest"}]
+            return _queued_response(enqueue_ingest_job(documents, user=request.user))
+
         result = ingest_text_to_qdrant(text)
         return JsonResponse(result, status=200)
 
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
+ASYNC_TRUE = ("1", "true", "yes")
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+
+def _queued_response(job: IngestJob) -> JsonResponse:
+    return JsonResponse(
+        {"job_id": job.pk, "status": job.status, "status_url": f"/api/ingest-jobs/{job.pk}/"},
+        status=202,
+    )
+
+def _documents_from_items(items) -> list:
+    """Accept plain strings or {"text": ...} objects."""
+    docs = []
+    for item in items:
+        if isinstance(item, str):
+            docs.append({"text": item})
+        elif isinstance(item, dict) and isinstance(item.get("text"), str):
+            docs.append(item)
+        else:
+            raise ValueError("Each document must be a string or an object with a 'text' field.")
+    return docs
+
+def _documents_from_json(body) -> list:
+    """A JSON list of documents, or {"documents": [...]}; anything else is invalid."""
+    if isinstance(body, dict):
+        body = body.get("documents")
+    if not isinstance(body, list):
+        raise ValueError("Expected a list of documents or an object with a 'documents' list.")
+    return _documents_from_items(body)
+
+def _parse_ndjson(raw: str) -> list:
+    return _documents_from_items(json.loads(line) for line in raw.splitlines() if line.strip())
+
+def _documents_from_request(request) -> list:
+    """
+    Documents of a bulk ingest request:
+    - JSON body: a list, or {"documents": [...]}
+    - NDJSON body: one document per line
+    - text/plain body: one document
+    - multipart upload: .jsonl/.ndjson files (one document per line),
+      .json files (as a JSON body), any other file is one document
+    """
+    if request.FILES:
+        docs = []
+        for f in request.FILES.getlist("files") or list(request.FILES.values()):
+            raw = f.read().decode("utf-8")
+            name = f.name.lower()
+            if name.endswith((".jsonl", ".ndjson")):
+                docs.extend(_parse_ndjson(raw))
+            elif name.endswith(".json"):
+                docs.extend(_documents_from_json(json.loads(raw)))
+            else:
+                docs.append({"text": raw, "id": f.name})
+        return docs
+
+    raw = request.body.decode("utf-8")
+    if request.content_type in NDJSON_TYPES:
+        return _parse_ndjson(raw)
+    if request.content_type == "text/plain":
+        return [{"text": raw}]
+
+    return _documents_from_json(json.loads(raw))
+
+@csrf_exempt
+@staff_member_required
+def ingest_bulk(request):
+    """
+    Chunk, embed and store many documents in one request; returns chunk IDs
+    per document. Large requests (INGEST_ASYNC_MIN_CHARS) and ?async=1 are
+    queued as an IngestJob and the response (202) only carries the job ID
+    to poll; ?async=0 forces a synchronous ingest.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+
+    try:
+        documents = _documents_from_request(request)
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({"error": f"Invalid documents: {e}"}, status=400)
+
+    if not documents:
+        return JsonResponse({"error": "No documents provided"}, status=400)
+
+    try:
+        mode = request.GET.get("async")
+        if mode in ASYNC_TRUE or (mode not in ("0", "false", "no") and should_run_async(documents)):
+            return _queued_response(enqueue_ingest_job(documents, user=request.user))
+        result = ingest_documents(documents)
+        return JsonResponse(result, status=200)
+    except Exception as e:
+        logger.error(f"Bulk ingest failed: {e}")
+        return JsonResponse({"error": str(e)}, status=500)
+
+@staff_member_required
+def ingest_job(request, job_id: int):
+    """Progress, throughput and errors of a queued / running / finished ingest job."""
+    try:
+        job = IngestJob.objects.get(pk=job_id)
+    except IngestJob.DoesNotExist:
+        return JsonResponse({"error": "Job not found"}, status=404)
+    return JsonResponse(job_status(job))
+
 @csrf_exempt
 def evaluate(request):
     if request.method != "POST":
@@ -201,4 +314,5 @@ def ingest_page(request):
     """
     Admin-only ingest page
     """
-    return render(request, "api/ingest.html")
+    # the page opts in to a background job (?async=1) for large texts
+    return render(request, "api/ingest.html", {"async_min_chars": RAGSettings.ingest_async_min_chars})
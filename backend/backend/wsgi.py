@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# thread-mode ingest jobs: start the runner and recover jobs a previous
+# process left behind (no-op with INGEST_JOB_MODE=worker)
+from api.services.job_service import start_job_runner  # noqa: E402
+
+start_job_runner()
@@ -2,10 +2,8 @@ import typer
 from rich.console import Console
 from rich.panel import Panel
 from ragchat.config import RAGSettings
-from ragchat.core.embeddings import TextEmbedder
-from ragchat.core.retriever import Retriever
-from ragchat.storage.qdrant_index import QdrantIndex
-from ragchat.core.generator import Generator
+from ragchat.core.registry import get_embedder, get_generator, get_index
+from ragchat.core.retriever import Retriever, CHUNK_FIELDS
 from ragchat.core.pipeline import RagPipeline
 from ragchat.logger import logger
 
@@ -19,11 +17,13 @@ def _print_contexts(contexts):
             text = c.get("chunk") or c.get("context_text") or c.get("raw_context")
             score = c.get("score")
             idx = c.get("chunk_index")
+            source = f"[magenta]Source question:[/magenta] {c['question']}\n" if c.get("question") else ""
 
             console.print(
                 Panel(
                     f"[bold]Chunk {idx}[/bold]\n"
-                    f"[yellow]Score:[/yellow] {score:.4f}\n\n"
+                    f"[yellow]Score:[/yellow] {score:.4f}\n"
+                    f"{source}\n"
                     f"{text}",
                     title="Context",
                     border_style="cyan",
@@ -33,7 +33,11 @@ def _print_contexts(contexts):
         logger.error(f"Error while printing contexts: {e}")
 
 @app.command()
-def chat():
+def chat(
+    full_payload: bool = typer.Option(
+        False, "--full-payload", help="Fetch full payloads (raw context, source question / answer) for each hit"
+    ),
+):
     """
     Start an interactive Arabic RAG chat session.
     """
@@ -41,10 +45,13 @@ def chat():
         console.print("\n💬 [bold green]Arabic RAG Chatbot[/bold green]")
         console.print("Type your question, or /exit to quit.\n")
 
-        embedder = TextEmbedder(RAGSettings.emb_model)
-        index = QdrantIndex(RAGSettings.qdrant_url, RAGSettings.qdrant_api_key)
-        retriever = Retriever(embedder, index, RAGSettings.contexts_col, RAGSettings.top_k)
-        generator = Generator(RAGSettings.gen_model)
+        embedder = get_embedder(RAGSettings.emb_model)
+        index = get_index(RAGSettings.qdrant_url, RAGSettings.qdrant_api_key)
+        retriever = Retriever(
+            embedder, index, RAGSettings.contexts_col, RAGSettings.top_k,
+            payload_fields=None if full_payload else CHUNK_FIELDS,
+        )
+        generator = get_generator(RAGSettings.gen_model)
         pipeline = RagPipeline(
             embedder=embedder,
             retriever=retriever,
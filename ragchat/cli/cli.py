@@ -25,16 +25,44 @@ def prepare_raw(out: str = RAGSettings.raw_arcd_dir):
 def preprocess(
     in_dir: str = RAGSettings.raw_arcd_dir,
     out_dir: str = RAGSettings.clean_arcd_dir,
-    group_size: int = typer.Option(5, help="Number of sentences per chunk"),
+    group_size: int = typer.Option(5, help="Number of sentences per chunk (with --max-tokens 0)"),
+    num_proc: int = typer.Option(1, help="Worker processes for Dataset.map"),
+    batch_size: int = typer.Option(1000, help="Examples per preprocessing batch"),
+    cache_dir: str = typer.Option(
+        RAGSettings.preprocess_cache_dir, help="Fingerprinted cache for processed splits (empty disables)"
+    ),
+    max_tokens: int = typer.Option(
+        RAGSettings.ingest_max_tokens,
+        help="Token budget per chunk with the embedder tokenizer, clamped to its input limit (0 = group_size sentences)",
+    ),
+    overlap_tokens: int = typer.Option(0, help="Tokens of trailing sentences repeated in the next chunk"),
+    tokenizer_name: str = typer.Option(RAGSettings.emb_model, "--tokenizer", help="Tokenizer for --max-tokens"),
+    max_seq_length: int = typer.Option(
+        0,
+        help="Embedder input limit in tokens; --max-tokens is clamped to fit "
+        "(0 = the model's max_seq_length, else the tokenizer's model_max_length)",
+    ),
 ):
     """
     Apply normalization + sentence splitting + chunking.
     """
     try:
         logger.info(
-            f"Preprocessing ARCD dataset (in={in_dir}, out={out_dir}, group_size={group_size})"
+            f"Preprocessing ARCD dataset (in={in_dir}, out={out_dir}, group_size={group_size}, "
+            f"num_proc={num_proc}, batch_size={batch_size}, max_tokens={max_tokens})"
+        )
+        preprocess_arcd(
+            in_dir=in_dir,
+            out_dir=out_dir,
+            group_size=group_size,
+            num_proc=num_proc,
+            batch_size=batch_size,
+            cache_dir=cache_dir or None,
+            max_tokens=max_tokens,
+            overlap_tokens=overlap_tokens,
+            tokenizer_name=tokenizer_name,
+            max_seq_length=max_seq_length or None,
         )
-        preprocess_arcd(in_dir=in_dir, out_dir=out_dir, group_size=group_size)
     except Exception as e:
         logger.error(f"Failed to preprocess dataset: {e}")
         raise
@@ -1,9 +1,14 @@
+from typing import Optional
 import typer
 from datasets import load_from_disk
 from tqdm import tqdm
 from ragchat.config import RAGSettings
-from ragchat.core.embeddings import TextEmbedder
-from ragchat.storage.qdrant_index import QdrantIndex
+from ragchat.core.registry import get_embedder, get_index
+from ragchat.core.embed_pool import EmbeddingPool
+from ragchat.core.ingestion import IngestionPipeline
+from ragchat.storage.checkpoint import IngestCheckpoint, checkpoint_path_for, drop_ids
+from ragchat.data.dedup import collect_sources, dedup_stream
+from ragchat.data.streaming import count_list_items, filter_batches, iter_columns, rebatch, select_rows
 from ragchat.data.utils import normalize_arabic_text, make_hash_id
 from ragchat.logger import logger
 
@@ -29,11 +34,15 @@ def load_dataset_split(ds_path: str):
     else:
         return ds
 
-def prepare_qdrant_collection(embedder, idx, collection: str, force: bool):
-    """Ensure Qdrant collection exists with correct embedding dimension."""
+def prepare_qdrant_collection(embedder, idx, collection: str, force: bool, profile: Optional[str] = None):
+    """
+    Ensure Qdrant collection exists with the embedder's output dimension and dtype.
+    A named profile sets HNSW / quantization / on-disk storage (see ragchat.storage.profiles).
+    """
     try:
         test_vec = embedder.embed_text("اختبار")
         dim = len(test_vec)
+        dtype = getattr(embedder, "output_dtype", "float32")
     except Exception as e:
         logger.error(f"Failed to compute embedding dimension: {e}")
         raise
@@ -41,10 +50,10 @@ def prepare_qdrant_collection(embedder, idx, collection: str, force: bool):
     try:
         if force:
             logger.info(f"Recreating Qdrant collection '{collection}'")
-            idx.recreate(collection, dim)
+            idx.recreate(collection, dim, dtype, profile)
         else:
             logger.info(f"Ensuring Qdrant collection '{collection}' exists")
-            idx.ensure_collection(collection, dim)
+            idx.ensure_collection(collection, dim, dtype, profile)
     except Exception as e:
         logger.error(f"Failed to create/verify Qdrant collection: {e}")
         raise
@@ -52,28 +61,45 @@ def prepare_qdrant_collection(embedder, idx, collection: str, force: bool):
     return dim
 
 
-def extract_answers(split):
-    """Extract answer texts + payloads from dataset split."""
-    answer_texts = []
-    payloads = []
-
-    for i, ex in enumerate(split):
-        answers = ex.get("answers", {}).get("text", [])
-        if answers:
-            ans = normalize_arabic_text(answers[0])
-            hash_id = make_hash_id(ans)
-
-            answer_texts.append(ans)
-            payloads.append({
-                "id": hash_id,
-                "original_example_id": i,
-                "answer_text": ans,
-                "context": ex.get("context"),
-                "question": ex.get("question"),
-                "hash": hash_id,
-            })
-
-    return answer_texts, payloads
+def iter_answers(split, offset: int = 0, read_batch: int = 1000):
+    """
+    Stream (answer text, payload) pairs from the Arrow dataset, read_batch
+    rows at a time. offset is the absolute index of the split's first row.
+    """
+    i = offset
+    for rows in iter_columns(split, ["answers", "context", "question"], read_batch):
+        n = len(rows["answers"])
+        contexts = rows.get("context") or [None] * n
+        questions = rows.get("question") or [None] * n
+
+        for answers, context, question in zip(rows["answers"], contexts, questions):
+            answer_list = (answers or {}).get("text") or []
+            if answer_list:
+                ans = normalize_arabic_text(answer_list[0])
+                hash_id = make_hash_id(ans)
+                yield ans, {
+                    "id": hash_id,
+                    "original_example_id": i,
+                    "answer_text": ans,
+                    "context": context,
+                    "question": question,
+                    "hash": hash_id,
+                }
+            i += 1
+
+def iter_answer_sources(split, offset: int = 0, read_batch: int = 1000):
+    """Light (hash, sources) records for the dedup pre-pass: no texts kept."""
+    i = offset
+    for rows in iter_columns(split, ["answers", "question"], read_batch):
+        questions = rows.get("question") or [None] * len(rows["answers"])
+        for answers, question in zip(rows["answers"], questions):
+            answer_list = (answers or {}).get("text") or []
+            if answer_list:
+                yield make_hash_id(normalize_arabic_text(answer_list[0])), {
+                    "original_example_id": i,
+                    "question": question,
+                }
+            i += 1
 
 @app.command()
 def embed_answers(
@@ -81,46 +107,134 @@ def embed_answers(
     collection: str = RAGSettings.answers_col,
     model_name: str = RAGSettings.emb_model,
     force: bool = typer.Option(False, "--force", "-f", help="Recreate answer collection"),
-    batch_size: int = typer.Option(32, help="Batch size for embedding"),
+    profile: str = typer.Option(
+        "", help="Collection profile: default, low-latency, balanced or low-memory (empty = QDRANT_PROFILE, new collections only)"
+    ),
+    batch_size: int = typer.Option(32, help="Texts per model call (also caps token-budget buckets)"),
+    cache_dir: str = typer.Option(
+        RAGSettings.emb_store_dir, help="On-disk embedding cache directory (empty string disables it)"
+    ),
+    cache_dtype: str = typer.Option(RAGSettings.emb_store_dtype, help="Embedding cache dtype: float32 or float16"),
+    token_budget: int = typer.Option(
+        RAGSettings.emb_token_budget, help="Max padded tokens per length-bucketed batch (0 = dataset order)"
+    ),
+    workers: int = typer.Option(1, help="Embedding worker processes (1 = embed in this process)"),
+    threads_per_worker: int = typer.Option(0, help="Torch threads per worker (0 = cores / workers)"),
+    dedup: bool = typer.Option(True, "--dedup/--no-dedup", help="Embed identical answers once, merging their sources"),
+    resume: bool = typer.Option(True, "--resume/--no-resume", help="Skip points committed by an earlier, interrupted run"),
+    checkpoint_path: str = typer.Option(
+        "", help="Checkpoint state file (default: <INGEST_CHECKPOINT_DIR>/<collection>[.rows-<start>-<stop>].json)"
+    ),
+    skip_existing: bool = typer.Option(
+        True, "--skip-existing/--no-skip-existing", help="Ask Qdrant which ids already exist and embed only new answers"
+    ),
+    upload_workers: int = typer.Option(RAGSettings.ingest_upload_workers, help="Concurrent Qdrant upserts"),
+    queue_size: int = typer.Option(4, help="Batches buffered between pipeline stages (backpressure)"),
+    start: int = typer.Option(0, help="First dataset row to ingest"),
+    stop: Optional[int] = typer.Option(None, help="Stop before this dataset row (default: end)"),
+    shard_index: int = typer.Option(0, help="Shard of the row range to ingest (0-based)"),
+    num_shards: int = typer.Option(1, help="Split the row range into this many contiguous shards"),
 ):
     """Embed ARCD answers into a separate Qdrant collection."""
+    pool = None
     try:
         # load + select split
         split = load_dataset_split(ds_path)
+        total_rows = len(split)
+        split, offset = select_rows(split, start, stop, shard_index, num_shards)
+        rows = (offset, offset + len(split))
 
         if "answers" not in split.features:
             raise ValueError("Dataset missing 'answers'.")
 
         # initialize the embedder + Qdrant
-        embedder = TextEmbedder(model_name=model_name)
-        idx = QdrantIndex(url=RAGSettings.qdrant_url, api_key=RAGSettings.qdrant_api_key)
-
-        prepare_qdrant_collection(embedder, idx, collection, force)
+        if workers > 1:
+            pool = EmbeddingPool(
+                workers,
+                model_name,
+                threads_per_worker=threads_per_worker or None,
+                store_dir=cache_dir or None,
+                store_dtype=cache_dtype,
+                token_budget=token_budget,
+            )
+            embedder = pool
+        else:
+            embedder = get_embedder(
+                model_name=model_name,
+                store_dir=cache_dir or None,
+                store_dtype=cache_dtype,
+                token_budget=token_budget,
+            )
+        idx = get_index(RAGSettings.qdrant_url, RAGSettings.qdrant_api_key)
+
+        dim = prepare_qdrant_collection(embedder, idx, collection, force, profile or None)
+        # one checkpoint per row range: shards resume (and --force resets) independently
+        checkpoint = IngestCheckpoint(
+            checkpoint_path or checkpoint_path_for(RAGSettings.ingest_checkpoint_dir, collection, *rows, total_rows),
+            collection,
+            fingerprint=(
+                f"{ds_path}|{model_name}|{dim}|{getattr(embedder, 'output_dtype', 'float32')}|rows={rows[0]}-{rows[1]}"
+            ),
+        )
 
-        # extract answer texts
-        logger.info("Extracting answers...")
-        answer_texts, payloads = extract_answers(split)
+        # stream (text, payload) batches; exact dedup needs one light pre-pass
+        if dedup:
+            logger.info("Collecting answer sources for deduplication...")
+            sources = collect_sources(iter_answer_sources(split, offset))
+            total = len(sources)
+            items = dedup_stream(iter_answers(split, offset), sources)
+        else:
+            total = count_list_items(split, "answers", field="text", rows_only=True)
+            items = iter_answers(split, offset)
+        batches = rebatch(items, batch_size)
+        bar = tqdm(total=total, unit="answer")
+
+        # resume: committed by an earlier run, or already stored in Qdrant
+        if force or not resume:
+            checkpoint.reset()
+        else:
+            committed = checkpoint.load()
+            if committed:
+                batches = filter_batches(batches, lambda t, p: drop_ids(t, p, committed), on_drop=bar.update)
+        if skip_existing and not force:
+            batches = filter_batches(
+                batches,
+                lambda t, p: drop_ids(t, p, idx.existing_ids(collection, [x["id"] for x in p])),
+                on_drop=bar.update,
+            )
 
-        logger.info(f"Total answers to embed: {len(answer_texts)}")
+        logger.info(f"Total answers: {total}")
         logger.info("Embedding answers and uploading...")
 
-        # batch embedding + upload
-        for start in tqdm(range(0, len(answer_texts), batch_size)):
-            batch = answer_texts[start: start + batch_size]
-            vectors = embedder.embed_batch(batch)
-            batch_payloads = payloads[start: start + batch_size]
-
-            idx.upsert(
-                name=collection,
-                vectors=vectors,
-                payloads=batch_payloads,
-                start_id=None
+        # overlapped embed / upload stages
+        if pool is not None:
+            embed_stream = lambda batches: pool.imap(
+                batches, batch_size=batch_size, max_pending=workers + queue_size
             )
+        else:
+            embed_stream = lambda batches: (embedder.embed_batch(b, batch_size=batch_size) for b in batches)
+
+        pipeline = IngestionPipeline(
+            idx,
+            collection,
+            embed_stream,
+            upload_workers=upload_workers,
+            queue_size=queue_size,
+            on_commit=checkpoint.commit,
+        )
+        with bar:
+            stats = pipeline.run(batches, progress=bar.update)
+        logger.info(f"Embedded and stored {stats['points']} of {total} answers")
 
+        if pool is not None:
+            pool.report()
         logger.info("Finished embedding answers!")
 
     except Exception as e:
         logger.error(f"Answer embedding failed: {e}")
+    finally:
+        if pool is not None:
+            pool.close()
 
 
 if __name__ == "__main__":
@@ -1,16 +1,22 @@
+from typing import Optional, Sequence
 import typer
 from datasets import load_from_disk
 from tqdm import tqdm
 from ragchat.config import RAGSettings
-from ragchat.core.embeddings import TextEmbedder
-from ragchat.storage.qdrant_index import QdrantIndex
+from ragchat.core.registry import get_doc_store, get_embedder, get_index
+from ragchat.core.embed_pool import EmbeddingPool
+from ragchat.core.ingestion import IngestionPipeline
+from ragchat.storage.checkpoint import IngestCheckpoint, checkpoint_path_for, drop_ids
+from ragchat.data.dedup import MERGE_FIELDS, collect_sources, dedup_near, dedup_stream, merge_late_sources
+from ragchat.data.streaming import count_list_items, filter_batches, iter_columns, rebatch, select_rows
+from ragchat.data.near_dedup import NearDuplicateIndex, index_path_for
 from ragchat.logger import logger
 from ragchat.data.utils import make_hash_id
 
 app = typer.Typer(help="Embed ARCD contexts and store them in Qdrant.")
 
-def load_dataset_split(ds_path: str):
-    """Load ARCD dataset and return a single split."""
+def load_dataset_split(ds_path: str, splits: Sequence[str] = ("train", "validation")):
+    """Load ARCD dataset and return a single split: the first of splits present, else the first one."""
     try:
         logger.info(f"Loading cleaned dataset from {ds_path}")
         ds = load_from_disk(ds_path)
@@ -20,20 +26,22 @@ def load_dataset_split(ds_path: str):
 
     # dataset may contain train/validation, order matters.
     if hasattr(ds, "get"):
-        if ds.get("train") is not None:
-            return ds["train"]
-        elif ds.get("validation") is not None:
-            return ds["validation"]
-        else:
-            return next(iter(ds.values()))
+        for name in splits:
+            if ds.get(name) is not None:
+                return ds[name]
+        return next(iter(ds.values()))
     else:
         return ds
 
-def prepare_qdrant(embedder, idx, collection: str, force: bool):
-    """Ensure Qdrant collection exists with correct dimensions."""
+def prepare_qdrant(embedder, idx, collection: str, force: bool, profile: Optional[str] = None):
+    """
+    Ensure Qdrant collection exists with the embedder's output dimension and dtype.
+    A named profile sets HNSW / quantization / on-disk storage (see ragchat.storage.profiles).
+    """
     try:
         example_vec = embedder.embed_text("مثال")
         dim = len(example_vec)
+        dtype = getattr(embedder, "output_dtype", "float32")
     except Exception as e:
         logger.error(f"Failed to compute embedding dimension: {e}")
         raise
@@ -41,10 +49,10 @@ def prepare_qdrant(embedder, idx, collection: str, force: bool):
     try:
         if force:
             logger.info(f"Recreating Qdrant collection '{collection}'")
-            idx.recreate(collection, dim)
+            idx.recreate(collection, dim, dtype, profile)
         else:
             logger.info(f"Ensuring collection '{collection}' exists")
-            idx.ensure_collection(collection, dim)
+            idx.ensure_collection(collection, dim, dtype, profile)
     except Exception as e:
         logger.error(f"Failed to prepare Qdrant collection: {e}")
         raise
@@ -52,32 +60,81 @@ def prepare_qdrant(embedder, idx, collection: str, force: bool):
     return dim
 
 
-def extract_chunks(split):
-    """Flatten chunk lists into text + payload lists."""
-    all_texts = []
-    all_payloads = []
+def store_documents(split, store, offset: int = 0, read_batch: int = 1000) -> int:
+    """
+    Write each distinct raw context and each example's question / answer to
+    the DocStore, read_batch rows at a time. Returns the number of examples.
+    """
+    i = offset
+    for rows in iter_columns(split, ["context", "question", "answers"], read_batch):
+        n = len(rows["context"])
+        questions = rows.get("question") or [None] * n
+        answers = rows.get("answers") or [None] * n
+
+        docs, examples = {}, []
+        for context, question, ans in zip(rows["context"], questions, answers):
+            doc_id = make_hash_id(context or "")
+            docs.setdefault(doc_id, (doc_id, context or "", "arcd"))
+            answer_list = (ans or {}).get("text") or []
+            examples.append((i, doc_id, question, answer_list[0] if answer_list else None))
+            i += 1
+        store.put_documents(docs.values())
+        store.put_examples(examples)
+    return i - offset
 
-    for i, ex in enumerate(split):
+def iter_chunks(split, offset: int = 0, read_batch: int = 1000, compact: bool = False):
+    """
+    Stream (chunk text, payload) pairs from the Arrow dataset, read_batch
+    rows at a time. offset is the absolute index of the split's first row.
+    compact=True keeps only references (doc_id, example id) instead of the
+    raw context / question / answer, which live in the DocStore.
+    """
+    i = offset
+    for rows in iter_columns(split, ["chunks", "answers", "context", "question"], read_batch):
+        n = len(rows["chunks"])
+        answers = rows.get("answers") or [None] * n
+        contexts = rows.get("context") or [None] * n
+        questions = rows.get("question") or [None] * n
 
-        # handle missing or empty answers
-        answer_list = ex.get("answers", {}).get("text", [])
-        answer_text = answer_list[0] if answer_list else None
+        for chunks, ans, context, question in zip(rows["chunks"], answers, contexts, questions):
+            # handle missing or empty answers
+            answer_list = (ans or {}).get("text") or []
+            answer_text = answer_list[0] if answer_list else None
 
-        for j, chunk in enumerate(ex["chunks"]):
-            hash_id = make_hash_id(chunk)
-            all_texts.append(chunk)
-            all_payloads.append({
-                "id": hash_id,
-                "original_example_id": i,
-                "chunk_index": j,
-                "context_text": chunk,
-                "answer_text": answer_text,
-                "raw_context": ex.get("context"),
-                "question": ex.get("question"),
-                "hash": hash_id,
-            })
+            doc_id = make_hash_id(context or "") if compact else None
+            for j, chunk in enumerate(chunks):
+                hash_id = make_hash_id(chunk)
+                if compact:
+                    yield chunk, {
+                        "id": hash_id,
+                        "doc_id": doc_id,
+                        "original_example_id": i,
+                        "chunk_index": j,
+                        "context_text": chunk,
+                        "hash": hash_id,
+                    }
+                    continue
+                yield chunk, {
+                    "id": hash_id,
+                    "original_example_id": i,
+                    "chunk_index": j,
+                    "context_text": chunk,
+                    "answer_text": answer_text,
+                    "raw_context": context,
+                    "question": question,
+                    "hash": hash_id,
+                }
+            i += 1
 
-    return all_texts, all_payloads
+def iter_chunk_sources(split, offset: int = 0, read_batch: int = 1000):
+    """Light (hash, sources) records for the dedup pre-pass: no texts kept."""
+    i = offset
+    for rows in iter_columns(split, ["chunks", "question"], read_batch):
+        questions = rows.get("question") or [None] * len(rows["chunks"])
+        for chunks, question in zip(rows["chunks"], questions):
+            for chunk in chunks:
+                yield make_hash_id(chunk), {"original_example_id": i, "question": question}
+            i += 1
 
 @app.command()
 def embed_contexts(
@@ -85,43 +142,170 @@ def embed_contexts(
     collection: str = RAGSettings.contexts_col,
     model_name: str = RAGSettings.emb_model,
     force: bool = typer.Option(False, "--force", "-f", help="Recreate Qdrant collection"),
-    batch_size: int = typer.Option(32, help="Embedding batch size"),
+    profile: str = typer.Option(
+        "", help="Collection profile: default, low-latency, balanced or low-memory (empty = QDRANT_PROFILE, new collections only)"
+    ),
+    batch_size: int = typer.Option(32, help="Texts per model call (also caps token-budget buckets)"),
+    cache_dir: str = typer.Option(
+        RAGSettings.emb_store_dir, help="On-disk embedding cache directory (empty string disables it)"
+    ),
+    cache_dtype: str = typer.Option(RAGSettings.emb_store_dtype, help="Embedding cache dtype: float32 or float16"),
+    token_budget: int = typer.Option(
+        RAGSettings.emb_token_budget, help="Max padded tokens per length-bucketed batch (0 = dataset order)"
+    ),
+    workers: int = typer.Option(1, help="Embedding worker processes (1 = embed in this process)"),
+    threads_per_worker: int = typer.Option(0, help="Torch threads per worker (0 = cores / workers)"),
+    dedup: bool = typer.Option(True, "--dedup/--no-dedup", help="Embed identical chunks once, merging their sources"),
+    resume: bool = typer.Option(True, "--resume/--no-resume", help="Skip points committed by an earlier, interrupted run"),
+    checkpoint_path: str = typer.Option(
+        "", help="Checkpoint state file (default: <INGEST_CHECKPOINT_DIR>/<collection>[.rows-<start>-<stop>].json)"
+    ),
+    skip_existing: bool = typer.Option(
+        True, "--skip-existing/--no-skip-existing", help="Ask Qdrant which ids already exist and embed only new chunks"
+    ),
+    upload_workers: int = typer.Option(RAGSettings.ingest_upload_workers, help="Concurrent Qdrant upserts"),
+    queue_size: int = typer.Option(4, help="Batches buffered between pipeline stages (backpressure)"),
+    near_dup_threshold: float = typer.Option(
+        RAGSettings.near_dup_threshold, help="MinHash similarity above which chunks are near-duplicates (0 = off)"
+    ),
+    near_dup_index: str = typer.Option(
+        RAGSettings.near_dup_index_path,
+        help="Near-duplicate index shared with API ingestion (one file per collection, see index_path_for)",
+    ),
+    doc_store: str = typer.Option(
+        RAGSettings.doc_store_path, help="SQLite store for raw contexts (empty string keeps full payloads)"
+    ),
+    start: int = typer.Option(0, help="First dataset row to ingest"),
+    stop: Optional[int] = typer.Option(None, help="Stop before this dataset row (default: end)"),
+    shard_index: int = typer.Option(0, help="Shard of the row range to ingest (0-based)"),
+    num_shards: int = typer.Option(1, help="Split the row range into this many contiguous shards"),
 ):
     """Embed all context chunks and upsert into Qdrant."""
+    pool = None
     try:
         split = load_dataset_split(ds_path)
+        total_rows = len(split)
+        split, offset = select_rows(split, start, stop, shard_index, num_shards)
+        rows = (offset, offset + len(split))
 
         if "chunks" not in split.features:
             raise ValueError("Dataset missing 'chunks'. Run preprocessing first.")
 
-        embedder = TextEmbedder(model_name)
-        idx = QdrantIndex(url=RAGSettings.qdrant_url,api_key=RAGSettings.qdrant_api_key)
+        if workers > 1:
+            pool = EmbeddingPool(
+                workers,
+                model_name,
+                threads_per_worker=threads_per_worker or None,
+                store_dir=cache_dir or None,
+                store_dtype=cache_dtype,
+                token_budget=token_budget,
+            )
+            embedder = pool
+        else:
+            embedder = get_embedder(
+                model_name,
+                store_dir=cache_dir or None,
+                store_dtype=cache_dtype,
+                token_budget=token_budget,
+            )
+        idx = get_index(RAGSettings.qdrant_url, RAGSettings.qdrant_api_key)
+
+        dim = prepare_qdrant(embedder, idx, collection, force, profile or None)
+        # one checkpoint per row range: shards resume (and --force resets) independently
+        checkpoint = IngestCheckpoint(
+            checkpoint_path or checkpoint_path_for(RAGSettings.ingest_checkpoint_dir, collection, *rows, total_rows),
+            collection,
+            fingerprint=(
+                f"{ds_path}|{model_name}|{dim}|{getattr(embedder, 'output_dtype', 'float32')}|rows={rows[0]}-{rows[1]}"
+            ),
+        )
+
+        # raw contexts go to the side store once; payloads keep references
+        compact = bool(doc_store)
+        if compact:
+            logger.info(f"Writing raw contexts to document store {doc_store}...")
+            store_documents(split, get_doc_store(doc_store), offset)
+
+        # stream (text, payload) batches; exact dedup needs one light pre-pass
+        merge_fields = ("original_example_id",) if compact else MERGE_FIELDS
+        if dedup:
+            logger.info("Collecting chunk sources for deduplication...")
+            sources = collect_sources(iter_chunk_sources(split, offset), merge_fields)
+            total = len(sources)
+            items = dedup_stream(iter_chunks(split, offset, compact=compact), sources)
+        else:
+            total = count_list_items(split, "chunks")
+            items = iter_chunks(split, offset, compact=compact)
+        batches = rebatch(items, batch_size)
+        bar = tqdm(total=total, unit="chunk")
 
-        prepare_qdrant(embedder, idx, collection, force)
+        near_index = None
+        # near-duplicates of chunks from earlier batches: sources merged after upload
+        late_sources = {}
+        near_index_path = index_path_for(near_dup_index, collection) if near_dup_index else ""
+        if near_dup_threshold > 0:
+            # a recreated collection holds nothing yet, so earlier signatures do not apply
+            near_index = (
+                NearDuplicateIndex(threshold=near_dup_threshold) if force
+                else NearDuplicateIndex.load_or_create(near_index_path, threshold=near_dup_threshold)
+            )
+            batches = filter_batches(
+                batches,
+                lambda t, p: dedup_near(t, p, near_index, merge_fields, log=False, late=late_sources),
+                on_drop=bar.update,
+            )
 
-        logger.info("Flattening chunks...")
-        all_texts, all_payloads = extract_chunks(split)
+        # resume: committed by an earlier run, or already stored in Qdrant
+        if force or not resume:
+            checkpoint.reset()
+        else:
+            committed = checkpoint.load()
+            if committed:
+                batches = filter_batches(batches, lambda t, p: drop_ids(t, p, committed), on_drop=bar.update)
+        if skip_existing and not force:
+            batches = filter_batches(
+                batches,
+                lambda t, p: drop_ids(t, p, idx.existing_ids(collection, [x["id"] for x in p])),
+                on_drop=bar.update,
+            )
 
-        logger.info(f"Total chunks to embed: {len(all_texts)}")
+        logger.info(f"Total chunks: {total}")
         logger.info("Embedding and uploading chunks...")
 
-        # batch embedding
-        for start in tqdm(range(0, len(all_texts), batch_size)):
-            batch = all_texts[start:start + batch_size]
-            vectors = embedder.embed_batch(batch)
-            batch_payloads = all_payloads[start:start + batch_size]
-
-            idx.upsert(
-                name=collection,
-                vectors=vectors,
-                payloads=batch_payloads,
-                start_id=None
+        # overlapped embed / upload stages
+        if pool is not None:
+            embed_stream = lambda batches: pool.imap(
+                batches, batch_size=batch_size, max_pending=workers + queue_size
             )
+        else:
+            embed_stream = lambda batches: (embedder.embed_batch(b, batch_size=batch_size) for b in batches)
+
+        pipeline = IngestionPipeline(
+            idx,
+            collection,
+            embed_stream,
+            upload_workers=upload_workers,
+            queue_size=queue_size,
+            on_commit=checkpoint.commit,
+        )
+        with bar:
+            stats = pipeline.run(batches, progress=bar.update)
+        logger.info(f"Embedded and stored {stats['points']} of {total} chunks")
+
+        if late_sources:
+            merge_late_sources(idx, collection, late_sources, merge_fields)
 
+        if near_index is not None and near_index_path:
+            near_index.save(near_index_path)
+        if pool is not None:
+            pool.report()
         logger.info("All chunks embedded and stored successfully!")
 
     except Exception as e:
         logger.error(f"Context embedding failed: {e}")
+    finally:
+        if pool is not None:
+            pool.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+import time
+import numpy as np
+import typer
+from ragchat.config import RAGSettings
+from ragchat.core.backends import OnnxBackend, TorchBackend, export_onnx
+from ragchat.cli.embed_contexts_cli import load_dataset_split
+from ragchat.data.utils import normalize_arabic_text
+from ragchat.logger import logger
+
+app = typer.Typer(help="Export the embedding model to ONNX and check parity with torch.")
+
+def _sample_chunks(ds_path: str, n: int):
+    """Take the first n context chunks from the cleaned ARCD dataset."""
+    split = load_dataset_split(ds_path)
+    if "chunks" not in split.features:
+        raise ValueError("Dataset missing 'chunks'. Run preprocessing first.")
+
+    texts = []
+    for ex in split:
+        for chunk in ex["chunks"]:
+            texts.append(normalize_arabic_text(chunk))
+            if len(texts) >= n:
+                return texts
+    return texts
+
+def _single_query_ms(backend, texts, repeats: int) -> float:
+    """Average latency of batch-size-1 encodes, like one /api/ask question."""
+    backend.encode(texts[:1], batch_size=1, show_progress_bar=False)  # warmup
+    start = time.perf_counter()
+    for i in range(repeats):
+        backend.encode([texts[i % len(texts)]], batch_size=1, show_progress_bar=False)
+    return (time.perf_counter() - start) * 1000 / repeats
+
+@app.command()
+def export(
+    model_name: str = RAGSettings.emb_model,
+    out_dir: str = RAGSettings.emb_onnx_dir,
+    quantize: bool = typer.Option(True, "--quantize/--no-quantize", help="Also write a dynamic int8 model"),
+    opset: int = typer.Option(17, help="ONNX opset version"),
+):
+    """Export the SentenceTransformer embedder to ONNX (fp32 + optional int8)."""
+    try:
+        export_onnx(model_name, out_dir, quantize=quantize, opset=opset)
+    except Exception as e:
+        logger.error(f"ONNX export failed: {e}")
+        raise
+
+@app.command()
+def parity(
+    ds_path: str = RAGSettings.clean_arcd_dir,
+    model_name: str = RAGSettings.emb_model,
+    onnx_dir: str = RAGSettings.emb_onnx_dir,
+    quantized: bool = typer.Option(True, "--quantized/--fp32", help="Check the int8 or the fp32 graph"),
+    n: int = typer.Option(256, "--n", "-n", help="Number of ARCD chunks to compare"),
+    batch_size: int = typer.Option(32, help="Embedding batch size"),
+    latency_runs: int = typer.Option(20, help="Single-query encodes used for the latency comparison"),
+):
+    """Report cosine drift and single-query latency of ONNX vs torch embeddings."""
+    try:
+        texts = _sample_chunks(ds_path, n)
+        if not texts:
+            raise ValueError("No chunks found to compare.")
+
+        torch_backend = TorchBackend(model_name, device="cpu")
+        onnx_backend = OnnxBackend(onnx_dir, quantized=quantized)
+
+        ref = torch_backend.encode(texts, batch_size=batch_size, show_progress_bar=True)
+        got = onnx_backend.encode(texts, batch_size=batch_size)
+        cos = np.sum(ref * got, axis=1)  # both sides are L2-normalized
+
+        torch_ms = _single_query_ms(torch_backend, texts, latency_runs)
+        onnx_ms = _single_query_ms(onnx_backend, texts, latency_runs)
+
+        print(f"\n=== ONNX parity ({'int8' if quantized else 'fp32'}, {len(texts)} chunks) ===")
+        print(f"cosine mean: {cos.mean():.5f}")
+        print(f"cosine min:  {cos.min():.5f}")
+        print(f"cosine p5:   {np.percentile(cos, 5):.5f}")
+        print(f"max drift:   {1.0 - cos.min():.5f}")
+        print(f"single-query latency: torch {torch_ms:.1f} ms | onnx {onnx_ms:.1f} ms "
+              f"({torch_ms / max(onnx_ms, 1e-9):.2f}x)", flush=True)
+    except Exception as e:
+        logger.error(f"ONNX parity check failed: {e}")
+        raise
+
+if __name__ == "__main__":
+    app()
@@ -23,6 +23,7 @@ def get_setting(name: str, default=None):
 class RAGSettings:
     raw_arcd_dir: str = "data/raw/arcd_raw"
     clean_arcd_dir: str = "data/processed/arcd_clean"
+    preprocess_cache_dir: str = os.getenv("PREPROCESS_CACHE_DIR", "data/processed/.cache")
     emb_model: str = get_setting("EMB_MODEL")
     gen_model: str = get_setting("GEN_MODEL")
     gen_max_new_tokens: int = int(get_setting("GEN_MAX_NEW_TOKENS", 512))
@@ -34,3 +35,38 @@ class RAGSettings:
     answers_col: str = os.getenv("QDRANT_ANS_COLLECTION", "arcd_answers")
     top_k: int = int(get_setting("TOP_K", 5))
     gemini_api_key: str = get_setting("GEMINI_API_KEY")
+    emb_cache_size: int = int(os.getenv("EMB_CACHE_SIZE", 1024))
+    emb_cache_ttl: float = float(os.getenv("EMB_CACHE_TTL", 0))
+    emb_store_dir: str = os.getenv("EMB_STORE_DIR", "data/embeddings_cache")
+    emb_store_dtype: str = os.getenv("EMB_STORE_DTYPE", "float32")
+    emb_micro_batch: bool = os.getenv("EMB_MICRO_BATCH", "0").lower() in ("1", "true", "yes")
+    emb_micro_batch_size: int = int(os.getenv("EMB_MICRO_BATCH_SIZE", 16))
+    emb_micro_batch_wait_ms: float = float(os.getenv("EMB_MICRO_BATCH_WAIT_MS", 5))
+    emb_backend: str = os.getenv("EMB_BACKEND", "torch")
+    emb_onnx_dir: str = os.getenv("EMB_ONNX_DIR", "data/onnx_embedder")
+    emb_token_budget: int = int(os.getenv("EMB_TOKEN_BUDGET", 8192))
+    emb_output_dim: int = int(os.getenv("EMB_OUTPUT_DIM", 0))
+    emb_reduction: str = os.getenv("EMB_REDUCTION", "truncate")
+    emb_pca_path: str = os.getenv("EMB_PCA_PATH", "data/pca_projection.npz")
+    emb_output_dtype: str = os.getenv("EMB_OUTPUT_DTYPE", "float32")
+    near_dup_threshold: float = float(os.getenv("NEAR_DUP_THRESHOLD", 0))
+    near_dup_index_path: str = os.getenv("NEAR_DUP_INDEX_PATH", "data/near_dup_index.npz")
+    near_dup_save_interval: float = float(os.getenv("NEAR_DUP_SAVE_INTERVAL", 30))
+    ingest_checkpoint_dir: str = os.getenv("INGEST_CHECKPOINT_DIR", "data/checkpoints")
+    ingest_upload_workers: int = int(os.getenv("INGEST_UPLOAD_WORKERS", 2))
+    doc_store_path: str = os.getenv("DOC_STORE_PATH", "data/doc_store.sqlite")
+    ingest_group_size: int = int(os.getenv("INGEST_GROUP_SIZE", 5))
+    ingest_max_tokens: int = int(os.getenv("INGEST_MAX_TOKENS", 256))
+    ingest_upsert_batch: int = int(os.getenv("INGEST_UPSERT_BATCH", 256))
+    ingest_job_mode: str = os.getenv("INGEST_JOB_MODE", "thread")
+    ingest_job_workers: int = int(os.getenv("INGEST_JOB_WORKERS", 1))
+    ingest_job_stale_after: float = float(os.getenv("INGEST_JOB_STALE_AFTER", 600))
+    ingest_async_min_chars: int = int(os.getenv("INGEST_ASYNC_MIN_CHARS", 20000))
+    qdrant_transport: str = os.getenv("QDRANT_TRANSPORT", "rest")
+    qdrant_grpc_port: int = int(os.getenv("QDRANT_GRPC_PORT", 6334))
+    qdrant_pool_size: int = int(os.getenv("QDRANT_POOL_SIZE", 8))
+    qdrant_profile: str = os.getenv("QDRANT_PROFILE", "default")
+    vector_backend: str = os.getenv("VECTOR_BACKEND", "qdrant")
+    local_index_dir: str = os.getenv("LOCAL_INDEX_DIR", "data/local_index")
+    local_ivf_lists: int = int(os.getenv("LOCAL_IVF_LISTS", 0))
+    local_ivf_probe: int = int(os.getenv("LOCAL_IVF_PROBE", 8))
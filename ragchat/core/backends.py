@@ -0,0 +1,224 @@
+import json
+import os
+from typing import List, Optional
+import numpy as np
+from ragchat.logger import logger
+
+ONNX_CONFIG_FILE = "onnx_config.json"
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+
+def _l2_normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.clip(norms, 1e-12, None)
+
+def _load_tokenizer(model_dir: str):
+    """
+    Tokenizer saved next to the ONNX graph. A fast tokenizer (tokenizer.json)
+    is loaded directly: AutoTokenizer would import torch.
+    """
+    if os.path.exists(os.path.join(model_dir, "tokenizer.json")):
+        from transformers import PreTrainedTokenizerFast
+
+        return PreTrainedTokenizerFast.from_pretrained(model_dir)
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(model_dir)
+
+class TorchBackend:
+    """
+    Default backend: SentenceTransformer running in PyTorch eager mode.
+    torch is imported here, so the ONNX backend never loads it.
+    """
+    name = "torch"
+
+    def __init__(self, model_name: str, device: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device=device)
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.model.max_seq_length
+
+    @property
+    def dim(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], batch_size: int, show_progress_bar: bool) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=show_progress_bar,
+        )
+
+class OnnxBackend:
+    """
+    CPU backend running an exported sentence-embedding graph with ONNX Runtime.
+    The graph already contains pooling, so outputs are sentence embeddings;
+    they are L2-normalized here like the torch path.
+    """
+    name = "onnx"
+
+    def __init__(self, model_dir: str, quantized: Optional[bool] = None, num_threads: Optional[int] = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX backend needs onnxruntime: pip install -r requirements-onnx.txt"
+            ) from e
+
+        config_path = os.path.join(model_dir, ONNX_CONFIG_FILE)
+        if not os.path.exists(config_path):
+            raise FileNotFoundError(
+                f"No ONNX export found in '{model_dir}'. "
+                "Run: python -m ragchat.cli.onnx_cli export"
+            )
+        with open(config_path, "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+
+        use_int8 = self.config.get("quantized", False) if quantized is None else quantized
+        file_name = ONNX_INT8_FILE if use_int8 else ONNX_FP32_FILE
+        model_path = os.path.join(model_dir, file_name)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX model file not found: {model_path}")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._tokenizer = _load_tokenizer(model_dir)
+        self._max_seq_length = int(self.config.get("max_seq_length", 512))
+        self._dim = int(self.config["dim"])
+        self.quantized = use_int8
+        logger.info(f"Loaded ONNX embedding graph: {model_path} (int8={use_int8})")
+
+    @property
+    def tokenizer(self):
+        return self._tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return self._max_seq_length
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    def encode(self, texts: List[str], batch_size: int, show_progress_bar: bool = False) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self._dim), dtype=np.float32)
+
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            enc = self._tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self._max_seq_length,
+                return_tensors="np",
+            )
+            feeds = {
+                "input_ids": enc["input_ids"].astype(np.int64),
+                "attention_mask": enc["attention_mask"].astype(np.int64),
+            }
+            outputs.append(self.session.run(["sentence_embedding"], feeds)[0])
+
+        return _l2_normalize(np.concatenate(outputs).astype(np.float32))
+
+def export_onnx(model_name: str, out_dir: str, quantize: bool = True, opset: int = 17) -> str:
+    """
+    Export a SentenceTransformer model to ONNX (fp32), optionally adding a
+    dynamically int8-quantized copy. Returns the output directory.
+    """
+    try:
+        import onnx  # noqa: F401  (required by torch.onnx.export)
+    except ImportError as e:
+        raise ImportError("Exporting to ONNX needs the onnx package: pip install -r requirements-onnx.txt") from e
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    class SentenceEmbeddingModule(torch.nn.Module):
+        """Exposes SentenceTransformer (transformer + pooling) as a tensor-in/tensor-out module."""
+
+        def __init__(self, model: SentenceTransformer):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            features = self.model({"input_ids": input_ids, "attention_mask": attention_mask})
+            return features["sentence_embedding"]
+
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = os.path.join(out_dir, ONNX_FP32_FILE)
+
+    logger.info(f"Exporting '{model_name}' to ONNX at {fp32_path}")
+    # fp16 checkpoints are exported in fp32: CPU kernels and int8 quantization expect it
+    model = SentenceTransformer(model_name, device="cpu").float().eval()
+    module = SentenceEmbeddingModule(model)
+    dummy = model.tokenizer(["مثال للتصدير"], return_tensors="pt", padding=True)
+
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["sentence_embedding"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "sentence_embedding": {0: "batch"},
+            },
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(out_dir, ONNX_INT8_FILE)
+        logger.info(f"Quantizing ONNX model (dynamic int8) to {int8_path}")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    model.tokenizer.save_pretrained(out_dir)
+    with open(os.path.join(out_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "model_name": model_name,
+                "dim": model.get_sentence_embedding_dimension(),
+                "max_seq_length": model.max_seq_length,
+                "quantized": quantize,
+                "opset": opset,
+            },
+            f,
+            indent=2,
+        )
+
+    logger.info(f"ONNX export finished: {out_dir}")
+    return out_dir
+
+def load_backend(
+    backend: str,
+    model_name: str,
+    device: str,
+    onnx_dir: Optional[str] = None,
+    onnx_quantized: Optional[bool] = None,
+):
+    """
+    Build the embedding backend by name: 'torch' (default) or 'onnx'.
+    """
+    if backend == "torch":
+        return TorchBackend(model_name, device)
+    if backend == "onnx":
+        return OnnxBackend(onnx_dir, quantized=onnx_quantized)
+    raise ValueError(f"Unknown embedding backend '{backend}' (use 'torch' or 'onnx').")
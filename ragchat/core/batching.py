@@ -0,0 +1,138 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+from ragchat.logger import logger
+
+_STOP = object()
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching front end for single-text embedding calls.
+
+    Concurrent callers submit one text each; a background thread collects
+    them and flushes a single `encode_fn(texts)` call when either
+    `max_batch_size` requests are queued or `max_wait_ms` has passed since
+    the first one arrived. Each caller gets back its own row of the result.
+
+    Exposes queue-depth and batch-size histograms through `stats()`.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], Any],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("MicroBatcher max_batch_size must be >= 1.")
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0.0) / 1000.0
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._queue_depths: Counter = Counter()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="embedding-microbatcher", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Micro-batching enabled (max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms})"
+        )
+
+    def submit(self, text: str) -> Future:
+        """Queue one text and return a Future resolving to its vector."""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed.")
+        fut: Future = Future()
+        self._queue.put((text, fut))
+        return fut
+
+    def embed(self, text: str, timeout: Optional[float] = None):
+        """Blocking helper: submit and wait for the vector."""
+        return self.submit(text).result(timeout=timeout)
+
+    def _collect(self, first) -> tuple:
+        batch = [first]
+        stopping = False
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stopping = True
+                break
+            batch.append(item)
+
+        return batch, stopping
+
+    def _flush(self, batch) -> None:
+        with self._stats_lock:
+            self._batch_sizes[len(batch)] += 1
+            self._queue_depths[self._queue.qsize()] += 1
+
+        texts = [text for text, _ in batch]
+        try:
+            vectors = self.encode_fn(texts)
+            for (_, fut), vec in zip(batch, vectors):
+                fut.set_result(vec)
+        except Exception as e:
+            logger.error(f"Micro-batch encode failed for {len(batch)} texts: {e}")
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stopping = self._collect(first)
+            self._flush(batch)
+            if stopping:
+                break
+
+        # serve whatever was queued before close()
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        for start in range(0, len(leftover), self.max_batch_size):
+            self._flush(leftover[start:start + self.max_batch_size])
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop the background thread after draining queued requests."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of batching histograms:
+        - batch_size: {size: number of flushes}
+        - queue_depth: {requests still waiting at flush time: number of flushes}
+        """
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            requests = sum(size * n for size, n in self._batch_sizes.items())
+            return {
+                "batches": batches,
+                "requests": requests,
+                "mean_batch_size": (requests / batches) if batches else 0.0,
+                "batch_size": dict(sorted(self._batch_sizes.items())),
+                "queue_depth": dict(sorted(self._queue_depths.items())),
+            }
@@ -0,0 +1,202 @@
+import multiprocessing as mp
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+from ragchat.data.utils import normalize_batch, make_hash_id
+from ragchat.storage.embedding_store import EmbeddingStore
+from ragchat.core.reduction import DimReducer
+from ragchat.config import RAGSettings
+from ragchat.logger import logger
+
+# one embedder per worker process, created by _init_worker
+_WORKER_EMBEDDER = None
+
+def _init_worker(embedder_kwargs: Dict[str, Any], num_threads: int):
+    global _WORKER_EMBEDDER
+    from ragchat.core.embeddings import TextEmbedder
+
+    if (embedder_kwargs.get("backend") or RAGSettings.emb_backend) == "torch":
+        import torch
+
+        torch.set_num_threads(num_threads)
+    _WORKER_EMBEDDER = TextEmbedder(**embedder_kwargs)
+
+def _worker_info(_):
+    return _WORKER_EMBEDDER.dim, _WORKER_EMBEDDER.store_key
+
+def _embed_shard(task):
+    texts, batch_size = task
+    start = time.perf_counter()
+    vectors = _WORKER_EMBEDDER.embed_batch(texts, batch_size=batch_size) if texts else None
+    return os.getpid(), len(texts), vectors, time.perf_counter() - start
+
+class EmbeddingPool:
+    """
+    Multi-process embedding pool for corpus ingestion.
+
+    - each worker loads the model once and pins its torch thread count
+    - batches are sharded across workers and come back in input order, so
+      the uploader can stream them straight to Qdrant; at most max_pending
+      batches are submitted ahead of the consumer (Pool.imap would drain
+      the input eagerly and defeat the pipeline's backpressure)
+    - with an embedding store, lookups/writes happen in the parent and
+      only cache misses are sent to workers
+    - workers return full vectors; dimension reduction / float16 output
+      is applied in the parent, so the store only ever holds full vectors
+    - per-worker throughput is tracked and logged by report()
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        model_name: str,
+        threads_per_worker: Optional[int] = None,
+        store_dir: Optional[str] = None,
+        store_dtype: str = "float32",
+        output_dim: Optional[int] = None,
+        reduction: Optional[str] = None,
+        pca_path: Optional[str] = None,
+        output_dtype: Optional[str] = None,
+        **embedder_kwargs,
+    ):
+        if workers < 1:
+            raise ValueError("EmbeddingPool needs at least one worker.")
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+
+        kwargs = dict(embedder_kwargs)
+        kwargs.update(
+            model_name=model_name,
+            device="cpu",
+            cache_size=0,
+            micro_batch=False,
+            store_dir=None,
+            as_numpy=True,
+            output_dim=0,
+            output_dtype="float32",
+        )
+        self.reducer = DimReducer(
+            mode=reduction or RAGSettings.emb_reduction,
+            output_dim=RAGSettings.emb_output_dim if output_dim is None else output_dim,
+            pca_path=pca_path or RAGSettings.emb_pca_path,
+            dtype=output_dtype or RAGSettings.emb_output_dtype,
+        )
+        self.output_dtype = self.reducer.dtype
+
+        logger.info(
+            f"Starting embedding pool: {workers} workers x {self.threads_per_worker} torch threads"
+        )
+        try:
+            # spawn: torch and forked OpenMP thread pools do not mix well
+            ctx = mp.get_context("spawn")
+            self.pool = ctx.Pool(
+                processes=workers,
+                initializer=_init_worker,
+                initargs=(kwargs, self.threads_per_worker),
+            )
+            full_dim, store_key = self.pool.map(_worker_info, [None])[0]
+            self.dim = self.reducer.out_dim(full_dim)
+        except Exception as e:
+            logger.error(f"Failed to start embedding pool: {e}")
+            raise
+
+        self.store = EmbeddingStore(store_dir, store_key, store_dtype) if store_dir else None
+        self._worker_stats: Dict[int, List[float]] = {}
+        self._started = time.perf_counter()
+
+    def embed_text(self, text: str) -> np.ndarray:
+        """Embed one text on a worker (used for dimension probes)."""
+        return next(self.imap([[text]]))[0]
+
+    def imap(
+        self, batches: Iterable[List[str]], batch_size: int = 32, max_pending: Optional[int] = None
+    ) -> Iterator[np.ndarray]:
+        """
+        Embed an iterable of text batches; yields one 2D array per input
+        batch, in input order. The input is read lazily: only max_pending
+        batches (default 2 per worker) are in the pool at any time.
+        """
+        max_pending = max_pending or 2 * self.workers
+        pending = deque()
+
+        def tasks():
+            for batch in batches:
+                cleaned = normalize_batch(batch)
+                keys, found = None, {}
+                if self.store is not None:
+                    keys = [make_hash_id(c) for c in cleaned]
+                    found = self.store.get_many(keys)
+                    miss_map = {}
+                    for key, text in zip(keys, cleaned):
+                        if key not in found:
+                            miss_map.setdefault(key, text)
+                    misses, miss_texts = list(miss_map), list(miss_map.values())
+                else:
+                    misses, miss_texts = None, cleaned
+                yield (miss_texts, batch_size), (keys, found, misses)
+
+        task_iter = tasks()
+
+        def submit() -> bool:
+            for task, state in task_iter:
+                pending.append((self.pool.apply_async(_embed_shard, (task,)), state))
+                return True
+            return False
+
+        while len(pending) < max_pending and submit():
+            pass
+        while pending:
+            result, (keys, found, misses) = pending.popleft()
+            pid, count, vectors, seconds = result.get()
+            # one result consumed: refill the window before handing it out
+            submit()
+            if count:
+                stats = self._worker_stats.setdefault(pid, [0, 0.0])
+                stats[0] += count
+                stats[1] += seconds
+
+            if keys is None:
+                if vectors is None:
+                    yield np.zeros((0, self.dim), dtype=np.float32)
+                else:
+                    yield self.reducer(vectors)
+                continue
+
+            if misses:
+                self.store.put_many(misses, vectors)
+                found.update(zip(misses, vectors))
+            if not keys:
+                yield np.zeros((0, self.dim), dtype=np.float32)
+                continue
+            yield self.reducer(np.stack([found[k] for k in keys]))
+
+    def stats(self) -> Dict[int, Dict[str, float]]:
+        """Per-worker {texts, seconds, texts_per_sec}, keyed by worker PID."""
+        return {
+            pid: {
+                "texts": texts,
+                "seconds": seconds,
+                "texts_per_sec": (texts / seconds) if seconds else 0.0,
+            }
+            for pid, (texts, seconds) in self._worker_stats.items()
+        }
+
+    def report(self) -> None:
+        wall = time.perf_counter() - self._started
+        total = 0
+        for pid, s in sorted(self.stats().items()):
+            total += s["texts"]
+            logger.info(
+                f"Embedding worker {pid}: {s['texts']} texts in {s['seconds']:.1f}s "
+                f"({s['texts_per_sec']:.1f} texts/s)"
+            )
+        logger.info(
+            f"Embedding pool: {total} texts in {wall:.1f}s wall "
+            f"({(total / wall) if wall else 0.0:.1f} texts/s overall, {self.workers} workers)"
+        )
+
+    def close(self) -> None:
+        self.pool.close()
+        self.pool.join()
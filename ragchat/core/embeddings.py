@@ -1,67 +1,260 @@
-import torch
-from sentence_transformers import SentenceTransformer
-from typing import List
-from ragchat.data.utils import normalize_arabic_text, clean_unicode
+import numpy as np
+from typing import List, Optional, Union
+from ragchat.data.utils import normalize_arabic_text, normalize_batch, make_hash_id
 from ragchat.config import RAGSettings
+from ragchat.core.cache import EmbeddingCache
+from ragchat.core.batching import MicroBatcher
+from ragchat.core.backends import load_backend
+from ragchat.core.reduction import DimReducer
+from ragchat.storage.embedding_store import EmbeddingStore
 from ragchat.logger import logger
 
+# upper bound on texts per bucket, however short they are
+_MAX_BUCKET_BATCH = 256
+
+def _default_device(backend: str) -> str:
+    """CUDA when torch sees a GPU; the ONNX backend is CPU-only and never imports torch."""
+    if backend != "torch":
+        return "cpu"
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
 class TextEmbedder:
     """
-    Wrapper around SentenceTransformer model for generating embeddings.
+    Wrapper around the embedding model (SentenceTransformer in torch by
+    default, or an exported ONNX Runtime graph) for generating embeddings.
     Ensures:
     - consistent normalization
     - correct pooling
     - correct return shape
     - batching for performance
+    - LRU caching of single-text (query) embeddings
+    - optional on-disk store so batch re-runs only encode unseen texts
+    - optional micro-batching of concurrent embed_text calls
+    - length-bucketed batches under a token budget in embed_batch
+    - optional ndarray output (as_numpy=True): contiguous float32 vectors
+      that QdrantIndex converts with one tolist() per upsert batch
+    - optional dimension reduction (Matryoshka truncation or PCA) and
+      float16 output; caches and the embedding store keep full vectors
     """
 
-    def __init__(self, model_name: str = None, device: str = None):
+    def __init__(
+        self,
+        model_name: str = None,
+        device: str = None,
+        cache_size: Optional[int] = None,
+        cache_ttl: Optional[float] = None,
+        store_dir: Optional[str] = None,
+        store_dtype: str = "float32",
+        micro_batch: Optional[bool] = None,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        backend: Optional[str] = None,
+        onnx_dir: Optional[str] = None,
+        onnx_quantized: Optional[bool] = None,
+        token_budget: Optional[int] = None,
+        as_numpy: bool = False,
+        output_dim: Optional[int] = None,
+        reduction: Optional[str] = None,
+        pca_path: Optional[str] = None,
+        output_dtype: Optional[str] = None,
+    ):
         self.model_name = model_name or RAGSettings.emb_model
-        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.backend_name = backend or RAGSettings.emb_backend
+        self.device = device or _default_device(self.backend_name)
+        self.as_numpy = as_numpy
+
+        # cache_size=0 disables the query cache
+        cache_size = RAGSettings.emb_cache_size if cache_size is None else cache_size
+        cache_ttl = RAGSettings.emb_cache_ttl if cache_ttl is None else cache_ttl
+        self.cache = EmbeddingCache(cache_size, cache_ttl) if cache_size > 0 else None
 
         try:
-            logger.info(f"Loading embedding model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name, device=self.device)
+            logger.info(f"Loading embedding model: {self.model_name} (backend={self.backend_name})")
+            self.backend = load_backend(
+                self.backend_name,
+                self.model_name,
+                self.device,
+                onnx_dir=onnx_dir or RAGSettings.emb_onnx_dir,
+                onnx_quantized=onnx_quantized,
+            )
         except Exception as e:
             logger.error(f"Failed to load embedding model '{self.model_name}': {e}")
             raise
 
-    def embed_text(self, text: str) -> List[float]:
+        # persistent content-addressed store, keyed by (model name, text hash);
+        # ONNX / int8 vectors drift slightly, so they get their own namespace
+        self.store_key = self.model_name
+        if self.backend_name != "torch":
+            self.store_key += f"@{self.backend_name}" + ("-int8" if getattr(self.backend, "quantized", False) else "")
+        self.store = EmbeddingStore(store_dir, self.store_key, store_dtype) if store_dir else None
+
+        self.reducer = DimReducer(
+            mode=reduction or RAGSettings.emb_reduction,
+            output_dim=RAGSettings.emb_output_dim if output_dim is None else output_dim,
+            pca_path=pca_path or RAGSettings.emb_pca_path,
+            dtype=output_dtype or RAGSettings.emb_output_dtype,
+        )
+        self.output_dtype = self.reducer.dtype
+        if self.reducer.active:
+            logger.info(
+                f"Embedding output: {self.reducer.mode} to {self.dim} dims, dtype={self.output_dtype}"
+            )
+
+        # embed_batch groups texts of similar token length; 0 keeps dataset order
+        self.token_budget = RAGSettings.emb_token_budget if token_budget is None else token_budget
+
+        # opt-in: concurrent embed_text calls share one model.encode call
+        micro_batch = RAGSettings.emb_micro_batch if micro_batch is None else micro_batch
+        self.batcher = None
+        if micro_batch:
+            self.batcher = MicroBatcher(
+                lambda batch: self._encode(batch, batch_size=len(batch), show_progress_bar=False),
+                max_batch_size=max_batch_size or RAGSettings.emb_micro_batch_size,
+                max_wait_ms=RAGSettings.emb_micro_batch_wait_ms if max_wait_ms is None else max_wait_ms,
+            )
+
+    @property
+    def tokenizer(self):
+        return self.backend.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.backend.max_seq_length
+
+    @property
+    def full_dim(self) -> int:
+        return self.backend.dim
+
+    @property
+    def dim(self) -> int:
+        """Dimension of the vectors this embedder returns (after reduction)."""
+        return self.reducer.out_dim(self.backend.dim)
+
+    def embed_text(self, text: str) -> Union[List[float], np.ndarray]:
         """
         Embed a single piece of text (normalized).
-        Returns a 1D vector list.
+        Returns a 1D vector list (or a read-only 1D array in numpy mode).
+        Repeated texts are served from the LRU cache when enabled; the cache
+        holds the full model vector, reduced on the way out.
         """
         try:
-            clean = normalize_arabic_text(clean_unicode(text))
+            clean = normalize_arabic_text(text)  # no-op for already-normalized text
 
-            emb = self.model.encode(
-                clean,
-                convert_to_numpy=True,
-                normalize_embeddings=True,
-                show_progress_bar=False,
-            )
-            return emb.tolist()
+            emb = self.cache.get(clean) if self.cache is not None else None
+            if emb is None:
+                if self.batcher is not None:
+                    emb = self.batcher.embed(clean)
+                else:
+                    emb = self._encode([clean], batch_size=1, show_progress_bar=False)[0]
+                emb.setflags(write=False)
+                if self.cache is not None:
+                    self.cache.put(clean, emb)
+            out = self.reducer(emb)
+            out.setflags(write=False)
+            return out if self.as_numpy else out.tolist()
         except Exception as e:
             logger.error(f"Embedding single text failed: {e}")
-            return []
+            return np.zeros(0, dtype=np.float32) if self.as_numpy else []
 
-    def embed_batch(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+    def embed_batch(self, texts: List[str], batch_size: int = 32) -> Union[List[List[float]], np.ndarray]:
         """
         Embed a list of texts in batches.
-        Returns a list of vectors.
+        Returns a list of vectors (or a 2D array in numpy mode).
+        With an embedding store, only texts missing from the store are encoded.
         """
         try:
-            cleaned = [normalize_arabic_text(clean_unicode(t)) for t in texts]
-
-            embeddings = self.model.encode(
-                cleaned,
-                batch_size=batch_size,
-                convert_to_numpy=True,
-                normalize_embeddings=True,
-                show_progress_bar=True,
-            )
-            return [e.tolist() for e in embeddings]
-            
+            cleaned = normalize_batch(texts)
+            if not cleaned:
+                return np.zeros((0, self.dim), dtype=np.float32) if self.as_numpy else []
+
+            if self.store is None:
+                embeddings = self._encode_many(cleaned, batch_size, show_progress_bar=True)
+            else:
+                embeddings = self._encode_with_store(cleaned, batch_size)
+
+            embeddings = self.reducer(embeddings)
+            return embeddings if self.as_numpy else embeddings.tolist()
+
         except Exception as e:
             logger.error(f"Batch embedding failed: {e}")
+            if self.as_numpy:
+                return np.zeros((len(texts), 0), dtype=np.float32)  # preserve length
             return [[] for _ in texts]  # preserve length
+
+    def _encode(self, texts: List[str], batch_size: int, show_progress_bar: bool) -> np.ndarray:
+        return self.backend.encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar)
+
+    def _encode_many(self, texts: List[str], batch_size: int, show_progress_bar: bool) -> np.ndarray:
+        if self.token_budget and len(texts) > 1:
+            return self._encode_bucketed(texts, batch_size)
+        return self._encode(texts, batch_size, show_progress_bar)
+
+    def _token_lengths(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer(
+            texts,
+            add_special_tokens=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+        )
+        return np.fromiter((len(ids) for ids in enc["input_ids"]), dtype=np.int64, count=len(texts))
+
+    def _encode_bucketed(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """
+        Sort texts by token length (longest first) and encode them in buckets
+        whose padded size (batch * longest member) stays under token_budget
+        and that hold at most batch_size texts (the caller's memory bound).
+        Results are written back in the original order.
+        """
+        lengths = self._token_lengths(texts)
+        order = np.argsort(-lengths, kind="stable")
+
+        out = None
+        start = 0
+        while start < len(order):
+            longest = max(int(lengths[order[start]]), 1)
+            size = max(1, min(batch_size, _MAX_BUCKET_BATCH, self.token_budget // longest))
+            idx = order[start:start + size]
+
+            vecs = self._encode([texts[i] for i in idx], batch_size=len(idx), show_progress_bar=False)
+            if out is None:
+                out = np.empty((len(texts), vecs.shape[1]), dtype=vecs.dtype)
+            out[idx] = vecs
+            start += size
+
+        return out
+
+    def _encode_with_store(self, cleaned: List[str], batch_size: int) -> np.ndarray:
+        """
+        Look every text up in the embedding store, encode only the misses
+        (each distinct text once) and write them back.
+        """
+        keys = [make_hash_id(c) for c in cleaned]
+        found = self.store.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, cleaned):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            computed = self._encode_many(list(missing.values()), batch_size, show_progress_bar=False)
+            self.store.put_many(list(missing.keys()), computed)
+            found.update(zip(missing.keys(), computed))
+
+        logger.debug(f"Embedding store: {len(cleaned) - len(missing)}/{len(cleaned)} texts reused")
+        return np.stack([found[k] for k in keys])
+
+    def cache_stats(self) -> dict:
+        """Return query-cache counters (empty dict when caching is disabled)."""
+        return self.cache.stats() if self.cache is not None else {}
+
+    def batching_stats(self) -> dict:
+        """Return micro-batching histograms (empty dict when disabled)."""
+        return self.batcher.stats() if self.batcher is not None else {}
+
+    def close(self):
+        """Stop background helpers (the micro-batching thread)."""
+        if self.batcher is not None:
+            self.batcher.close()
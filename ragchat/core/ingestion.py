@@ -0,0 +1,154 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from ragchat.data.utils import normalize_batch
+from ragchat.logger import logger
+
+_DONE = object()
+
+Batch = Tuple[List[str], List[Dict[str, Any]]]
+
+class IngestionPipeline:
+    """
+    Pipelined ingestion: read/normalize -> embed -> upload, overlapped.
+
+    - a reader thread normalizes batches into a bounded queue
+    - the calling thread runs the embed stage (embed_stream), so torch /
+      the embedding pool keep the CPU busy while uploads are in flight
+    - up to upload_workers upserts run concurrently; at most queue_size
+      embedded batches wait for upload, so a slow Qdrant applies
+      backpressure on embedding instead of growing memory
+    - on_commit(batch_no, ids) is called after each upsert returned
+      (wait=True), possibly out of order
+    - run() ends with a barrier: it returns only when every upload has
+      finished, and re-raises the first error of any stage
+    """
+
+    def __init__(
+        self,
+        index,
+        collection: str,
+        embed_stream: Callable[[Iterator[List[str]]], Iterable[Any]],
+        upload_workers: int = 2,
+        queue_size: int = 4,
+        on_commit: Optional[Callable[[int, List[str]], None]] = None,
+    ):
+        if upload_workers < 1 or queue_size < 1:
+            raise ValueError("upload_workers and queue_size must be >= 1.")
+        self.index = index
+        self.collection = collection
+        self.embed_stream = embed_stream
+        self.upload_workers = upload_workers
+        self.queue_size = queue_size
+        self.on_commit = on_commit
+
+        self._error: Optional[BaseException] = None
+        self._error_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.stats: Dict[str, float] = {}
+
+    def _fail(self, e: BaseException) -> None:
+        with self._error_lock:
+            if self._error is None:
+                self._error = e
+        self._stop.set()
+
+    def _read(self, batches: Iterable[Batch], out: queue.Queue) -> None:
+        try:
+            for texts, payloads in batches:
+                if self._stop.is_set():
+                    break
+                out.put((normalize_batch(texts), payloads))
+        except BaseException as e:
+            logger.error(f"Ingestion reader failed: {e}")
+            self._fail(e)
+        finally:
+            out.put(_DONE)
+
+    def _upload(self, batch_no: int, vectors, payloads: List[Dict[str, Any]]) -> None:
+        if self._stop.is_set():
+            return
+        start = time.perf_counter()
+        try:
+            self.index.upsert(name=self.collection, vectors=vectors, payloads=payloads, start_id=None)
+            if self.on_commit is not None:
+                self.on_commit(batch_no, [p["id"] for p in payloads])
+        except BaseException as e:
+            logger.error(f"Ingestion upload of batch {batch_no} failed: {e}")
+            self._fail(e)
+        finally:
+            with self._error_lock:
+                self.stats["upload_seconds"] += time.perf_counter() - start
+
+    def run(self, batches: Iterable[Batch], progress: Optional[Callable[[int], None]] = None) -> Dict[str, float]:
+        """Ingest (texts, payloads) batches; returns timing stats."""
+        self.stats = {"batches": 0, "points": 0, "embed_seconds": 0.0, "upload_seconds": 0.0}
+        self._error = None
+        self._stop.clear()
+        started = time.perf_counter()
+
+        read_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        reader = threading.Thread(target=self._read, args=(batches, read_q), name="ingest-reader", daemon=True)
+        reader.start()
+
+        pending_payloads: "queue.SimpleQueue" = queue.SimpleQueue()
+
+        def texts_from_queue() -> Iterator[List[str]]:
+            while not self._stop.is_set():
+                item = read_q.get()
+                if item is _DONE:
+                    return
+                texts, payloads = item
+                pending_payloads.put(payloads)
+                yield texts
+
+        in_flight = threading.BoundedSemaphore(self.queue_size + self.upload_workers)
+        executor = ThreadPoolExecutor(max_workers=self.upload_workers, thread_name_prefix="ingest-upload")
+        try:
+            stream = iter(self.embed_stream(texts_from_queue()))
+            batch_no = 0
+            while not self._stop.is_set():
+                t0 = time.perf_counter()
+                try:
+                    vectors = next(stream)
+                except StopIteration:
+                    break
+                self.stats["embed_seconds"] += time.perf_counter() - t0
+                payloads = pending_payloads.get()
+
+                in_flight.acquire()  # backpressure: wait for an upload slot
+                future = executor.submit(self._upload, batch_no, vectors, payloads)
+                future.add_done_callback(lambda _: in_flight.release())
+                if progress is not None:
+                    future.add_done_callback(lambda _, n=len(payloads): progress(n))
+
+                self.stats["batches"] += 1
+                self.stats["points"] += len(payloads)
+                batch_no += 1
+        except BaseException as e:
+            logger.error(f"Ingestion embed stage failed: {e}")
+            self._fail(e)
+        finally:
+            # barrier: every submitted upload has finished before we return
+            executor.shutdown(wait=True)
+            self._stop.set()
+            while reader.is_alive():
+                try:
+                    read_q.get_nowait()  # unblock a reader waiting on a full queue
+                except queue.Empty:
+                    pass
+                reader.join(timeout=0.05)
+
+        if self._error is not None:
+            raise self._error
+
+        wall = time.perf_counter() - started
+        self.stats["wall_seconds"] = wall
+        logger.info(
+            f"Ingestion pipeline: {self.stats['points']} points in {self.stats['batches']} batches, "
+            f"embed {self.stats['embed_seconds']:.1f}s + upload {self.stats['upload_seconds']:.1f}s "
+            f"-> {wall:.1f}s wall ({self.upload_workers} upload workers)"
+        )
+        return self.stats
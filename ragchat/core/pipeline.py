@@ -2,7 +2,9 @@ from typing import List, Dict, Any, Optional
 from ragchat.core.embeddings import TextEmbedder
 from ragchat.core.retriever import Retriever
 from ragchat.core.generator import Generator
+from ragchat.core.registry import get_embedder, get_generator
 from ragchat.config import RAGSettings
+from ragchat.data.utils import normalize_arabic_text, mark_normalized
 from ragchat.logger import logger
 
 class RagPipeline:
@@ -21,9 +23,9 @@ class RagPipeline:
         top_k: Optional[int] = None,
     ):
         try:
-            self.embedder = embedder or TextEmbedder(RAGSettings.emb_model)
+            self.embedder = embedder or get_embedder(RAGSettings.emb_model)
             self.retriever = retriever
-            self.generator = generator or Generator(RAGSettings.gen_model)
+            self.generator = generator or get_generator(RAGSettings.gen_model)
             self.top_k = top_k or RAGSettings.top_k
             if self.retriever is None:
                 raise ValueError("Retriever must be provided to RagPipeline.")
@@ -36,16 +38,22 @@ class RagPipeline:
             logger.error(f"Failed to initialize RagPipeline: {e}")
             raise
 
-    def answer(self, question: str) -> Dict[str, Any]:
+    def answer(self, question: str, contexts: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """
         Execute the full RAG flow:
-        1. Retrieve top-k contexts
+        1. Retrieve top-k contexts (skipped when contexts are given, e.g.
+           from Retriever.retrieve_batch)
         2. Generate answer from Gemini
         3. Return both answer + contexts
         """
         try:
+            # Normalize once; retriever, embedder and generator skip
+            # re-normalizing a NormalizedText
+            clean_question = normalize_arabic_text(question)
+
             # Retrieve
-            contexts = self.retriever.retrieve(question)
+            if contexts is None:
+                contexts = self.retriever.retrieve(clean_question)
             context_texts = []
             for c in contexts:
                 txt = (
@@ -55,11 +63,12 @@ class RagPipeline:
                     or None
                 )
                 if txt:
-                    trimmed = txt[:350]
+                    # stored chunks were normalized at ingestion time
+                    trimmed = mark_normalized(txt[:350].rstrip())
                     context_texts.append(trimmed)
 
             # Generate
-            answer = self.generator.generate(question, contexts=context_texts)
+            answer = self.generator.generate(clean_question, contexts=context_texts)
 
             return {
                 "question": question,
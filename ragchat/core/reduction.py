@@ -0,0 +1,94 @@
+from typing import Optional
+import numpy as np
+from ragchat.logger import logger
+
+REDUCTION_MODES = ("truncate", "pca")
+OUTPUT_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+def _l2_normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.clip(norms, 1e-12, None)
+
+def fit_pca(vectors: np.ndarray, max_dim: int, path: str) -> None:
+    """
+    Fit a PCA projection on sample embeddings and save it as .npz
+    (mean + components sorted by explained variance). Any output_dim up to
+    max_dim can then be served from the same file.
+    """
+    x = np.asarray(vectors, dtype=np.float64)
+    if max_dim > min(x.shape):
+        raise ValueError(f"Cannot fit {max_dim} PCA components from a {x.shape} sample.")
+
+    mean = x.mean(axis=0)
+    _, s, vt = np.linalg.svd(x - mean, full_matrices=False)
+    explained = (s ** 2) / np.sum(s ** 2)
+
+    np.savez(
+        path,
+        mean=mean.astype(np.float32),
+        components=vt[:max_dim].astype(np.float32),
+        explained_variance_ratio=explained[:max_dim].astype(np.float32),
+    )
+    logger.info(
+        f"Saved PCA projection to {path} ({max_dim} components, "
+        f"{explained[:max_dim].sum():.2%} variance kept)"
+    )
+
+class DimReducer:
+    """
+    Post-processing of model embeddings before they leave TextEmbedder.
+
+    - 'truncate': Matryoshka-style, keep the first output_dim dims and re-normalize
+    - 'pca'     : project with an offline-fitted PCA (see fit_pca) and re-normalize
+    - dtype     : 'float32' or 'float16' output
+
+    output_dim=0/None keeps the full model dimension.
+    """
+
+    def __init__(
+        self,
+        mode: str = "truncate",
+        output_dim: Optional[int] = None,
+        pca_path: Optional[str] = None,
+        dtype: str = "float32",
+    ):
+        if mode not in REDUCTION_MODES:
+            raise ValueError(f"Unknown reduction mode '{mode}' (use one of {REDUCTION_MODES}).")
+        if dtype not in OUTPUT_DTYPES:
+            raise ValueError(f"Unsupported output dtype '{dtype}' (use float32 or float16).")
+
+        self.mode = mode
+        self.output_dim = output_dim or None
+        self.dtype = dtype
+        self._np_dtype = OUTPUT_DTYPES[dtype]
+        self.mean = None
+        self.components = None
+
+        if self.output_dim and mode == "pca":
+            if not pca_path:
+                raise ValueError("PCA reduction needs a fitted projection file (EMB_PCA_PATH).")
+            data = np.load(pca_path)
+            if self.output_dim > data["components"].shape[0]:
+                raise ValueError(
+                    f"PCA file {pca_path} has {data['components'].shape[0]} components, "
+                    f"cannot project to {self.output_dim}."
+                )
+            self.mean = data["mean"]
+            self.components = np.ascontiguousarray(data["components"][: self.output_dim].T)
+
+    @property
+    def active(self) -> bool:
+        return bool(self.output_dim) or self.dtype != "float32"
+
+    def out_dim(self, input_dim: int) -> int:
+        return min(self.output_dim, input_dim) if self.output_dim else input_dim
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        """Reduce a 1D vector or a 2D batch."""
+        x = np.asarray(x, dtype=np.float32)
+        if self.output_dim:
+            if self.mode == "truncate":
+                x = _l2_normalize(x[..., : self.output_dim])
+            else:
+                x = _l2_normalize((x - self.mean) @ self.components)
+        return np.ascontiguousarray(x, dtype=self._np_dtype)
@@ -0,0 +1,154 @@
+import atexit
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+from ragchat.config import RAGSettings
+from ragchat.logger import logger
+
+# LocalIndex constructor options get_index accepts with VECTOR_BACKEND=local
+_LOCAL_INDEX_OPTIONS = ("root", "ivf_lists", "ivf_probe", "ivf_min_rows")
+
+def _freeze(config: Dict[str, Any]) -> Tuple:
+    return tuple(sorted(config.items()))
+
+class ModelRegistry:
+    """
+    Process-wide registry of heavy components (embedders, Qdrant clients,
+    generators, document stores).
+
+    - instances are created lazily on first use and then shared
+    - keyed by (kind, configuration), so identical configs reuse one model
+    - creation is thread-safe and happens once per key, even under
+      concurrent first requests
+    - warmup() / teardown() hooks for servers and CLIs
+    """
+
+    def __init__(self):
+        self._instances: Dict[Hashable, Any] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._local_fallback_logged = False
+
+    def _get(self, kind: str, factory: Callable[..., Any], config: Dict[str, Any]) -> Any:
+        key = (kind, _freeze(config))
+        instance = self._instances.get(key)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            instance = self._instances.get(key)
+            if instance is None:
+                logger.info(f"Registry: creating {kind} {dict(config)}")
+                instance = factory(**config)
+                self._instances[key] = instance
+        return instance
+
+    def embedder(self, model_name: str = None, **kwargs):
+        """
+        Shared TextEmbedder; as_numpy defaults to True. Every caller of the
+        shared embedder (Retriever, QdrantIndex / LocalIndex upserts, the
+        ingestion pipeline and CLIs, API ingestion) accepts float32 arrays;
+        pass as_numpy=False for plain lists.
+        """
+        from ragchat.core.embeddings import TextEmbedder
+
+        kwargs.setdefault("as_numpy", True)
+        return self._get("embedder", TextEmbedder, dict(model_name=model_name or RAGSettings.emb_model, **kwargs))
+
+    def index(self, url: str = None, api_key: str = None, **kwargs):
+        if RAGSettings.vector_backend == "local":
+            from ragchat.storage.local_index import LocalIndex
+
+            unsupported = sorted(set(kwargs) - set(_LOCAL_INDEX_OPTIONS))
+            if unsupported:
+                raise ValueError(
+                    f"VECTOR_BACKEND=local: QdrantIndex options {unsupported} have no LocalIndex equivalent."
+                )
+            config = dict(
+                root=RAGSettings.local_index_dir,
+                ivf_lists=RAGSettings.local_ivf_lists,
+                ivf_probe=RAGSettings.local_ivf_probe,
+            )
+            config.update(kwargs)
+            if (url or api_key) and not self._local_fallback_logged:
+                self._local_fallback_logged = True
+                logger.info(f"VECTOR_BACKEND=local: ignoring the Qdrant url / api_key, using LocalIndex at {config['root']}")
+            return self._get("index", LocalIndex, config)
+
+        from ragchat.storage.qdrant_index import QdrantIndex
+
+        config = dict(url=url or RAGSettings.qdrant_url, api_key=api_key or RAGSettings.qdrant_api_key, **kwargs)
+        return self._get("index", QdrantIndex, config)
+
+    def generator(self, model_name: str = None, **kwargs):
+        from ragchat.core.generator import Generator
+
+        return self._get("generator", Generator, dict(model_name=model_name or RAGSettings.gen_model, **kwargs))
+
+    def doc_store(self, path: str = None):
+        from ragchat.storage.doc_store import DocStore
+
+        return self._get("doc_store", DocStore, dict(path=path or RAGSettings.doc_store_path))
+
+    def warmup(self) -> None:
+        """
+        Run one forward pass per embedder and one round trip per Qdrant
+        client, so the first real request does not pay for lazy init.
+        """
+        for (kind, _), instance in list(self._instances.items()):
+            try:
+                if kind == "embedder":
+                    instance.embed_text("تهيئة")
+                elif kind == "index" and hasattr(instance, "client"):
+                    instance.client.get_collections()
+            except Exception as e:
+                logger.warning(f"Registry warmup failed for {kind}: {e}")
+
+    def teardown(self) -> None:
+        """Close clients / background threads and forget all instances."""
+        with self._lock:
+            items = list(self._instances.items())
+            self._instances.clear()
+            self._key_locks.clear()
+
+        for (kind, _), instance in items:
+            try:
+                if kind == "embedder":
+                    instance.close()
+                elif kind == "index":
+                    instance.close()
+                elif kind == "doc_store":
+                    instance.close()
+            except Exception as e:
+                logger.warning(f"Registry teardown failed for {kind}: {e}")
+
+registry = ModelRegistry()
+atexit.register(registry.teardown)
+
+def get_embedder(model_name: str = None, **kwargs):
+    """Shared TextEmbedder for this configuration (numpy mode by default)."""
+    return registry.embedder(model_name, **kwargs)
+
+def get_index(url: str = None, api_key: str = None, **kwargs):
+    """
+    Shared vector index: QdrantIndex for this URL / API key, or the
+    in-process LocalIndex when VECTOR_BACKEND=local (url / api_key are then
+    ignored, with one log line; Qdrant-only kwargs raise ValueError).
+    """
+    return registry.index(url, api_key, **kwargs)
+
+def get_generator(model_name: str = None, **kwargs):
+    """Shared Gemini Generator for this model."""
+    return registry.generator(model_name, **kwargs)
+
+def get_doc_store(path: str = None):
+    """Shared SQLite DocStore for this path."""
+    return registry.doc_store(path)
+
+def warmup() -> None:
+    registry.warmup()
+
+def teardown() -> None:
+    registry.teardown()
@@ -1,20 +1,53 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence
 from ragchat.core.embeddings import TextEmbedder
-from ragchat.storage.qdrant_index import QdrantIndex
+from ragchat.storage.vector_store import VectorStore
 from ragchat.data.utils import normalize_arabic_text
+from ragchat.config import RAGSettings
 from ragchat.logger import logger
 
+# payload fields the pipeline needs to build prompts
+CHUNK_FIELDS = ("context_text", "chunk_index")
+# chunk plus the example it came from (stored with chat history)
+SOURCE_FIELDS = CHUNK_FIELDS + ("question", "answer_text")
+# references used to hydrate compact payloads from the DocStore
+_REFERENCE_FIELDS = ("doc_id", "original_example_id")
+
 class Retriever:
     """
-    Retrieves top similar context chunks from Qdrant based on the user's question embedding.
+    Retrieves top similar context chunks from a VectorStore (Qdrant or the
+    local index) based on the user's question embedding.
+    Compact payloads (doc_id / original_example_id references) are hydrated
+    from the DocStore in one batched lookup.
+
+    - payload_fields: payload keys fetched from Qdrant (CHUNK_FIELDS by
+      default); None fetches full payloads, e.g. for debugging panels
+    - raw_context / question / answer are only hydrated when requested
     """
-    def __init__(self, embedder: TextEmbedder, index: QdrantIndex,
-                 collection: str, top_k: int = 5):
+    def __init__(self, embedder: TextEmbedder, index: VectorStore,
+                 collection: str, top_k: int = 5, doc_store=None,
+                 payload_fields: Optional[Sequence[str]] = CHUNK_FIELDS):
         self.embedder = embedder
         self.index = index
         self.collection = collection
         self.top_k = top_k
-        logger.info(f"Retriever initialized with collection='{collection}', top_k={top_k}")
+        self._doc_store = doc_store
+        self.payload_fields = None if payload_fields is None else tuple(payload_fields)
+        logger.info(
+            f"Retriever initialized with collection='{collection}', top_k={top_k}, "
+            f"payload={'full' if self.payload_fields is None else ','.join(self.payload_fields)}"
+        )
+
+    def _wants(self, *fields: str) -> bool:
+        return self.payload_fields is None or any(f in self.payload_fields for f in fields)
+
+    def _request_fields(self) -> Optional[List[str]]:
+        """Payload projection sent to Qdrant, plus DocStore references when hydrating."""
+        if self.payload_fields is None:
+            return None
+        fields = list(self.payload_fields)
+        if self._wants("raw_context", "question", "answer_text"):
+            fields += [f for f in _REFERENCE_FIELDS if f not in fields]
+        return fields
 
     def retrieve(self, query: str) -> List[Dict[str, Any]]:
         """
@@ -27,27 +60,104 @@ class Retriever:
         try:
             clean_query = normalize_arabic_text(query)
             vector = self.embedder.embed_text(clean_query)
-            if not vector:
+            if vector is None or len(vector) == 0:
                 logger.error("Embedding failed — vector is empty.")
                 return []
             results = self.index.search(
                 name=self.collection,
                 vector=vector,
-                top_k=self.top_k
+                top_k=self.top_k,
+                payload_fields=self._request_fields(),
             )
-            formatted = []
-            for hit in results:
-                payload = hit.payload or {}
-
-                formatted.append({
-                    "score": hit.score,
-                    "chunk": payload.get("context_text"),
-                    "chunk_index": payload.get("chunk_index"),
-                    "raw_context": payload.get("raw_context"),
-                    "question": payload.get("question"),
-                    "answer": payload.get("answer_text"),
-                })
+            formatted = self._format(results)
+            self._hydrate(formatted, [hit.payload or {} for hit in results])
             return formatted
         except Exception as e:
             logger.error(f"Retrieval failed for query '{query}': {e}")
             return []
+
+    def retrieve_batch(self, queries: List[str], batch_size: int = 256) -> List[List[Dict[str, Any]]]:
+        """
+        Retrieve contexts for many queries at once:
+        - normalize them
+        - embed them in one embed_batch call
+        - search Qdrant with batched requests (batch_size queries each)
+        - hydrate all hits with one DocStore lookup
+        Returns one ranked context list per query, in input order.
+        """
+        if not queries:
+            return []
+        try:
+            clean_queries = [normalize_arabic_text(q) for q in queries]
+            vectors = self.embedder.embed_batch(clean_queries)
+            if len(vectors) != len(queries) or any(len(v) == 0 for v in vectors):
+                logger.error("Batch embedding failed — empty vectors.")
+                return [[] for _ in queries]
+            results = self.index.search_batch(
+                name=self.collection,
+                vectors=vectors,
+                top_k=self.top_k,
+                batch_size=batch_size,
+                payload_fields=self._request_fields(),
+            )
+            batches = [self._format(hits) for hits in results]
+            self._hydrate(
+                [item for formatted in batches for item in formatted],
+                [hit.payload or {} for hits in results for hit in hits],
+            )
+            return batches
+        except Exception as e:
+            logger.error(f"Batch retrieval failed for {len(queries)} queries: {e}")
+            return [[] for _ in queries]
+
+    @staticmethod
+    def _format(results) -> List[Dict[str, Any]]:
+        formatted = []
+        for hit in results:
+            payload = hit.payload or {}
+
+            formatted.append({
+                "score": hit.score,
+                "chunk": payload.get("context_text"),
+                "chunk_index": payload.get("chunk_index"),
+                "raw_context": payload.get("raw_context"),
+                "question": payload.get("question"),
+                "answer": payload.get("answer_text"),
+            })
+        return formatted
+
+    @property
+    def doc_store(self):
+        if self._doc_store is None:
+            from ragchat.core.registry import get_doc_store
+
+            self._doc_store = get_doc_store(RAGSettings.doc_store_path)
+        return self._doc_store
+
+    def _hydrate(self, formatted: List[Dict[str, Any]], payloads: List[Dict[str, Any]]) -> None:
+        """Fill the requested raw_context / question / answer of compact payloads from the DocStore."""
+        want_raw = self._wants("raw_context")
+        want_example = self._wants("question", "answer_text")
+        compact = [
+            (item, payload) for item, payload in zip(formatted, payloads)
+            if payload.get("doc_id")
+            and ((want_raw and item["raw_context"] is None) or (want_example and item["question"] is None))
+        ]
+        if not compact:
+            return
+        try:
+            examples, docs = {}, {}
+            if want_example:
+                examples = self.doc_store.get_examples(p.get("original_example_id") for _, p in compact)
+            if want_raw:
+                docs = self.doc_store.get_documents(p["doc_id"] for _, p in compact)
+        except Exception as e:
+            logger.error(f"Document store lookup failed: {e}")
+            return
+
+        for item, payload in compact:
+            item["raw_context"] = item["raw_context"] or docs.get(payload["doc_id"])
+            example: Optional[Dict[str, Any]] = examples.get(payload.get("original_example_id"))
+            if example:
+                item["question"] = item["question"] or example["question"]
+                item["answer"] = item["answer"] or example["answer_text"]
@@ -0,0 +1,193 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from ragchat.logger import logger
+
+MERGE_FIELDS = ("original_example_id", "question")
+
+def _new_record(payload: Dict[str, Any], merge_fields: Sequence[str]) -> Dict[str, Any]:
+    merged = dict(payload)
+    for field in merge_fields:
+        value = payload.get(field)
+        merged[f"{field}s"] = list(payload.get(f"{field}s") or ([] if value is None else [value]))
+    return merged
+
+def _merge_into(merged: Dict[str, Any], payload: Dict[str, Any], merge_fields: Sequence[str]) -> None:
+    for field in merge_fields:
+        for value in payload.get(f"{field}s") or [payload.get(field)]:
+            if value is not None and value not in merged[f"{field}s"]:
+                merged[f"{field}s"].append(value)
+
+def dedup_exact(
+    texts: List[str],
+    payloads: List[Dict[str, Any]],
+    merge_fields: Sequence[str] = MERGE_FIELDS,
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Collapse records that share the same payload 'hash' (make_hash_id of the
+    text) before embedding.
+
+    - the first occurrence is kept, in input order, with its payload as is
+    - every field in merge_fields is also collected from all copies into a
+      list under '<field>s' (e.g. original_example_ids, questions), without
+      duplicates, so no source reference is lost
+    - logs how many encoder calls the dedup saved
+    """
+    keep: Dict[str, int] = {}
+    out_texts: List[str] = []
+    out_payloads: List[Dict[str, Any]] = []
+
+    for text, payload in zip(texts, payloads):
+        key = payload["hash"]
+        row = keep.get(key)
+        if row is None:
+            keep[key] = len(out_texts)
+            out_texts.append(text)
+            out_payloads.append(_new_record(payload, merge_fields))
+        else:
+            _merge_into(out_payloads[row], payload, merge_fields)
+
+    saved = len(texts) - len(out_texts)
+    if texts:
+        logger.info(
+            f"Exact dedup: {len(texts)} -> {len(out_texts)} unique texts "
+            f"({saved} encoder calls saved, {saved / len(texts):.1%})"
+        )
+    return out_texts, out_payloads
+
+def dedup_near(
+    texts: List[str],
+    payloads: List[Dict[str, Any]],
+    index,
+    merge_fields: Sequence[str] = MERGE_FIELDS,
+    log: bool = True,
+    late: Optional[Dict[str, Dict[str, List[Any]]]] = None,
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Drop records whose text is a near-duplicate (NearDuplicateIndex) of an
+    earlier record or of a text already in the index.
+
+    - sources of a dropped record are merged into the kept record when it is
+      part of this call, and the kept payload records 'near_duplicates'
+      (hash ids)
+    - when the kept text is outside this call (an earlier batch of a stream,
+      or a previous run of the same collection), its hash maps to the
+      dropped sources in late; merge_late_sources() adds them to the stored
+      point once it is written. Without late they are dropped unmerged.
+    - a record whose own hash is already indexed is kept and left to the
+      existing-id / checkpoint filters
+    - log=False for per-batch use on a stream
+    """
+    keep: Dict[str, int] = {}
+    out_texts: List[str] = []
+    out_payloads: List[Dict[str, Any]] = []
+    skipped = 0
+
+    for text, payload in zip(texts, payloads):
+        key = payload["hash"]
+        match: Optional[Tuple[str, float]] = index.check_and_add(key, text)
+        if match is None:
+            keep[key] = len(out_texts)
+            out_texts.append(text)
+            out_payloads.append(_new_record(payload, merge_fields))
+            continue
+
+        skipped += 1
+        row = keep.get(match[0])
+        if row is not None:
+            merged = out_payloads[row]
+        elif late is not None:
+            merged = late.get(match[0])
+            if merged is None:
+                merged = late[match[0]] = {f"{field}s": [] for field in merge_fields}
+        else:
+            continue
+        _merge_into(merged, payload, merge_fields)
+        merged.setdefault("near_duplicates", []).append(key)
+
+    if texts and log:
+        logger.info(
+            f"Near-duplicate dedup (threshold={index.threshold}): {len(texts)} -> {len(out_texts)} texts "
+            f"({skipped} near-duplicates skipped, {skipped / len(texts):.1%})"
+        )
+    return out_texts, out_payloads
+
+def merge_late_sources(
+    index,
+    collection: str,
+    late: Dict[str, Dict[str, List[Any]]],
+    merge_fields: Sequence[str] = MERGE_FIELDS,
+    batch_size: int = 256,
+) -> int:
+    """
+    Add the sources dedup_near collected in late to the stored points they
+    belong to (point id = hash, as in the ingestion payloads): the
+    '<field>s' and 'near_duplicates' lists are extended, never replaced.
+    Call after the points are written. Returns the number of points updated.
+    """
+    fields = list(merge_fields) + [f"{f}s" for f in merge_fields] + ["near_duplicates"]
+    keys = list(late)
+    updated = 0
+    for start in range(0, len(keys), batch_size):
+        part = keys[start:start + batch_size]
+        stored = index.get_payloads(collection, part, payload_fields=fields)
+        updates = {}
+        for key, payload in stored.items():
+            merged = _new_record(payload, merge_fields)
+            _merge_into(merged, late[key], merge_fields)
+            near = list(payload.get("near_duplicates") or [])
+            near.extend(k for k in late[key].get("near_duplicates", []) if k not in near)
+            updates[key] = {f"{f}s": merged[f"{f}s"] for f in merge_fields}
+            updates[key]["near_duplicates"] = near
+        if updates:
+            index.set_payloads(collection, updates)
+            updated += len(updates)
+        missing = len(part) - len(stored)
+        if missing:
+            logger.warning(f"{missing} near-duplicate targets are not stored in '{collection}'; their sources are dropped")
+    if late:
+        logger.info(f"Merged near-duplicate sources into {updated} stored points of '{collection}'")
+    return updated
+
+def collect_sources(
+    records: Iterable[Tuple[str, Dict[str, Any]]],
+    merge_fields: Sequence[str] = MERGE_FIELDS,
+) -> Dict[str, Dict[str, List[Any]]]:
+    """
+    First pass of streaming exact dedup: hash -> merged '<field>s' lists,
+    from light (hash, {field: value}) records. Only hashes and source
+    references are kept in memory, not texts or payloads.
+    """
+    sources: Dict[str, Dict[str, List[Any]]] = {}
+    total = 0
+    for key, fields in records:
+        total += 1
+        entry = sources.get(key)
+        if entry is None:
+            sources[key] = _new_record(fields, merge_fields)
+        else:
+            _merge_into(entry, fields, merge_fields)
+
+    saved = total - len(sources)
+    if total:
+        logger.info(
+            f"Exact dedup: {total} -> {len(sources)} unique texts "
+            f"({saved} encoder calls saved, {saved / total:.1%})"
+        )
+    return {key: {f"{f}s": entry[f"{f}s"] for f in merge_fields} for key, entry in sources.items()}
+
+def dedup_stream(
+    items: Iterable[Tuple[str, Dict[str, Any]]],
+    sources: Dict[str, Dict[str, List[Any]]],
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Second pass of streaming exact dedup: yield the first occurrence of each
+    hash with the merged source lists from collect_sources; drop the rest.
+    """
+    seen = set()
+    for text, payload in items:
+        key = payload["hash"]
+        if key in seen:
+            continue
+        seen.add(key)
+        merged = dict(payload)
+        merged.update(sources.get(key, {}))
+        yield text, merged
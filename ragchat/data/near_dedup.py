@@ -0,0 +1,235 @@
+import os
+import tempfile
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from ragchat.data.utils import normalize_arabic_text
+from ragchat.logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are only coordinated within one process
+    fcntl = None
+
+# Mersenne prime 2^31 - 1: (a * x + b) stays below 2^63 for 32-bit x
+_PRIME = np.uint64((1 << 31) - 1)
+_PUNCT_TABLE = {ord(c): " " for c in "،؛؟.,;:!?\"'()[]{}«»-_/\\|*#…"}
+
+def _lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) with bands * rows <= num_perm whose LSH threshold
+    (1 / bands) ** (1 / rows) is closest to the target similarity.
+    """
+    best, best_err = (num_perm, 1), float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        err = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
+def index_path_for(path: str, collection: str) -> str:
+    """
+    Near-duplicate index file of one collection: '{collection}' in path is
+    replaced, otherwise the collection name is added before the extension
+    (data/near_dup_index.npz -> data/near_dup_index.<collection>.npz).
+    """
+    if "{collection}" in path:
+        return path.format(collection=collection)
+    root, ext = os.path.splitext(path)
+    return f"{root}.{collection}{ext or '.npz'}"
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index for near-duplicate chunk detection.
+
+    - texts are normalized, punctuation is dropped, and the remaining words
+      are turned into overlapping word shingles
+    - each text gets a num_perm MinHash signature (numpy, vectorized)
+    - signatures are split into LSH bands; texts sharing any band bucket are
+      candidates, and a candidate counts as a duplicate when its estimated
+      Jaccard similarity is >= threshold
+    - save()/load() persist keys + signatures (.npz), band tables are rebuilt;
+      save() merges signatures other processes saved to the same file in
+      the meantime, under an exclusive flock on <path>.lock
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        shingle_size: int = 3,
+        seed: int = 1,
+    ):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("Near-duplicate threshold must be in (0, 1].")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.bands, self.rows = _lsh_params(num_perm, threshold)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_PRIME), size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, int(_PRIME), size=num_perm).astype(np.uint64)
+
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._signatures: List[np.ndarray] = []
+        self._tables: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(self.bands)]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def _shingles(self, text: str) -> Set[str]:
+        words = normalize_arabic_text(text).translate(_PUNCT_TABLE).split()
+        k = self.shingle_size
+        if len(words) <= k:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (uint64, num_perm) of a text's word shingles."""
+        shingles = self._shingles(text)
+        if not shingles:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+
+        x = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) & 0x7FFFFFFF for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        hashed = (np.outer(x, self._a) + self._b) % _PRIME
+        return hashed.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        r = self.rows
+        return [signature[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def _query(self, signature: np.ndarray) -> Optional[Tuple[str, float]]:
+        candidates = set()
+        for table, band in zip(self._tables, self._band_keys(signature)):
+            candidates.update(table.get(band, ()))
+        best = None
+        for row in candidates:
+            similarity = float(np.mean(self._signatures[row] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (self._keys[row], similarity)
+        return best
+
+    def _add(self, key: str, signature: np.ndarray) -> None:
+        row = len(self._keys)
+        self._keys.append(key)
+        self._rows[key] = row
+        self._signatures.append(signature)
+        for table, band in zip(self._tables, self._band_keys(signature)):
+            table[band].append(row)
+
+    def query(self, text: str) -> Optional[Tuple[str, float]]:
+        """Best indexed (key, estimated similarity) above threshold, or None."""
+        signature = self.signature(text)
+        with self._lock:
+            return self._query(signature)
+
+    def add(self, key: str, text: str) -> None:
+        signature = self.signature(text)
+        with self._lock:
+            if key not in self._rows:
+                self._add(key, signature)
+
+    def check_and_add(self, key: str, text: str) -> Optional[Tuple[str, float]]:
+        """
+        Atomically look up a text and index it when it is new.
+        Returns the (key, similarity) of another text it duplicates, or None
+        if it was added. A key that is already indexed also returns None:
+        the same text is not a duplicate of itself, and whether its vector
+        is stored is for the existing-id / checkpoint filters to decide.
+        """
+        signature = self.signature(text)
+        with self._lock:
+            if key in self._rows:
+                return None
+            match = self._query(signature)
+            if match is None:
+                self._add(key, signature)
+            return match
+
+    def _merge_saved(self, path: str) -> int:
+        """Add signatures saved to path (by other processes) that are not indexed here."""
+        if not os.path.exists(path):
+            return 0
+        data = np.load(path, allow_pickle=True)
+        if [int(v) for v in data["params"]] != [self.num_perm, self.shingle_size, self.seed]:
+            logger.warning(f"Near-duplicate index {path} uses other MinHash params; overwriting it")
+            return 0
+        added = 0
+        with self._lock:
+            for key, signature in zip(data["keys"], data["signatures"]):
+                if str(key) not in self._rows:
+                    self._add(str(key), signature)
+                    added += 1
+        return added
+
+    def save(self, path: str) -> None:
+        dirname = os.path.dirname(path) or "."
+        os.makedirs(dirname, exist_ok=True)
+        with open(f"{path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                merged = self._merge_saved(path)
+                with self._lock:
+                    keys = np.array(self._keys, dtype=object)
+                    signatures = (
+                        np.stack(self._signatures) if self._signatures
+                        else np.zeros((0, self.num_perm), dtype=np.uint64)
+                    )
+                fd, tmp = tempfile.mkstemp(dir=dirname, prefix=os.path.basename(path), suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        np.savez(
+                            f,
+                            keys=keys,
+                            signatures=signatures,
+                            params=np.array([self.num_perm, self.shingle_size, self.seed], dtype=np.int64),
+                            threshold=np.array(self.threshold),
+                        )
+                    os.replace(tmp, path)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        logger.info(f"Saved near-duplicate index ({len(keys)} texts, {merged} merged from disk) to {path}")
+
+    @classmethod
+    def load(cls, path: str, threshold: Optional[float] = None) -> "NearDuplicateIndex":
+        data = np.load(path, allow_pickle=True)
+        num_perm, shingle_size, seed = (int(v) for v in data["params"])
+        index = cls(
+            threshold=float(data["threshold"]) if threshold is None else threshold,
+            num_perm=num_perm,
+            shingle_size=shingle_size,
+            seed=seed,
+        )
+        for key, signature in zip(data["keys"], data["signatures"]):
+            index._add(str(key), signature)
+        logger.info(f"Loaded near-duplicate index ({len(index)} texts) from {path}")
+        return index
+
+    @classmethod
+    def load_or_create(cls, path: Optional[str], threshold: float = 0.85, **kwargs) -> "NearDuplicateIndex":
+        if path and os.path.exists(path):
+            try:
+                return cls.load(path, threshold=threshold)
+            except Exception as e:
+                logger.warning(f"Failed to load near-duplicate index {path}: {e}; starting empty")
+        return cls(threshold=threshold, **kwargs)
@@ -1,9 +1,25 @@
+import glob
+import hashlib
+import json
+import os
+from functools import partial
 from datasets import load_from_disk, DatasetDict
-from typing import Dict, Any, List
-from ragchat.data.utils import normalize_arabic_text, split_into_sentences, chunk_sentences
+from typing import Dict, Any, List, Optional
+from ragchat.data.utils import (
+    normalize_arabic_text,
+    normalize_batch,
+    split_into_sentences,
+    chunk_sentences,
+    iter_token_chunks,
+    make_token_counter,
+    fit_token_budget,
+)
 from ragchat.config import RAGSettings
 from ragchat.logger import logger
 
+# bump when preprocessing output changes, to invalidate cached shards
+PREPROCESS_VERSION = "4"
+
 
 def preprocess_example(example: Dict[str, Any], group_size: int = 5) -> Dict[str, Any]:
     """
@@ -41,14 +57,178 @@ def preprocess_example(example: Dict[str, Any], group_size: int = 5) -> Dict[str
 
 
 
+def _token_chunks(contexts: List[str], tokenizer, max_tokens: int, overlap_tokens: int) -> List[List[str]]:
+    """
+    Token-budget chunking for a batch of contexts. All sentences of the
+    batch are tokenized in one tokenizer call, then packed per context.
+    """
+    sentences = [split_into_sentences(c) for c in contexts]
+    unique = list({s: None for sents in sentences for s in sents})
+    lengths = {}
+    if unique:
+        ids = tokenizer(unique, add_special_tokens=False)["input_ids"]
+        lengths = {s: len(t) for s, t in zip(unique, ids)}
+
+    fallback = make_token_counter(tokenizer)  # word pieces of over-long sentences
+    count = lambda text: lengths[text] if text in lengths else fallback(text)
+    return [list(iter_token_chunks(sents, count, max_tokens, overlap_tokens)) for sents in sentences]
+
+def chunk_contexts(
+    contexts: List[str],
+    group_size: int = 5,
+    tokenizer=None,
+    max_tokens: int = 0,
+    overlap_tokens: int = 0,
+) -> List[List[str]]:
+    """
+    Chunk already-normalized contexts exactly like the offline pipeline:
+    token-budget packing with a tokenizer and max_tokens > 0, otherwise
+    groups of group_size sentences.
+    """
+    if tokenizer is not None and max_tokens > 0:
+        return _token_chunks(contexts, tokenizer, max_tokens, overlap_tokens)
+    return [chunk_sentences(split_into_sentences(c), group_size=group_size) for c in contexts]
+
+def preprocess_batch(
+    batch: Dict[str, List[Any]],
+    group_size: int = 5,
+    tokenizer=None,
+    max_tokens: int = 0,
+    overlap_tokens: int = 0,
+) -> Dict[str, List[Any]]:
+    """
+    Batched counterpart of preprocess_example for Dataset.map(batched=True):
+    normalizes whole columns at once and adds the 'chunks' column.
+    With a tokenizer and max_tokens > 0, chunks are packed up to a token
+    budget (see iter_token_chunks) instead of group_size sentences.
+    """
+    try:
+        n = len(batch.get("question") or batch.get("context") or [])
+        contexts = normalize_batch(batch.get("context") or [""] * n)
+        questions = normalize_batch(batch.get("question") or [""] * n)
+
+        answers = batch.get("answers")
+        if answers is not None:
+            for ans in answers:
+                if isinstance(ans, dict):
+                    ans_list = ans.get("text", [])
+                    if isinstance(ans_list, list) and len(ans_list) > 0:
+                        ans_list[0] = normalize_arabic_text(ans_list[0])
+                        ans["text"] = ans_list
+            batch["answers"] = answers
+
+        batch["context"] = contexts
+        batch["question"] = questions
+        batch["chunks"] = chunk_contexts(contexts, group_size, tokenizer, max_tokens, overlap_tokens)
+        return batch
+
+    except Exception as e:
+        logger.error(f"Failed to preprocess batch: {e}")
+        raise
+
+def _split_fingerprint(split_ds, options: Dict[str, Any]) -> str:
+    """
+    Fingerprint of (raw split content, preprocessing options, code version),
+    used to name the cache file so unchanged splits are not reprocessed.
+    """
+    opts = "|".join(f"{k}={v}" for k, v in sorted(options.items()))
+    raw = f"{split_ds._fingerprint}|{opts}|v{PREPROCESS_VERSION}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+def _preprocess_split(
+    split_ds,
+    name: str,
+    chunk_fn,
+    chunk_options: Dict[str, Any],
+    num_proc: Optional[int],
+    batch_size: int,
+    cache_dir: Optional[str],
+):
+    fingerprint = _split_fingerprint(split_ds, chunk_options)
+    cache_file = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_file = os.path.join(cache_dir, f"{name}-{fingerprint}.arrow")
+        # with num_proc > 1, datasets writes one suffixed file per shard
+        if glob.glob(os.path.join(cache_dir, f"{name}-{fingerprint}*.arrow")):
+            logger.info(f"Reusing cached preprocessing for '{name}' ({fingerprint})")
+
+    return split_ds.map(
+        chunk_fn,
+        batched=True,
+        batch_size=batch_size,
+        num_proc=num_proc if num_proc and num_proc > 1 else None,
+        new_fingerprint=fingerprint,
+        cache_file_name=cache_file,
+        load_from_cache_file=True,
+        desc=f"Processing {name}",
+    )
+
+def model_max_seq_length(model_name: str) -> Optional[int]:
+    """
+    Input limit of a sentence-transformers model (max_seq_length in its
+    sentence_bert_config.json, from a local directory or the Hugging Face
+    hub cache), or None when it has none. It is often below the tokenizer's
+    model_max_length.
+    """
+    try:
+        if os.path.isdir(model_name):
+            path = os.path.join(model_name, "sentence_bert_config.json")
+        else:
+            from huggingface_hub import hf_hub_download
+
+            path = hf_hub_download(model_name, "sentence_bert_config.json")
+        with open(path, encoding="utf-8") as f:
+            return int(json.load(f)["max_seq_length"]) or None
+    except Exception as e:
+        logger.info(f"No sentence-transformers max_seq_length for {model_name} ({e}); using the tokenizer limit")
+        return None
+
 def preprocess_arcd(
     in_dir: str = RAGSettings.raw_arcd_dir,
     out_dir: str = RAGSettings.clean_arcd_dir,
     group_size: int = 5,
+    num_proc: Optional[int] = None,
+    batch_size: int = 1000,
+    cache_dir: Optional[str] = RAGSettings.preprocess_cache_dir,
+    max_tokens: int = RAGSettings.ingest_max_tokens,
+    overlap_tokens: int = 0,
+    tokenizer_name: Optional[str] = None,
+    max_seq_length: Optional[int] = None,
 ):
     """
     Load ARCD raw → clean text → split → chunk → save cleaned dataset to disk.
+    Runs batched across num_proc processes; each split's output is cached
+    under a fingerprint of its raw content and the preprocessing options.
+    max_tokens > 0 (default INGEST_MAX_TOKENS) chunks by token budget with
+    the embedder's tokenizer (tokenizer_name, default EMB_MODEL); it is
+    clamped so chunks plus special tokens fit max_seq_length (default: the
+    model's sentence-transformers max_seq_length, else the tokenizer's
+    model_max_length). max_tokens=0 groups group_size sentences.
     """
+    tokenizer = None
+    chunk_options: Dict[str, Any] = {"group_size": group_size}
+    if max_tokens > 0:
+        from transformers import AutoTokenizer
+
+        tokenizer_name = tokenizer_name or RAGSettings.emb_model
+        logger.info(f"Loading tokenizer for token-budget chunking: {tokenizer_name}")
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+        max_seq_length = max_seq_length or model_max_seq_length(tokenizer_name)
+        max_tokens = fit_token_budget(max_tokens, tokenizer, max_seq_length)
+        chunk_options = {
+            "tokenizer": tokenizer_name,
+            "max_tokens": max_tokens,
+            "overlap_tokens": overlap_tokens,
+        }
+
+    chunk_fn = partial(
+        preprocess_batch,
+        group_size=group_size,
+        tokenizer=tokenizer,
+        max_tokens=max_tokens,
+        overlap_tokens=overlap_tokens,
+    )
 
     try:
         logger.info(f"Loading raw dataset from: {in_dir}")
@@ -58,20 +238,20 @@ def preprocess_arcd(
         logger.error(f"Failed to load dataset from '{in_dir}': {e}")
         raise
 
-    logger.info("Applying normalization + chunking...")
+    logger.info(
+        f"Applying normalization + chunking (num_proc={num_proc or 1}, batch_size={batch_size})..."
+    )
     try:
         if isinstance(ds, DatasetDict):
             ds_clean = DatasetDict({
-                split: ds[split].map(
-                    lambda ex: preprocess_example(ex, group_size=group_size),
-                    desc=f"Processing {split}"
+                split: _preprocess_split(
+                    ds[split], split, chunk_fn, chunk_options, num_proc, batch_size, cache_dir
                 )
                 for split in ds.keys()
             })
         else:
-            ds_clean = ds.map(
-                lambda ex: preprocess_example(ex, group_size=group_size),
-                desc="Processing dataset"
+            ds_clean = _preprocess_split(
+                ds, "dataset", chunk_fn, chunk_options, num_proc, batch_size, cache_dir
             )
     except Exception as e:
         logger.error(f"Failed during preprocessing mapping: {e}")
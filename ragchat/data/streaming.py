@@ -0,0 +1,81 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import pyarrow.compute as pc
+from ragchat.logger import logger
+
+Batch = Tuple[List[str], List[Dict[str, Any]]]
+
+def select_rows(split, start: int = 0, stop: Optional[int] = None, shard_index: int = 0, num_shards: int = 1):
+    """
+    Restrict a split to rows [start, stop), then to one contiguous shard of
+    that range. Returns (subset, absolute row index of its first row), so
+    payload example ids stay stable across shards. Selection is an Arrow
+    indices mapping, no rows are copied.
+    """
+    n = len(split)
+    stop = n if stop is None else min(stop, n)
+    start = max(0, min(start, stop))
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"shard_index must be in [0, {num_shards}).")
+
+    size, extra = divmod(stop - start, num_shards)
+    lo = start + shard_index * size + min(shard_index, extra)
+    hi = lo + size + (1 if shard_index < extra else 0)
+    if lo == 0 and hi == n:
+        return split, 0
+    logger.info(f"Using rows [{lo}, {hi}) of {n} (shard {shard_index + 1}/{num_shards})")
+    return split.select(range(lo, hi)), lo
+
+def iter_columns(split, columns: Sequence[str], read_batch: int = 1000) -> Iterator[Dict[str, List[Any]]]:
+    """Read only the given columns, read_batch rows at a time, as column dicts."""
+    columns = [c for c in columns if c in split.column_names]
+    return split.select_columns(columns).iter(batch_size=read_batch)
+
+def count_list_items(
+    split, column: str, field: Optional[str] = None, rows_only: bool = False, read_batch: int = 10000
+) -> int:
+    """
+    Total number of items in a list column (or a list field of a struct
+    column, e.g. answers.text), computed in Arrow. rows_only counts the rows
+    with a non-empty list instead.
+    """
+    total = 0
+    for table in split.select_columns([column]).with_format("arrow").iter(batch_size=read_batch):
+        values = table[column]
+        if field is not None:
+            values = pc.struct_field(values, field)
+        lengths = pc.fill_null(pc.list_value_length(values), 0)
+        if rows_only:
+            lengths = pc.cast(pc.greater(lengths, 0), "int64")
+        total += pc.sum(lengths).as_py() or 0
+    return total
+
+def rebatch(items: Iterable[Tuple[str, Dict[str, Any]]], batch_size: int) -> Iterator[Batch]:
+    """Group a (text, payload) stream into (texts, payloads) batches."""
+    texts: List[str] = []
+    payloads: List[Dict[str, Any]] = []
+    for text, payload in items:
+        texts.append(text)
+        payloads.append(payload)
+        if len(texts) >= batch_size:
+            yield texts, payloads
+            texts, payloads = [], []
+    if texts:
+        yield texts, payloads
+
+def filter_batches(
+    batches: Iterable[Batch],
+    fn: Callable[[List[str], List[Dict[str, Any]]], Batch],
+    on_drop: Optional[Callable[[int], None]] = None,
+) -> Iterator[Batch]:
+    """
+    Apply a batch filter (e.g. checkpoint / existing-id / near-duplicate
+    skipping) lazily; on_drop receives how many records each call removed,
+    so progress totals stay accurate. Empty batches are not passed on.
+    """
+    for texts, payloads in batches:
+        kept_texts, kept_payloads = fn(texts, payloads)
+        dropped = len(texts) - len(kept_texts)
+        if dropped and on_drop is not None:
+            on_drop(dropped)
+        if kept_texts:
+            yield kept_texts, kept_payloads
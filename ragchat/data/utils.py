@@ -1,14 +1,38 @@
 import re
-from typing import List
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 from ragchat.logger import logger
 import hashlib
 
+# Built once at import time: one str.translate pass deletes tashkeel,
+# tatweel and lone surrogates and turns control characters into spaces.
+# A list indexed by code point looks up faster than a dict; characters past
+# its end raise LookupError, which translate treats as "keep unchanged".
+_NORMALIZE_TABLE: List[Optional[object]] = list(range(0xE000))
+for _c in (*range(0x0610, 0x061B), *range(0x064B, 0x0660), *range(0x06D6, 0x06EE), 0x0640, *range(0xD800, 0xE000)):
+    _NORMALIZE_TABLE[_c] = None
+for _c in (*range(0x00, 0x20), 0x7F):
+    _NORMALIZE_TABLE[_c] = " "
+del _c
+_SURROGATE_RE = re.compile(r"[\ud800-\udfff]")
+_ALL_CTRL_RE = re.compile(r"[\x00-\x1F\x7F]")
+
+class NormalizedText(str):
+    """
+    str subclass marking text that already went through normalize_arabic_text.
+    Normalizing it again is a no-op, so the pipeline normalizes once per request.
+    """
+    __slots__ = ()
+
+def mark_normalized(text: str) -> NormalizedText:
+    """Mark text known to be normalized (e.g. chunks stored at ingestion)."""
+    return text if isinstance(text, NormalizedText) else NormalizedText(text or "")
+
 def clean_unicode(text: str) -> str:
     try:
         if text is None:
             return ""
-        text = re.sub(r"[\ud800-\udfff]", "", text)
-        text = re.sub(r"[\x00-\x1F\x7F]", " ", text)
+        text = _SURROGATE_RE.sub("", text)
+        text = _ALL_CTRL_RE.sub(" ", text)
         return text
     except Exception as e:
         logger.error(f"clean_unicode() failed: {e}")
@@ -17,20 +41,28 @@ def clean_unicode(text: str) -> str:
 def normalize_arabic_text(text: str) -> str:
     """
     Basic normalization to unify Arabic forms and remove noisy characters.
+    One str.translate pass over a precompiled table (tashkeel, tatweel and
+    surrogates deleted, control characters to spaces), then one whitespace
+    collapse.
     """
     try:
+        if isinstance(text, NormalizedText):
+            return text
         if not text:
-            return ""
-    
-        text = clean_unicode(text)
-        tashkeel = r"[\u0610-\u061A\u064B-\u065F\u06D6-\u06ED]"
-        text = re.sub(tashkeel, "", text) # remove tashkeel
-        text = re.sub(r"ـ+", "", text) # remove tatweel
-        text = re.sub(r"\s+", " ", text).strip() # remove extra whitespace
-        return text
+            return NormalizedText("")
+
+        text = text.translate(_NORMALIZE_TABLE)
+        return NormalizedText(" ".join(text.split()))  # remove extra whitespace
     except Exception as e:
         logger.error(f"normalize_arabic_text() failed: {e}")
-        return ""
+        return NormalizedText("")
+
+def normalize_batch(texts: Iterable[str]) -> List[str]:
+    """
+    Normalize many texts at once, e.g. for batched Dataset.map:
+        ds.map(lambda b: {"context": normalize_batch(b["context"])}, batched=True)
+    """
+    return [normalize_arabic_text(t) for t in texts]
 
 def split_into_sentences(text: str) -> List[str]:
     """
@@ -74,6 +106,124 @@ def chunk_sentences(sentences: List[str], group_size: int = 5) -> List[str]:
         logger.error(f"chunk_sentences() failed: {e}")
         return []
 
+def make_token_counter(tokenizer) -> Callable[[str], int]:
+    """
+    Token counter backed by the embedder's tokenizer (special tokens excluded).
+    """
+    def count(text: str) -> int:
+        return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+    return count
+
+def fit_token_budget(max_tokens: int, tokenizer, max_seq_length: Optional[int] = None) -> int:
+    """
+    Clamp a chunk token budget so a chunk plus the tokenizer's special tokens
+    (e.g. [CLS]/[SEP]) fits max_seq_length, the embedder's input limit
+    (default: the tokenizer's model_max_length). Longer chunks would be
+    silently truncated at encode time.
+    """
+    limit = max_seq_length or getattr(tokenizer, "model_max_length", None)
+    # HF uses a huge sentinel when the tokenizer has no length limit
+    if not limit or limit > 1_000_000:
+        return max_tokens
+    special = tokenizer.num_special_tokens_to_add() if hasattr(tokenizer, "num_special_tokens_to_add") else 2
+    budget = limit - special
+    if budget <= 0:
+        raise ValueError(f"max_seq_length {limit} leaves no room for chunk tokens.")
+    if max_tokens > budget:
+        logger.warning(
+            f"max_tokens={max_tokens} exceeds the embedder limit ({limit} tokens incl. {special} special); "
+            f"using {budget}"
+        )
+        return budget
+    return max_tokens
+
+def _split_long_word(
+    word: str, count_tokens: Callable[[str], int], max_tokens: int
+) -> Iterator[Tuple[str, int]]:
+    """
+    Break a single word longer than max_tokens into the longest prefixes
+    that fit (binary search on the token count), so no piece exceeds the
+    budget; only a lone character that alone tokenizes past it can.
+    """
+    while word:
+        lo, hi = 1, len(word)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if count_tokens(word[:mid]) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        piece, word = word[:lo], word[lo:]
+        yield piece, count_tokens(piece)
+
+def _split_long_sentence(
+    sentence: str, count_tokens: Callable[[str], int], max_tokens: int
+) -> Iterator[Tuple[str, int]]:
+    """
+    Break a sentence longer than max_tokens into word-aligned pieces;
+    words that alone exceed the budget are split at token level.
+    """
+    words, total = [], 0
+    for word in sentence.split():
+        n = count_tokens(word)
+        if words and total + n > max_tokens:
+            yield " ".join(words), total
+            words, total = [], 0
+        if n > max_tokens:
+            yield from _split_long_word(word, count_tokens, max_tokens)
+            continue
+        words.append(word)
+        total += n
+    if words:
+        yield " ".join(words), total
+
+def iter_token_chunks(
+    sentences: Iterable[str],
+    count_tokens: Callable[[str], int],
+    max_tokens: int,
+    overlap_tokens: int = 0,
+) -> Iterator[str]:
+    """
+    Stream chunks by packing consecutive sentences up to max_tokens.
+
+    - sentences longer than the budget are split on word boundaries, and
+      single words longer than the budget at token level
+    - each new chunk starts with trailing sentences of the previous one,
+      up to overlap_tokens (0 = no overlap)
+    - lazy: consumes sentences and yields chunks one at a time
+    """
+    if max_tokens <= 0:
+        raise ValueError("iter_token_chunks: max_tokens must be positive.")
+
+    def units():
+        for s in sentences:
+            n = count_tokens(s)
+            if n > max_tokens:
+                yield from _split_long_sentence(s, count_tokens, max_tokens)
+            elif n > 0:
+                yield s, n
+
+    current: List[Tuple[str, int]] = []
+    total = 0
+    for sent, n in units():
+        if current and total + n > max_tokens:
+            yield " ".join(s for s, _ in current)
+
+            carried: List[Tuple[str, int]] = []
+            kept = 0
+            for s, sn in reversed(current):
+                if kept + sn > overlap_tokens or kept + sn + n > max_tokens:
+                    break
+                carried.insert(0, (s, sn))
+                kept += sn
+            current, total = carried, kept
+
+        current.append((sent, n))
+        total += n
+
+    if current:
+        yield " ".join(s for s, _ in current)
+
 def make_hash_id(text: str) -> str:
     """Return a stable SHA-256 hash for text."""
     try:
@@ -3,20 +3,21 @@ from datasets import load_from_disk, DatasetDict
 from tqdm import tqdm
 import time
 from ragchat.config import RAGSettings
-from ragchat.core.embeddings import TextEmbedder
+from ragchat.core.registry import get_embedder, get_generator, get_index
 from ragchat.core.retriever import Retriever
-from ragchat.storage.qdrant_index import QdrantIndex
-from ragchat.core.generator import Generator
 from ragchat.core.pipeline import RagPipeline
 from ragchat.evaluation.evaluation import bleu, f1
 
 def main(
     ds_path: str = RAGSettings.clean_arcd_dir,
     n: int = typer.Option(50, "--n", "-n", help="Number of samples to evaluate"),
+    search_batch: int = typer.Option(256, "--search-batch", help="Questions per batched Qdrant search request"),
 ):
     """
     Evaluate the Arabic RAG (Gemini-based) pipeline on ARCD validation/test split.
     Computes BLEU and token-level F1.
+    Retrieval for all questions is done up front with one embed_batch call
+    and batched Qdrant searches; only generation runs per question.
     """
 
     # Load dataset
@@ -27,8 +28,8 @@ def main(
         split = ds
 
     # Components: use the same configuration as chat / pipeline
-    embedder = TextEmbedder(RAGSettings.emb_model)
-    index = QdrantIndex(
+    embedder = get_embedder(RAGSettings.emb_model)
+    index = get_index(
         url=RAGSettings.qdrant_url,
         api_key=RAGSettings.qdrant_api_key,
     )
@@ -39,7 +40,7 @@ def main(
         top_k=RAGSettings.top_k,
     )
     # Generator reads all configs (model name, API key, temperature, top_p, max tokens) from RAGSettings
-    generator = Generator()
+    generator = get_generator()
     pipeline = RagPipeline(
         embedder=embedder,
         retriever=retriever,
@@ -51,10 +52,12 @@ def main(
     total = min(n, len(split))
     print(f"Evaluating {total} samples from {ds_path} ...", flush=True)
 
-    for i, ex in enumerate(tqdm(split, total=total)):
-        if i >= total:
-            break
+    subset = split.select(range(total))
+    t0 = time.perf_counter()
+    all_contexts = retriever.retrieve_batch(subset["question"], batch_size=search_batch)
+    print(f"Retrieved contexts for {total} questions in {time.perf_counter() - t0:.1f}s", flush=True)
 
+    for ex, contexts in tqdm(zip(subset, all_contexts), total=total):
         q = ex["question"]
         # ARCD-style answers: {"text": [answer_str, ...], "answer_start": [...]}
         answers = ex.get("answers", {})
@@ -64,7 +67,7 @@ def main(
         else:
             gold = ""
 
-        out = pipeline.answer(q)
+        out = pipeline.answer(q, contexts=contexts)
         time.sleep(1.5)
         preds.append(out["answer"])
         refs.append(gold)
@@ -0,0 +1,105 @@
+import typer
+import numpy as np
+from ragchat.cli.embed_contexts_cli import load_dataset_split
+from ragchat.config import RAGSettings
+from ragchat.core.embeddings import TextEmbedder
+from ragchat.core.reduction import DimReducer, fit_pca
+from ragchat.data.utils import make_hash_id
+from ragchat.logger import logger
+
+app = typer.Typer(help="Fit and evaluate embedding dimension reduction settings.")
+
+# PCA is fitted on training chunks and evaluated on held-out questions
+EVAL_SPLITS = ("validation", "test")
+
+def _collect(split, n: int):
+    """
+    Unique chunks plus (question, relevant chunk rows) pairs from the first
+    n examples. A question's relevant chunks are the chunks of its own context.
+    """
+    chunk_rows, chunks, questions, relevant = {}, [], [], []
+    for i, ex in enumerate(split):
+        if i >= n:
+            break
+        rows = set()
+        for chunk in ex["chunks"]:
+            key = make_hash_id(chunk)
+            if key not in chunk_rows:
+                chunk_rows[key] = len(chunks)
+                chunks.append(chunk)
+            rows.add(chunk_rows[key])
+        if rows and ex.get("question"):
+            questions.append(ex["question"])
+            relevant.append(rows)
+    return chunks, questions, relevant
+
+def _recall_at_k(q: np.ndarray, c: np.ndarray, relevant, k: int) -> float:
+    """Fraction of questions with at least one relevant chunk in the top-k."""
+    scores = q.astype(np.float32) @ c.astype(np.float32).T
+    k = min(k, c.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    hits = sum(1 for row, rel in zip(top, relevant) if rel.intersection(row.tolist()))
+    return hits / len(relevant) if relevant else 0.0
+
+@app.command("fit-pca")
+def fit_pca_cmd(
+    ds_path: str = RAGSettings.clean_arcd_dir,
+    out: str = RAGSettings.emb_pca_path,
+    max_dim: int = typer.Option(512, help="Number of PCA components to keep"),
+    n: int = typer.Option(2000, "--n", "-n", help="Number of examples to sample chunks from"),
+):
+    """Fit a PCA projection on full-size ARCD chunk embeddings."""
+    chunks, _, _ = _collect(load_dataset_split(ds_path), n)
+    embedder = TextEmbedder(RAGSettings.emb_model, output_dim=0, output_dtype="float32", as_numpy=True)
+    vectors = embedder.embed_batch(chunks)
+    fit_pca(vectors, max_dim, out)
+
+@app.command()
+def evaluate(
+    ds_path: str = RAGSettings.clean_arcd_dir,
+    n: int = typer.Option(500, "--n", "-n", help="Number of examples to evaluate"),
+    k: int = typer.Option(RAGSettings.top_k, "--k", "-k", help="Recall cut-off"),
+    dims: str = typer.Option("256,384,512", help="Comma-separated output dimensions to try"),
+    pca_path: str = typer.Option(RAGSettings.emb_pca_path, help="Fitted PCA file (skipped if missing)"),
+):
+    """
+    Report recall@k and bytes per vector for truncation / PCA / float16
+    settings against full 1024-dim float32 embeddings.
+    """
+    chunks, questions, relevant = _collect(load_dataset_split(ds_path, EVAL_SPLITS), n)
+    embedder = TextEmbedder(RAGSettings.emb_model, output_dim=0, output_dtype="float32", as_numpy=True)
+    c_full = embedder.embed_batch(chunks)
+    q_full = embedder.embed_batch(questions)
+    full_dim = c_full.shape[1]
+
+    base = _recall_at_k(q_full, c_full, relevant, k)
+    logger.info(f"=== Recall@{k} on {len(questions)} questions / {len(chunks)} chunks ===")
+    logger.info(f"{'setting':<22}{'dim':>6}{'bytes/vec':>11}{'recall':>9}{'delta':>9}")
+    logger.info(f"{'full float32':<22}{full_dim:>6}{full_dim * 4:>11}{base:>9.3f}{0.0:>9.3f}")
+
+    settings = []
+    for d in [int(x) for x in dims.split(",") if x.strip()]:
+        settings.append(("truncate", d))
+        settings.append(("pca", d))
+
+    for dtype in ("float32", "float16"):
+        for mode, d in [(None, full_dim)] + settings:
+            if mode is None and dtype == "float32":
+                continue
+            try:
+                reducer = DimReducer(
+                    mode=mode or "truncate",
+                    output_dim=d if mode else None,
+                    pca_path=pca_path,
+                    dtype=dtype,
+                )
+            except (OSError, ValueError) as e:
+                logger.info(f"{(mode or 'full') + ' ' + dtype:<22}{d:>6}  skipped: {e}")
+                continue
+            r = _recall_at_k(reducer(q_full), reducer(c_full), relevant, k)
+            label = f"{mode or 'full'} {dtype}"
+            width = 2 if dtype == "float16" else 4
+            logger.info(f"{label:<22}{d:>6}{d * width:>11}{r:>9.3f}{r - base:>9.3f}")
+
+if __name__ == "__main__":
+    app()
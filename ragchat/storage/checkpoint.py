@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from ragchat.logger import logger
+
+class IngestCheckpoint:
+    """
+    Local progress state for resumable ingestion into one collection.
+
+    - <path>       : JSON state (collection, run fingerprint, committed
+                     count), replaced atomically
+    - <path>.ids   : append-only log of committed point IDs, one per line;
+                     a torn last line from a crash is ignored on load
+    - commit() is called only after a batch's upsert returned (wait=True),
+      so every logged ID is durably in Qdrant; it is thread-safe. Progress
+      is the set of committed IDs only: batch numbers of a resumed (filtered)
+      stream do not map back to dataset rows
+    - a checkpoint written for a different collection / fingerprint is
+      ignored and replaced; shards and row ranges of one dataset get their
+      own file (see checkpoint_path_for) and fingerprint
+    """
+
+    def __init__(self, path: str, collection: str, fingerprint: str = ""):
+        self.path = path
+        self.ids_path = f"{path}.ids"
+        self.collection = collection
+        self.fingerprint = fingerprint
+        self.committed: Set[str] = set()
+        self._lock = threading.Lock()
+
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+    def load(self) -> Set[str]:
+        """Read committed IDs of a matching previous run (empty set otherwise)."""
+        if not os.path.exists(self.path):
+            return self.committed
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return self.committed
+
+        if state.get("collection") != self.collection or state.get("fingerprint") != self.fingerprint:
+            logger.info(f"Checkpoint {self.path} belongs to another run; starting fresh")
+            self.reset()
+            return self.committed
+
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, "r", encoding="utf-8") as f:
+                data = f.read()
+            lines = data.split("\n")
+            if not data.endswith("\n"):
+                lines = lines[:-1]  # partially written last ID
+            self.committed = {line for line in lines if line}
+
+        logger.info(f"Resuming from checkpoint {self.path}: {len(self.committed)} points committed")
+        return self.committed
+
+    def commit(self, batch_index: int, ids: Iterable[str]) -> None:
+        """IngestionPipeline on_commit hook; batch_index is not recorded."""
+        ids = [str(i) for i in ids]
+        with self._lock:
+            with open(self.ids_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{i}\n" for i in ids))
+                f.flush()
+                os.fsync(f.fileno())
+            self.committed.update(ids)
+            self._write_state()
+
+    def _write_state(self) -> None:
+        state: Dict[str, Any] = {
+            "collection": self.collection,
+            "fingerprint": self.fingerprint,
+            "committed": len(self.committed),
+            "updated_at": time.time(),
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def reset(self) -> None:
+        """Forget all progress (e.g. after the collection was recreated)."""
+        self.committed = set()
+        for p in (self.path, self.ids_path):
+            if os.path.exists(p):
+                os.remove(p)
+        self._write_state()
+
+def checkpoint_path_for(directory: str, collection: str, start: int, stop: int, total_rows: int) -> str:
+    """
+    Default checkpoint file for ingesting rows [start, stop) of a
+    total_rows-row split into collection: <collection>.json for the whole
+    split, <collection>.rows-<start>-<stop>.json for a row range or shard,
+    so concurrent shards never share (or reset) each other's state.
+    """
+    if start == 0 and stop == total_rows:
+        return os.path.join(directory, f"{collection}.json")
+    return os.path.join(directory, f"{collection}.rows-{start}-{stop}.json")
+
+def drop_ids(
+    texts: List[str], payloads: List[Dict[str, Any]], ids: Set[str]
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Keep only records whose payload 'id' is not in ids."""
+    if not ids:
+        return texts, payloads
+    keep = [i for i, p in enumerate(payloads) if str(p["id"]) not in ids]
+    return [texts[i] for i in keep], [payloads[i] for i in keep]
@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from ragchat.logger import logger
+
+# SQLite's default limit on host parameters per statement is 999 on old builds
+_MAX_PARAMS = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    text   TEXT NOT NULL,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS examples (
+    example_id  INTEGER PRIMARY KEY,
+    doc_id      TEXT,
+    question    TEXT,
+    answer_text TEXT
+);
+"""
+
+class DocStore:
+    """
+    Local SQLite store for the raw text behind Qdrant points.
+
+    - documents: full raw contexts, stored once per doc_id
+      (make_hash_id of the context) instead of in every chunk payload
+    - examples : question / answer of each dataset example
+    - Qdrant payloads only keep compact references (doc_id,
+      original_example_id[s]); Retriever hydrates hits with one batched
+      lookup per table
+    - one connection per thread, WAL mode so the API can read while an
+      ingestion run writes
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        try:
+            self._conn().executescript(_SCHEMA)
+            logger.info(f"Document store ready at {path}")
+        except Exception as e:
+            logger.error(f"Failed to open document store {path}: {e}")
+            raise
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def put_documents(self, docs: Iterable[Tuple[str, str, Optional[str]]]) -> int:
+        """Insert (doc_id, text, source) rows; existing doc_ids are kept."""
+        rows = list(docs)
+        if rows:
+            conn = self._conn()
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO documents VALUES (?, ?, ?)", rows)
+        return len(rows)
+
+    def put_examples(self, examples: Iterable[Tuple[int, str, Optional[str], Optional[str]]]) -> int:
+        """Insert or replace (example_id, doc_id, question, answer_text) rows."""
+        rows = list(examples)
+        if rows:
+            conn = self._conn()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO examples VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def _select(self, sql: str, keys: Sequence[Any]) -> List[tuple]:
+        rows: List[tuple] = []
+        conn = self._conn()
+        for start in range(0, len(keys), _MAX_PARAMS):
+            part = keys[start:start + _MAX_PARAMS]
+            marks = ",".join("?" * len(part))
+            rows.extend(conn.execute(sql.format(marks=marks), part).fetchall())
+        return rows
+
+    def get_documents(self, doc_ids: Iterable[str]) -> Dict[str, str]:
+        """doc_id -> raw text, for the ids that exist."""
+        keys = list(dict.fromkeys(d for d in doc_ids if d))
+        if not keys:
+            return {}
+        rows = self._select("SELECT doc_id, text FROM documents WHERE doc_id IN ({marks})", keys)
+        return dict(rows)
+
+    def get_examples(self, example_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """example_id -> {doc_id, question, answer_text}, for the ids that exist."""
+        keys = list(dict.fromkeys(int(e) for e in example_ids if e is not None))
+        if not keys:
+            return {}
+        rows = self._select(
+            "SELECT example_id, doc_id, question, answer_text FROM examples WHERE example_id IN ({marks})",
+            keys,
+        )
+        return {r[0]: {"doc_id": r[1], "question": r[2], "answer_text": r[3]} for r in rows}
+
+    def count(self) -> Dict[str, int]:
+        conn = self._conn()
+        return {
+            "documents": conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0],
+            "examples": conn.execute("SELECT COUNT(*) FROM examples").fetchone()[0],
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
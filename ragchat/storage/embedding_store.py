@@ -0,0 +1,251 @@
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from ragchat.logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are coordinated
+    fcntl = None
+
+_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+def _safe_dirname(model_name: str) -> str:
+    """Turn a HuggingFace model id into a filesystem-friendly folder name."""
+    return re.sub(r"[^A-Za-z0-9._-]+", "__", model_name)
+
+class EmbeddingStore:
+    """
+    Persistent, content-addressed embedding cache for ingestion re-runs.
+
+    Layout (one folder per embedding model):
+    - meta.json   : model name, vector dimension, storage dtype
+    - vectors.bin : append-only row-major matrix (float32 or float16)
+    - index.tsv   : append-only "<hash_id>\\t<row>" offset index
+
+    Vectors are read back through a read-only np.memmap, so lookups
+    never load the whole matrix into memory.
+
+    Several processes may share a store (e.g. parallel shards, contexts and
+    answers with the same model): appends hold an exclusive flock on
+    .lock, rows are numbered from the size of vectors.bin under that lock,
+    and index.tsv lines written by other processes are picked up before
+    each lookup. A torn last index line left by a crashed writer is
+    dropped, never completed.
+    """
+
+    def __init__(self, root: str, model_name: str, dtype: str = "float32"):
+        if dtype not in _DTYPES:
+            raise ValueError(f"Unsupported embedding store dtype '{dtype}' (use float32 or float16).")
+
+        self.model_name = model_name
+        self.dir = os.path.join(root, _safe_dirname(model_name))
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.vectors_path = os.path.join(self.dir, "vectors.bin")
+        self.index_path = os.path.join(self.dir, "index.tsv")
+        self.lock_path = os.path.join(self.dir, ".lock")
+
+        self.dtype = dtype
+        self.dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._num_rows = 0
+        self._index_offset = 0
+        self._mmap: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            self._load()
+            logger.info(
+                f"Embedding store ready at {self.dir} "
+                f"({len(self._rows)} vectors, dtype={self.dtype})"
+            )
+        except Exception as e:
+            logger.error(f"Failed to open embedding store at '{self.dir}': {e}")
+            raise
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock on the store across processes (no-op without fcntl)."""
+        with open(self.lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _row_bytes(self) -> int:
+        return self.dim * np.dtype(_DTYPES[self.dtype]).itemsize
+
+    def _load(self):
+        with self._file_lock():
+            self._read_meta()
+            if self.dim and os.path.exists(self.vectors_path):
+                row_bytes = self._row_bytes()
+                size = os.path.getsize(self.vectors_path)
+                if size % row_bytes:
+                    # drop a partially written trailing row so appends stay aligned
+                    with open(self.vectors_path, "r+b") as f:
+                        f.truncate(size - size % row_bytes)
+            self._drop_partial_line()
+        self._refresh()
+
+    def _drop_partial_line(self):
+        """
+        Truncate index.tsv after its last newline (call with the file lock
+        held). A writer that crashed mid-line leaves a torn tail such as
+        'key\\t12' of 'key\\t123'; completing it would map key to a wrong row.
+        """
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r+b") as f:
+            size = keep = f.seek(0, os.SEEK_END)
+            while keep > 0:
+                block_start = max(0, keep - 4096)
+                f.seek(block_start)
+                newline = f.read(keep - block_start).rfind(b"\n")
+                if newline >= 0:
+                    keep = block_start + newline + 1
+                    break
+                keep = block_start
+            if keep < size:
+                logger.warning(f"Dropping {size - keep} bytes of a partial line at the end of {self.index_path}")
+                f.truncate(keep)
+
+    def _read_meta(self):
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("dtype") != self.dtype:
+                logger.warning(
+                    f"Embedding store at {self.dir} uses dtype={meta.get('dtype')}; "
+                    f"ignoring requested dtype={self.dtype}"
+                )
+            self.dtype = meta.get("dtype", self.dtype)
+            self.dim = meta.get("dim")
+
+    def _refresh(self):
+        """
+        Pick up rows appended since the last read (by this or another
+        process): re-measure vectors.bin and read new complete index.tsv lines.
+        """
+        if self.dim is None:
+            self._read_meta()
+            if self.dim is None:
+                return
+        if os.path.exists(self.index_path) and os.path.getsize(self.index_path) > self._index_offset:
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_offset)
+                data = f.read()
+            # a line still being written by another process is read next time
+            data = data[:data.rfind(b"\n") + 1]
+            self._index_offset += len(data)
+            # index lines are written after their vectors, so measure afterwards
+            if os.path.exists(self.vectors_path):
+                self._num_rows = os.path.getsize(self.vectors_path) // self._row_bytes()
+            for line in data.decode("utf-8").splitlines():
+                parts = line.split("\t")
+                if len(parts) != 2:
+                    continue
+                key, row = parts[0], int(parts[1])
+                # rows past the end of vectors.bin come from an interrupted write
+                if row < self._num_rows:
+                    self._rows[key] = row
+
+    def _write_meta(self):
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"model_name": self.model_name, "dim": self.dim, "dtype": self.dtype}, f)
+        os.replace(tmp, self.meta_path)
+
+    def _matrix(self) -> Optional[np.memmap]:
+        if self._num_rows == 0:
+            return None
+        if self._mmap is None or self._mmap.shape[0] != self._num_rows:
+            self._mmap = np.memmap(
+                self.vectors_path,
+                dtype=_DTYPES[self.dtype],
+                mode="r",
+                shape=(self._num_rows, self.dim),
+            )
+        return self._mmap
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Return {key: float32 vector} for every key present in the store.
+        Missing keys are simply absent from the result.
+        """
+        with self._lock:
+            self._refresh()
+            matrix = self._matrix()
+            if matrix is None:
+                return {}
+
+            found = {}
+            for key in keys:
+                row = self._rows.get(key)
+                if row is not None and key not in found:
+                    found[key] = np.asarray(matrix[row], dtype=np.float32)
+            return found
+
+    def put_many(self, keys: List[str], vectors) -> None:
+        """
+        Append new vectors. Keys already present are skipped.
+        """
+        vectors = np.asarray(vectors)
+        if len(keys) != len(vectors):
+            raise ValueError("EmbeddingStore.put_many: keys and vectors must have the same length.")
+        if len(keys) == 0:
+            return
+
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._write_meta()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Embedding store dim is {self.dim}, got vectors of dim {vectors.shape[1]}."
+                )
+
+            new_keys, new_rows = [], []
+            seen = set()
+            for i, key in enumerate(keys):
+                if key in self._rows or key in seen:
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(i)
+            if not new_keys:
+                return
+
+            block = np.ascontiguousarray(vectors[new_rows], dtype=_DTYPES[self.dtype])
+            # vectors first, index second: a crash in between leaves unreferenced rows only
+            with open(self.vectors_path, "ab") as f:
+                # row numbers come from the file under the lock, not from this process's count
+                start = f.seek(0, os.SEEK_END) // self._row_bytes()
+                f.write(block.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            # a crashed writer may have left a partial last line
+            self._drop_partial_line()
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                for offset, key in enumerate(new_keys):
+                    f.write(f"{key}\t{start + offset}\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._refresh()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
@@ -0,0 +1,582 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+import numpy as np
+from ragchat.logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are coordinated
+    fcntl = None
+
+# rows scored per matrix block (bounds float32 temporaries for float16 storage)
+_BLOCK_ROWS = 65536
+# SQLite's default limit on host parameters per statement is 999 on old builds
+_MAX_PARAMS = 900
+# k-means training sample per IVF list, and iterations
+_IVF_SAMPLE_PER_LIST = 256
+_IVF_ITERATIONS = 10
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS points (
+    id      TEXT PRIMARY KEY,
+    row     INTEGER NOT NULL UNIQUE,
+    payload TEXT
+);
+"""
+
+class LocalPoint(NamedTuple):
+    """Search hit with the same fields Retriever reads from Qdrant's ScoredPoint."""
+    id: str
+    score: float
+    payload: Optional[Dict[str, Any]]
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first."""
+    if len(scores) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        return part[np.argsort(-scores[part], kind="stable")]
+    return np.argsort(-scores, kind="stable")
+
+class _Collection:
+    """
+    One collection on disk:
+
+    - meta.json    : dim, dtype and a generation id that changes when the
+                     collection is recreated (count and capacity are informational)
+    - vectors.bin  : memory-mapped (capacity, dim) matrix of unit vectors
+    - points.sqlite: id -> row and JSON payload
+    - ivf.npz      : optional IVF centroids and per-row list assignment
+
+    points.sqlite is the source of truth: vectors are written and flushed
+    before the SQLite commit, the row count is MAX(row) + 1 and the
+    capacity is the size of vectors.bin, so a crash mid-upsert leaves at
+    most unreferenced rows behind. Several processes may share a
+    collection (e.g. the server and embed-contexts): upserts and IVF
+    training hold an exclusive flock on .lock, and every upsert / search
+    first picks up rows, file growth and IVF lists written by others.
+    LocalIndex reopens the collection when meta.json carries a new
+    generation (recreated by another process).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        meta_path = os.path.join(path, "meta.json")
+        self._meta_stat = self._stat(meta_path)
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim: int = meta["dim"]
+        self.dtype: str = meta["dtype"]
+        self.generation: Optional[str] = meta.get("generation")
+        self.row_bytes = self.dim * np.dtype(self.dtype).itemsize
+        self.count = 0
+        self.capacity = 0
+        self.matrix: Optional[np.memmap] = None
+        self.row_ids: List[Optional[str]] = []
+
+        self.conn = sqlite3.connect(os.path.join(path, "points.sqlite"), check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+
+        self.centroids: Optional[np.ndarray] = None
+        self.assign: Optional[np.ndarray] = None
+        self.trained_rows = 0
+        self._ivf_mtime: Optional[int] = None
+        self._lists: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.refresh()
+
+    @classmethod
+    def create(cls, path: str, dim: int, dtype: str) -> "_Collection":
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"dim": dim, "dtype": dtype, "generation": uuid.uuid4().hex, "count": 0, "capacity": 0}, f)
+        return cls(path)
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def replaced(self) -> bool:
+        """
+        True when the collection on disk is no longer the one this handle
+        opened (dropped, or recreated by another process). meta.json is only
+        re-read when its inode or mtime changed.
+        """
+        meta_path = os.path.join(self.path, "meta.json")
+        stat = self._stat(meta_path)
+        if stat is None:
+            return True
+        if stat == self._meta_stat:
+            return False
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                generation = json.load(f).get("generation")
+        except (FileNotFoundError, ValueError):
+            return True
+        self._meta_stat = stat
+        return generation != self.generation
+
+    @contextmanager
+    def file_lock(self):
+        """Exclusive lock on the collection across processes (no-op without fcntl)."""
+        with open(os.path.join(self.path, ".lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _open_matrix(self) -> Optional[np.memmap]:
+        if self.capacity == 0:
+            return None
+        return np.memmap(
+            os.path.join(self.path, "vectors.bin"), dtype=self.dtype, mode="r+", shape=(self.capacity, self.dim)
+        )
+
+    def refresh(self) -> None:
+        """Pick up rows, vector file growth and IVF lists written since the last call (by any process)."""
+        vectors_path = os.path.join(self.path, "vectors.bin")
+        capacity = os.path.getsize(vectors_path) // self.row_bytes if os.path.exists(vectors_path) else 0
+        if capacity != self.capacity:
+            if self.matrix is not None:
+                self.matrix.flush()
+            self.capacity = capacity
+            self.matrix = self._open_matrix()
+
+        (max_row,) = self.conn.execute("SELECT MAX(row) FROM points").fetchone()
+        count = 0 if max_row is None else max_row + 1
+        if count > self.count:
+            self.row_ids.extend([None] * (count - self.count))
+            for point_id, row in self.conn.execute("SELECT id, row FROM points WHERE row >= ?", (self.count,)):
+                self.row_ids[row] = point_id
+            self.count = count
+
+        ivf_path = os.path.join(self.path, "ivf.npz")
+        mtime = os.stat(ivf_path).st_mtime_ns if os.path.exists(ivf_path) else None
+        if mtime != self._ivf_mtime:
+            self._ivf_mtime = mtime
+            if mtime is not None:
+                with np.load(ivf_path) as data:
+                    self.centroids = data["centroids"]
+                    self.assign = data["assign"][:self.count].copy()
+                    self.trained_rows = int(data["trained_rows"])
+                self._lists = None
+        self._assign_new_rows()
+
+    def _assign_new_rows(self) -> None:
+        """Put rows added after IVF training (here or elsewhere) in their nearest list."""
+        if self.centroids is None or len(self.assign) >= self.count:
+            return
+        start = len(self.assign)
+        assign = np.empty(self.count, dtype=np.int32)
+        assign[:start] = self.assign
+        for block in range(start, self.count, _BLOCK_ROWS):
+            stop = min(block + _BLOCK_ROWS, self.count)
+            assign[block:stop] = self._nearest_lists(np.asarray(self.matrix[block:stop], dtype=np.float32))
+        self.assign = assign
+        self._lists = None
+
+    def _save_meta(self) -> None:
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "dim": self.dim, "dtype": self.dtype, "generation": self.generation,
+                    "count": self.count, "capacity": self.capacity,
+                },
+                f,
+            )
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+        self._meta_stat = self._stat(os.path.join(self.path, "meta.json"))
+
+    def _grow(self, needed: int) -> None:
+        """Extend the vector file (doubling) so it holds at least needed rows."""
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, 2 * self.capacity, 1024)
+        if self.matrix is not None:
+            self.matrix.flush()
+            self.matrix = None
+        with open(os.path.join(self.path, "vectors.bin"), "ab") as f:
+            f.truncate(capacity * self.row_bytes)
+        self.capacity = capacity
+        self.matrix = self._open_matrix()
+
+    def rows_for(self, ids: Sequence[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        for start in range(0, len(ids), _MAX_PARAMS):
+            part = list(ids[start:start + _MAX_PARAMS])
+            marks = ",".join("?" * len(part))
+            found.update(self.conn.execute(f"SELECT id, row FROM points WHERE id IN ({marks})", part).fetchall())
+        return found
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, payloads: List[Dict[str, Any]]) -> None:
+        """Call with the file lock held; vectors are flushed before the SQLite commit."""
+        self.refresh()
+        existing = self.rows_for(list(dict.fromkeys(ids)))
+        count = self.count
+        rows = np.empty(len(ids), dtype=np.int64)
+        for i, point_id in enumerate(ids):
+            row = existing.get(point_id)
+            if row is None:
+                row = existing[point_id] = count
+                count += 1
+            rows[i] = row
+
+        self._grow(count)
+        self.matrix[rows] = _normalize(vectors).astype(self.dtype, copy=False)
+        self.matrix.flush()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO points VALUES (?, ?, ?)",
+                [(point_id, int(row), json.dumps(p, ensure_ascii=False)) for point_id, row, p in zip(ids, rows, payloads)],
+            )
+        self.refresh()
+        self._save_meta()
+
+        if self.centroids is not None:
+            # overwritten rows may have moved to another list
+            self.assign[rows] = self._nearest_lists(np.asarray(self.matrix[rows], dtype=np.float32))
+            self._lists = None
+
+    def payloads_for(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(ids), _MAX_PARAMS):
+            part = list(ids[start:start + _MAX_PARAMS])
+            marks = ",".join("?" * len(part))
+            for point_id, payload in self.conn.execute(f"SELECT id, payload FROM points WHERE id IN ({marks})", part):
+                out[point_id] = json.loads(payload) if payload else {}
+        return out
+
+    def update_payloads(self, payloads: Dict[str, Dict[str, Any]]) -> None:
+        """Set keys on the payloads of existing points (call with the file lock held)."""
+        current = self.payloads_for(list(payloads))
+        for point_id, payload in current.items():
+            payload.update(payloads[point_id])
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE points SET payload = ? WHERE id = ?",
+                [(json.dumps(payload, ensure_ascii=False), point_id) for point_id, payload in current.items()],
+            )
+
+    def payloads(self, rows: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        out: Dict[int, Dict[str, Any]] = {}
+        for start in range(0, len(rows), _MAX_PARAMS):
+            part = [int(r) for r in rows[start:start + _MAX_PARAMS]]
+            marks = ",".join("?" * len(part))
+            for row, payload in self.conn.execute(f"SELECT row, payload FROM points WHERE row IN ({marks})", part):
+                out[row] = json.loads(payload) if payload else {}
+        return out
+
+    def _nearest_lists(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def needs_training(self, min_rows: int) -> bool:
+        """IVF lists are (re)trained once min_rows is reached and whenever the collection doubles."""
+        return self.count >= max(min_rows, 1) and self.count >= 2 * max(self.trained_rows, 1)
+
+    def train_ivf(self, lists: int, seed: int = 1) -> None:
+        """
+        Spherical k-means over a sample of the rows, then assign every row to
+        its nearest list. Rows added later are assigned on upsert.
+        """
+        rng = np.random.default_rng(seed)
+        lists = min(lists, self.count)
+        sample_rows = np.sort(rng.choice(self.count, min(self.count, lists * _IVF_SAMPLE_PER_LIST), replace=False))
+        sample = np.asarray(self.matrix[sample_rows], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+        for _ in range(_IVF_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for j in range(lists):
+                members = sample[labels == j]
+                if len(members):
+                    centroids[j] = members.sum(axis=0)
+            centroids = _normalize(centroids)
+        self.centroids = centroids.astype(np.float32)
+
+        assign = np.empty(self.count, dtype=np.int32)
+        for start in range(0, self.count, _BLOCK_ROWS):
+            stop = min(start + _BLOCK_ROWS, self.count)
+            assign[start:stop] = self._nearest_lists(np.asarray(self.matrix[start:stop], dtype=np.float32))
+        self.assign = assign
+        self.trained_rows = self.count
+        self._lists = None
+        tmp = os.path.join(self.path, "ivf.tmp.npz")
+        np.savez(tmp, centroids=self.centroids, assign=self.assign, trained_rows=np.int64(self.trained_rows))
+        os.replace(tmp, os.path.join(self.path, "ivf.npz"))
+        self._ivf_mtime = os.stat(os.path.join(self.path, "ivf.npz")).st_mtime_ns
+        logger.info(f"Trained IVF with {lists} lists over {self.count} rows in {self.path}")
+
+    def search_exact(self, queries: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Brute-force top-k over all rows, block by block with a running top-k per query."""
+        best_rows = [np.empty(0, dtype=np.int64) for _ in queries]
+        best_scores = [np.empty(0, dtype=np.float32) for _ in queries]
+        for start in range(0, self.count, _BLOCK_ROWS):
+            stop = min(start + _BLOCK_ROWS, self.count)
+            scores = queries @ np.asarray(self.matrix[start:stop], dtype=np.float32).T
+            for i in range(len(queries)):
+                rows = np.concatenate([best_rows[i], np.arange(start, stop)])
+                merged = np.concatenate([best_scores[i], scores[i]])
+                top = _top_k(merged, k)
+                best_rows[i], best_scores[i] = rows[top], merged[top]
+        return list(zip(best_rows, best_scores))
+
+    def search_ivf(self, queries: np.ndarray, k: int, probe: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Exact scores over the rows of the probe lists closest to each query."""
+        if self._lists is None:
+            # rows grouped by list: order[offsets[j]:offsets[j + 1]] are the rows of list j
+            order = np.argsort(self.assign, kind="stable")
+            offsets = np.searchsorted(self.assign[order], np.arange(len(self.centroids) + 1))
+            self._lists = (order, offsets)
+        order, offsets = self._lists
+
+        results = []
+        list_scores = queries @ self.centroids.T
+        for query, scores in zip(queries, list_scores):
+            lists = _top_k(scores, min(probe, len(self.centroids)))
+            rows = np.sort(np.concatenate([order[offsets[j]:offsets[j + 1]] for j in lists]))
+            candidate = np.asarray(self.matrix[rows], dtype=np.float32) @ query
+            top = _top_k(candidate, k)
+            results.append((rows[top], candidate[top]))
+        return results
+
+    def close(self) -> None:
+        if self.matrix is not None:
+            self.matrix.flush()
+        self.conn.close()
+
+class LocalIndex:
+    """
+    In-process vector index with the QdrantIndex API (see VectorStore), for
+    tests, benchmarks and deployments without a Qdrant server.
+
+    - one directory per collection under root; vectors are unit-normalized
+      and stored in a memory-mapped float32 / float16 matrix, payloads in SQLite
+    - search is exact cosine (matrix product + top-k)
+    - ivf_lists > 0 adds IVF partitioning once a collection has at least
+      ivf_min_rows points: k-means lists, and only the ivf_probe nearest
+      lists are scored (approximate); lists are trained at the end of the
+      upsert that crosses ivf_min_rows and retrained when the collection
+      has doubled since (or explicitly with build()), never inside a search
+    - several processes may share root (server and CLI): upserts are
+      serialized with a per-collection file lock and searches see rows
+      written by other processes
+    """
+
+    def __init__(self, root: str, ivf_lists: int = 0, ivf_probe: int = 8, ivf_min_rows: int = 50000):
+        self.root = root
+        self.ivf_lists = ivf_lists
+        self.ivf_probe = ivf_probe
+        self.ivf_min_rows = ivf_min_rows
+        self._collections: Dict[str, _Collection] = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        logger.info(f"Local vector index at {root} (ivf_lists={ivf_lists}, probe={ivf_probe})")
+
+    def _dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _get(self, name: str) -> _Collection:
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is not None and collection.replaced():
+                # recreated (or dropped) by another process: the cached handle
+                # points at deleted files
+                logger.info(f"Local collection '{name}' changed on disk; reopening")
+                del self._collections[name]
+                with collection.lock:
+                    collection.close()
+                collection = None
+            if collection is None:
+                if not os.path.exists(os.path.join(self._dir(name), "meta.json")):
+                    raise ValueError(f"Collection '{name}' does not exist in {self.root}.")
+                collection = self._collections[name] = _Collection(self._dir(name))
+            return collection
+
+    def _drop(self, name: str) -> None:
+        with self._lock:
+            collection = self._collections.pop(name, None)
+        if collection is not None:
+            collection.close()
+        shutil.rmtree(self._dir(name), ignore_errors=True)
+
+    def ensure_collection(self, name: str, dim: int, dtype: str = "float32", profile: Optional[str] = None):
+        """
+        Create the collection only if it doesn't already exist. profile is
+        accepted for QdrantIndex compatibility; storage is always memory-mapped.
+        """
+        try:
+            if not os.path.exists(os.path.join(self._dir(name), "meta.json")):
+                logger.info(f"Creating new local collection: {name}")
+                _Collection.create(self._dir(name), dim, dtype)
+                return
+            collection = self._get(name)
+            if collection.dim != dim:
+                raise ValueError(
+                    f"Collection '{name}' has vector size {collection.dim} but embeddings have {dim} dims. "
+                    "Recreate it with --force."
+                )
+            logger.info(f"Local collection already exists: {name}")
+        except Exception as e:
+            logger.error(f"Failed to create or verify collection '{name}': {e}")
+            raise
+
+    def recreate(self, name: str, dim: int, dtype: str = "float32", profile: Optional[str] = None):
+        try:
+            logger.info(f"Recreating local collection: {name} (dim={dim}, dtype={dtype})")
+            self._drop(name)
+            _Collection.create(self._dir(name), dim, dtype)
+        except Exception as e:
+            logger.error(f"Failed to recreate collection '{name}': {e}")
+            raise
+
+    def upsert(self, name: str, vectors, payloads, start_id: int = None):
+        """Insert or overwrite points; ids come from payload['id'] as in QdrantIndex."""
+        try:
+            payloads = list(payloads)
+            if not payloads:
+                return
+            ids = [str(payload.get("id")) for payload in payloads]
+            matrix = np.asarray(vectors, dtype=np.float32).reshape(len(payloads), -1)
+            collection = self._get(name)
+            if matrix.shape[1] != collection.dim:
+                raise ValueError(f"Got {matrix.shape[1]}-dim vectors for a {collection.dim}-dim collection.")
+            with collection.lock, collection.file_lock():
+                collection.upsert(ids, matrix, payloads)
+                if self.ivf_lists > 0 and collection.needs_training(self.ivf_min_rows):
+                    collection.train_ivf(self.ivf_lists)
+            logger.info(f"Upserted {len(ids)} points into local collection '{name}'")
+        except Exception as e:
+            logger.error(f"Failed to upsert points to collection '{name}': {e}")
+            raise
+
+    def build(self, name: str, force: bool = False) -> bool:
+        """
+        Train the IVF lists now if they are due (or always with force);
+        returns whether training ran. Upserts do this automatically.
+        """
+        if self.ivf_lists <= 0:
+            return False
+        try:
+            collection = self._get(name)
+            with collection.lock, collection.file_lock():
+                collection.refresh()
+                if collection.count == 0 or not (force or collection.needs_training(self.ivf_min_rows)):
+                    return False
+                collection.train_ivf(self.ivf_lists)
+                return True
+        except Exception as e:
+            logger.error(f"Failed to build IVF lists for collection '{name}': {e}")
+            raise
+
+    def existing_ids(self, name: str, ids: Sequence[str], batch_size: int = 1000) -> Set[str]:
+        try:
+            collection = self._get(name)
+            with collection.lock:
+                return set(collection.rows_for([str(i) for i in ids]))
+        except Exception as e:
+            logger.error(f"Failed to look up existing ids in '{name}': {e}")
+            raise
+
+    def get_payloads(
+        self, name: str, ids: Sequence[str], payload_fields: Optional[Sequence[str]] = None, batch_size: int = 1000
+    ) -> Dict[str, Dict[str, Any]]:
+        try:
+            collection = self._get(name)
+            with collection.lock:
+                found = collection.payloads_for([str(i) for i in ids])
+            return {point_id: self._project(payload, payload_fields) for point_id, payload in found.items()}
+        except Exception as e:
+            logger.error(f"Failed to retrieve payloads from '{name}': {e}")
+            raise
+
+    def set_payloads(self, name: str, payloads: Dict[str, Dict[str, Any]]) -> None:
+        """Set payload keys on existing points (id -> keys to set; other keys are kept)."""
+        try:
+            collection = self._get(name)
+            with collection.lock, collection.file_lock():
+                collection.update_payloads({str(k): v for k, v in payloads.items()})
+            logger.info(f"Updated payloads of {len(payloads)} points in local collection '{name}'")
+        except Exception as e:
+            logger.error(f"Failed to set payloads in collection '{name}': {e}")
+            raise
+
+    def search(self, name: str, vector, top_k: int = 5, payload_fields: Optional[Sequence[str]] = None):
+        hits = self.search_batch(name, [vector], top_k=top_k, payload_fields=payload_fields)
+        return hits[0] if hits else []
+
+    def search_batch(
+        self, name: str, vectors, top_k: int = 5, batch_size: int = 256,
+        payload_fields: Optional[Sequence[str]] = None,
+    ):
+        """
+        One hit list per query vector, in input order: IVF when ivf_lists > 0
+        and the lists are trained, exact otherwise. Never trains.
+        """
+        try:
+            queries = np.asarray(vectors, dtype=np.float32)
+            if queries.ndim == 1:
+                queries = queries[None, :]
+            queries = _normalize(queries)
+            collection = self._get(name)
+            results = []
+            with collection.lock:
+                collection.refresh()
+                if collection.count == 0:
+                    return [[] for _ in queries]
+                use_ivf = self.ivf_lists > 0 and collection.centroids is not None
+                for start in range(0, len(queries), batch_size):
+                    part = queries[start:start + batch_size]
+                    if use_ivf:
+                        results.extend(collection.search_ivf(part, top_k, self.ivf_probe))
+                    else:
+                        results.extend(collection.search_exact(part, top_k))
+                payloads = collection.payloads(sorted({int(r) for rows, _ in results for r in rows}))
+                row_ids = collection.row_ids
+            return [
+                [
+                    LocalPoint(row_ids[row], float(score), self._project(payloads.get(int(row), {}), payload_fields))
+                    for row, score in zip(rows, scores)
+                ]
+                for rows, scores in results
+            ]
+        except Exception as e:
+            logger.error(f"Local search failed for collection '{name}': {e}")
+            return [[] for _ in range(len(vectors))]
+
+    @staticmethod
+    def _project(payload: Dict[str, Any], payload_fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+        if payload_fields is None:
+            return payload
+        return {k: payload[k] for k in payload_fields if k in payload}
+
+    def count(self, name: str) -> int:
+        collection = self._get(name)
+        with collection.lock:
+            collection.refresh()
+            return collection.count
+
+    def close(self) -> None:
+        with self._lock:
+            collections, self._collections = list(self._collections.values()), {}
+        for collection in collections:
+            try:
+                collection.close()
+            except Exception:
+                pass
@@ -0,0 +1,98 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from qdrant_client.http import models
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    """
+    Named trade-off between recall, RAM and latency for a Qdrant collection.
+
+    - m / ef_construct: HNSW graph degree and build-time beam (None = server default)
+    - hnsw_ef        : search-time beam width (None = server default)
+    - quantization   : None, "int8" (scalar) or "binary"; quantized vectors
+                       are kept in RAM, originals are used for rescoring
+    - oversampling   : candidates fetched per result before rescoring
+    - vectors_on_disk / hnsw_on_disk / payload_on_disk: mmap storage instead of RAM
+    """
+    name: str
+    m: Optional[int] = None
+    ef_construct: Optional[int] = None
+    hnsw_ef: Optional[int] = None
+    quantization: Optional[str] = None
+    rescore: bool = True
+    oversampling: Optional[float] = None
+    vectors_on_disk: Optional[bool] = None
+    hnsw_on_disk: Optional[bool] = None
+    payload_on_disk: Optional[bool] = None
+
+    def hnsw_config(self) -> Optional[models.HnswConfigDiff]:
+        if self.m is None and self.ef_construct is None and self.hnsw_on_disk is None:
+            return None
+        return models.HnswConfigDiff(m=self.m, ef_construct=self.ef_construct, on_disk=self.hnsw_on_disk)
+
+    def quantization_config(self):
+        if self.quantization == "int8":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def create_kwargs(self) -> Dict[str, Any]:
+        """Extra create_collection arguments (vectors_config is built by the index)."""
+        return dict(
+            hnsw_config=self.hnsw_config(),
+            quantization_config=self.quantization_config(),
+            on_disk_payload=self.payload_on_disk,
+        )
+
+    def update_kwargs(self) -> Dict[str, Any]:
+        """update_collection arguments that move an existing collection to this profile."""
+        kwargs: Dict[str, Any] = dict(
+            hnsw_config=self.hnsw_config(),
+            quantization_config=self.quantization_config() or models.Disabled.DISABLED,
+        )
+        if self.vectors_on_disk is not None:
+            kwargs["vectors_config"] = {"": models.VectorParamsDiff(on_disk=self.vectors_on_disk)}
+        if self.payload_on_disk is not None:
+            kwargs["collection_params"] = models.CollectionParamsDiff(on_disk_payload=self.payload_on_disk)
+        return kwargs
+
+    def search_params(self) -> Optional[models.SearchParams]:
+        quantization = None
+        if self.quantization is not None:
+            quantization = models.QuantizationSearchParams(rescore=self.rescore, oversampling=self.oversampling)
+        if self.hnsw_ef is None and quantization is None:
+            return None
+        return models.SearchParams(hnsw_ef=self.hnsw_ef, quantization=quantization)
+
+PROFILES: Dict[str, CollectionProfile] = {
+    # plain COSINE collection with server defaults, float vectors in RAM
+    "default": CollectionProfile("default"),
+    # denser graph, wider beam, int8 copies in RAM next to the originals
+    "low-latency": CollectionProfile(
+        "low-latency", m=32, ef_construct=256, hnsw_ef=128,
+        quantization="int8", oversampling=1.5,
+        vectors_on_disk=False, payload_on_disk=False,
+    ),
+    # int8 in RAM, originals and payloads on disk (read only for rescoring)
+    "balanced": CollectionProfile(
+        "balanced", m=16, ef_construct=128, hnsw_ef=64,
+        quantization="int8", oversampling=2.0,
+        vectors_on_disk=True, payload_on_disk=True,
+    ),
+    # 1 bit per dimension in RAM, everything else on disk; best with >= 768 dims
+    "low-memory": CollectionProfile(
+        "low-memory", m=16, ef_construct=100, hnsw_ef=64,
+        quantization="binary", oversampling=3.0,
+        vectors_on_disk=True, hnsw_on_disk=True, payload_on_disk=True,
+    ),
+}
+
+def get_profile(name: Optional[str]) -> CollectionProfile:
+    """Look up a profile by name; None or "" means the default profile."""
+    try:
+        return PROFILES[name or "default"]
+    except KeyError:
+        raise ValueError(f"Unknown collection profile '{name}' (use one of {', '.join(PROFILES)}).")
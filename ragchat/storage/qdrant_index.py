@@ -1,27 +1,220 @@
-from typing import List, Sequence
-from qdrant_client import QdrantClient
+import inspect
+import threading
+from typing import Any, Dict, Iterator, List, Sequence, Set, Tuple
+import httpx
+import numpy as np
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.http import models
 from ragchat.config import RAGSettings
+from ragchat.storage.profiles import CollectionProfile, get_profile
 from ragchat.logger import logger
 from typing import Optional
-class QdrantIndex:
-    def __init__(self, url: str = None, api_key: Optional[str] = None, timeout: float = 20.0):
+
+TRANSPORTS = ("rest", "grpc")
+
+# one client per (url, api_key, transport, timeout, pool_size), shared by all QdrantIndex instances
+_shared_clients: Dict[Tuple, List[Any]] = {}
+_clients_lock = threading.Lock()
+
+def _client_kwargs(
+    url: str, api_key: Optional[str], transport: str, timeout: float, pool_size: int, client_cls
+) -> Dict[str, Any]:
+    """
+    Client options for the transport. REST connections are pooled and kept
+    alive (pool_size connections); the client default opens a fresh HTTP
+    connection per request. gRPC uses pool_size channels where supported.
+    """
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unknown Qdrant transport '{transport}' (use one of {TRANSPORTS}).")
+    kwargs: Dict[str, Any] = dict(
+        url=url,
+        api_key=api_key,
+        prefer_grpc=transport == "grpc",
+        grpc_port=RAGSettings.qdrant_grpc_port,
+        timeout=timeout,
+        check_compatibility=False,
+    )
+    if pool_size:
+        if transport == "rest":
+            kwargs["limits"] = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        elif "pool_size" in inspect.signature(client_cls.__init__).parameters:
+            kwargs["pool_size"] = pool_size
+    return kwargs
+
+def acquire_client(
+    url: str, api_key: Optional[str], transport: str, timeout: float, pool_size: int
+) -> QdrantClient:
+    """Shared, reference-counted QdrantClient for this configuration."""
+    key = (url, api_key, transport, timeout, pool_size)
+    with _clients_lock:
+        entry = _shared_clients.get(key)
+        if entry is None:
+            client = QdrantClient(**_client_kwargs(url, api_key, transport, timeout, pool_size, QdrantClient))
+            entry = _shared_clients[key] = [client, 0]
+            logger.info(f"Connected to Qdrant at: {url} ({transport}, pool={pool_size})")
+        entry[1] += 1
+        return entry[0]
+
+def release_client(client: QdrantClient) -> None:
+    """Drop one reference; the client is closed when nobody uses it."""
+    with _clients_lock:
+        for key, entry in list(_shared_clients.items()):
+            if entry[0] is client:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del _shared_clients[key]
+                    client.close()
+                return
+
+class _IndexBase:
+    """Request building shared by the sync and async indexes."""
+
+    def _vectors_config(self, dim: int, dtype: str = "float32", on_disk: Optional[bool] = None) -> models.VectorParams:
+        """
+        COSINE vector params sized to the embedder output.
+        dtype='float16' stores half-precision vectors in Qdrant.
+        on_disk=True keeps the original vectors in mmap storage.
+        """
+        datatype = models.Datatype.FLOAT16 if dtype == "float16" else None
+        return models.VectorParams(size=dim, distance=models.Distance.COSINE, datatype=datatype, on_disk=on_disk)
+
+    def _resolve_profile(self, profile: Optional[str]) -> CollectionProfile:
+        return get_profile(profile) if profile else self.profile
+
+    def _create_kwargs(self, dim: int, dtype: str, profile: CollectionProfile) -> Dict[str, Any]:
+        return dict(
+            vectors_config=self._vectors_config(dim, dtype, profile.vectors_on_disk),
+            **profile.create_kwargs(),
+        )
+
+    def _to_vector(self, v: Sequence[float]) -> List[float]:
+        """
+        Safely convert numpy arrays or lists/tuples to a plain Python list.
+        """
+        try:
+            return v.tolist() if hasattr(v, "tolist") else list(v)
+        except Exception as e:
+            logger.error(f"Failed to convert vector to list: {e}")
+            raise
+
+    def _to_matrix(self, vectors) -> List[List[float]]:
+        """
+        Convert a batch of vectors to the nested lists the client serializes.
+        2D ndarrays (and lists of 1D arrays) are converted in a single
+        vectorized tolist() call instead of one Python loop per vector.
+
+        This still creates one Python float per component: qdrant-client
+        cannot send ndarrays as they are (upload_points / upload_collection
+        call tolist() per batch and build a PointStruct per vector over REST,
+        and gRPC copies every component into protobuf), so one tolist()
+        feeding a columnar Batch is the cheapest conversion available.
+        """
+        try:
+            if isinstance(vectors, np.ndarray):
+                return np.ascontiguousarray(vectors, dtype=np.float32).tolist()
+            vectors = list(vectors)
+            if vectors and isinstance(vectors[0], np.ndarray):
+                return np.stack(vectors).astype(np.float32, copy=False).tolist()
+            return [self._to_vector(v) for v in vectors]
+        except Exception as e:
+            logger.error(f"Failed to convert vectors batch: {e}")
+            raise
+
+    def _points(self, vectors, payloads) -> models.Batch:
+        """
+        One columnar Batch (ids / vectors / payloads) for an upsert, rather
+        than a PointStruct per vector. Point IDs come from payload['id'].
+        """
+        payloads = list(payloads)
+        ids = [payload.get("id") for payload in payloads]
+        matrix = self._to_matrix(vectors)
+        if len(matrix) != len(ids):
+            raise ValueError(f"Got {len(matrix)} vectors for {len(ids)} payloads.")
+        return models.Batch(ids=ids, vectors=matrix, payloads=payloads)
+
+    def _payload_selector(self, payload_fields: Optional[Sequence[str]]):
+        """True for full payloads, else an include-only selector."""
+        if payload_fields is None:
+            return True
+        return models.PayloadSelectorInclude(include=list(payload_fields))
+
+    def _query_requests(
+        self, vectors, top_k: int, batch_size: int, payload_fields: Optional[Sequence[str]] = None
+    ) -> Iterator[List[models.QueryRequest]]:
+        """Nearest-neighbour requests for a batch of query vectors, batch_size per call."""
+        matrix = self._to_matrix(vectors)
+        for start in range(0, len(matrix), batch_size):
+            yield [
+                models.QueryRequest(
+                    query=models.NearestQuery(nearest=v),
+                    limit=top_k,
+                    with_vector=False,
+                    with_payload=self._payload_selector(payload_fields),
+                    params=self.profile.search_params(),
+                )
+                for v in matrix[start:start + batch_size]
+            ]
+
+    def _set_payload_operations(
+        self, payloads: Dict[str, Dict[str, Any]], batch_size: int
+    ) -> Iterator[List[models.SetPayloadOperation]]:
+        """One SetPayloadOperation per point, batch_size per request."""
+        items = list(payloads.items())
+        for start in range(0, len(items), batch_size):
+            yield [
+                models.SetPayloadOperation(set_payload=models.SetPayload(payload=payload, points=[point_id]))
+                for point_id, payload in items[start:start + batch_size]
+            ]
+
+    def _check_vector_size(self, name: str, info, dim: int) -> None:
+        size = getattr(info.config.params.vectors, "size", None)
+        if size is not None and size != dim:
+            raise ValueError(
+                f"Collection '{name}' has vector size {size} but embeddings have {dim} dims. "
+                "Recreate it with --force."
+            )
+
+class QdrantIndex(_IndexBase):
+    def __init__(
+        self,
+        url: str = None,
+        api_key: Optional[str] = None,
+        timeout: float = 20.0,
+        transport: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        profile: Optional[str] = None,
+    ):
         """
         Simple wrapper around QdrantClient for collection management,
         upsert, and search.
+        transport='rest' | 'grpc' (QDRANT_TRANSPORT); clients are shared per
+        configuration with a pool of pool_size connections (QDRANT_POOL_SIZE).
+        profile (QDRANT_PROFILE) names the CollectionProfile used to create
+        collections and for search-time hnsw_ef / quantization rescoring.
         """
         try:
             url = url or RAGSettings.qdrant_url
             api_key = api_key or RAGSettings.qdrant_api_key
-            self.client = QdrantClient(url=url, api_key=api_key, prefer_grpc=False, timeout=timeout, check_compatibility=False)
-            logger.info(f"Connected to Qdrant at: {url}")
+            self.transport = transport or RAGSettings.qdrant_transport
+            self.pool_size = RAGSettings.qdrant_pool_size if pool_size is None else pool_size
+            self.profile = get_profile(profile or RAGSettings.qdrant_profile)
+            self.client = acquire_client(url, api_key, self.transport, timeout, self.pool_size)
         except Exception as e:
             logger.error(f"Failed to initialize QdrantClient: {e}")
             raise
 
-    def ensure_collection(self, name: str, dim: int):
+    def close(self) -> None:
+        if self.client is not None:
+            release_client(self.client)
+            self.client = None
+
+    def ensure_collection(self, name: str, dim: int, dtype: str = "float32", profile: Optional[str] = None):
         """
         Create the collection only if it doesn't already exist.
+        An existing collection with a different vector size is an error:
+        recreate it (--force) after changing the embedding output dimension.
+        An explicitly named profile is also applied to an existing collection
+        (HNSW, quantization and on-disk settings; Qdrant re-optimizes in place).
         """
         try:
             existing = [c.name for c in self.client.get_collections().collections]
@@ -29,67 +222,114 @@ class QdrantIndex:
             logger.error(f"Failed to get existing Qdrant collections: {e}")
             raise
         try:
+            settings = self._resolve_profile(profile)
             if name not in existing:
-                logger.info(f"Creating new Qdrant collection: {name}")
+                logger.info(f"Creating new Qdrant collection: {name} (profile={settings.name})")
                 self.client.create_collection(
                     collection_name=name,
-                    vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE)
+                    **self._create_kwargs(dim, dtype, settings)
                 )
             else:
+                self._check_vector_size(name, self.client.get_collection(name), dim)
                 logger.info(f"Qdrant collection already exists: {name}")
+                if profile and settings.name != "default":
+                    logger.info(f"Applying profile '{settings.name}' to collection: {name}")
+                    self.client.update_collection(collection_name=name, **settings.update_kwargs())
         except Exception as e:
             logger.error(f"Failed to create or verify collection '{name}': {e}")
             raise
 
-    def recreate(self, name: str, dim: int):
+    def recreate(self, name: str, dim: int, dtype: str = "float32", profile: Optional[str] = None):
         try:
-            logger.info(f"Recreating collection: {name}")
+            settings = self._resolve_profile(profile)
+            logger.info(f"Recreating collection: {name} (dim={dim}, dtype={dtype}, profile={settings.name})")
             self.client.recreate_collection(
                 collection_name=name,
-                vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE)
+                **self._create_kwargs(dim, dtype, settings)
             )
         except Exception as e:
             logger.error(f"Failed to recreate collection '{name}': {e}")
             raise
 
-    def _to_vector(self, v: Sequence[float]) -> List[float]:
+    def upsert(self, name: str, vectors, payloads, start_id: int = None):
         """
-        Safely convert numpy arrays or lists/tuples to a plain Python list.
+        Upsert a batch of points into Qdrant with globally unique IDs.
+        - vectors: iterable of embedding vectors (list[list[float]] or 2D np.ndarray)
+        - payloads: same length as vectors, each is a dict
+        Points are sent as one columnar Batch (ids / vectors / payloads)
+        rather than a PointStruct per vector.
         """
         try:
-            return v.tolist() if hasattr(v, "tolist") else list(v)
+            points = self._points(vectors, payloads)
+            self.client.upsert(collection_name=name, points=points, wait=True)
+
+            logger.info(f"Upserted {len(points.ids)} points into '{name}' (hash IDs)")
+
         except Exception as e:
-            logger.error(f"Failed to convert vector to list: {e}")
+            logger.error(f"Failed to upsert points to collection '{name}': {e}")
             raise
 
-    def upsert(self, name: str, vectors, payloads, start_id: int):
+    def existing_ids(self, name: str, ids: Sequence[str], batch_size: int = 1000) -> Set[str]:
         """
-        Upsert a batch of points into Qdrant with globally unique IDs.
-        - vectors: iterable of embedding vectors (list[list[float]] or np.ndarray)
-        - payloads: same length as vectors, each is a dict
+        Return the subset of ids that already exist in the collection,
+        asking Qdrant in bulk (retrieve without payloads or vectors).
         """
+        found: Set[str] = set()
         try:
-            points = []
-            for offset, (v, payload) in enumerate(zip(vectors, payloads)):
-                points.append(
-                    models.PointStruct(
-                        id=payload.get("id"),
-                        vector=self._to_vector(v),
-                        payload=payload,
-                    )
+            for start in range(0, len(ids), batch_size):
+                points = self.client.retrieve(
+                    collection_name=name,
+                    ids=list(ids[start:start + batch_size]),
+                    with_payload=False,
+                    with_vectors=False,
                 )
+                found.update(str(p.id) for p in points)
+        except Exception as e:
+            logger.error(f"Failed to look up existing ids in '{name}': {e}")
+            raise
+        return found
 
-            self.client.upsert(collection_name=name, points=points, wait=True)
-
-            logger.info(f"Upserted {len(points)} points into '{name}' (hash IDs)")
+    def get_payloads(
+        self, name: str, ids: Sequence[str], payload_fields: Optional[Sequence[str]] = None, batch_size: int = 1000
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Payloads of the points that exist among ids (id -> payload), limited
+        to payload_fields when given.
+        """
+        found: Dict[str, Dict[str, Any]] = {}
+        try:
+            for start in range(0, len(ids), batch_size):
+                points = self.client.retrieve(
+                    collection_name=name,
+                    ids=list(ids[start:start + batch_size]),
+                    with_payload=self._payload_selector(payload_fields),
+                    with_vectors=False,
+                )
+                found.update((str(p.id), p.payload or {}) for p in points)
+        except Exception as e:
+            logger.error(f"Failed to retrieve payloads from '{name}': {e}")
+            raise
+        return found
 
+    def set_payloads(self, name: str, payloads: Dict[str, Dict[str, Any]], batch_size: int = 256) -> None:
+        """
+        Set payload keys on existing points (id -> keys to set; other keys
+        are kept), batch_size points per batch_update_points request.
+        """
+        try:
+            for operations in self._set_payload_operations(payloads, batch_size):
+                self.client.batch_update_points(collection_name=name, update_operations=operations, wait=True)
+            logger.info(f"Updated payloads of {len(payloads)} points in '{name}'")
         except Exception as e:
-            logger.error(f"Failed to upsert points to collection '{name}': {e}")
+            logger.error(f"Failed to set payloads in collection '{name}': {e}")
             raise
 
-    def search(self, name: str, vector, top_k: int = 5):
+    def search(self, name: str, vector, top_k: int = 5, payload_fields: Optional[Sequence[str]] = None):
         """
-        Search top_k nearest neighbors for a given query vector.
+        Search top_k nearest neighbors for a given query vector
+        (list or 1D np.ndarray).
+        payload_fields limits the returned payload to those keys
+        (None = full payload).
         """
         try:
             query_vector = self._to_vector(vector)
@@ -100,10 +340,178 @@ class QdrantIndex:
                 query=query,
                 limit=top_k,
                 with_vectors=False,
-                with_payload=True,
+                with_payload=self._payload_selector(payload_fields),
+                search_params=self.profile.search_params(),
+            )
+
+            return results.points
+        except Exception as e:
+            logger.error(f"Qdrant search failed for collection '{name}': {e}")
+            return []   # safer fallback
+
+    def search_batch(
+        self, name: str, vectors, top_k: int = 5, batch_size: int = 256,
+        payload_fields: Optional[Sequence[str]] = None,
+    ):
+        """
+        Search many query vectors with query_batch_points, batch_size queries
+        per request instead of one round trip each.
+        Returns one hit list per vector, in input order.
+        """
+        results = []
+        try:
+            for requests in self._query_requests(vectors, top_k, batch_size, payload_fields):
+                responses = self.client.query_batch_points(collection_name=name, requests=requests)
+                results.extend(r.points for r in responses)
+            return results
+        except Exception as e:
+            logger.error(f"Qdrant batch search failed for collection '{name}': {e}")
+            return results + [[] for _ in range(len(vectors) - len(results))]
+
+class AsyncQdrantIndex(_IndexBase):
+    """
+    asyncio counterpart of QdrantIndex on AsyncQdrantClient, with the same
+    ensure_collection / recreate / upsert / existing_ids / get_payloads /
+    set_payloads / search / search_batch surface
+    (as coroutines). The client keeps a size-limited connection pool;
+    create one instance per event loop and share it (aclose() on shutdown).
+    """
+
+    def __init__(
+        self,
+        url: str = None,
+        api_key: Optional[str] = None,
+        timeout: float = 20.0,
+        transport: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        profile: Optional[str] = None,
+    ):
+        try:
+            url = url or RAGSettings.qdrant_url
+            api_key = api_key or RAGSettings.qdrant_api_key
+            self.transport = transport or RAGSettings.qdrant_transport
+            self.pool_size = RAGSettings.qdrant_pool_size if pool_size is None else pool_size
+            self.profile = get_profile(profile or RAGSettings.qdrant_profile)
+            self.client = AsyncQdrantClient(
+                **_client_kwargs(url, api_key, self.transport, timeout, self.pool_size, AsyncQdrantClient)
+            )
+            logger.info(f"Async Qdrant client for: {url} ({self.transport}, pool={self.pool_size})")
+        except Exception as e:
+            logger.error(f"Failed to initialize AsyncQdrantClient: {e}")
+            raise
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+    async def ensure_collection(self, name: str, dim: int, dtype: str = "float32", profile: Optional[str] = None):
+        try:
+            existing = [c.name for c in (await self.client.get_collections()).collections]
+            settings = self._resolve_profile(profile)
+            if name not in existing:
+                logger.info(f"Creating new Qdrant collection: {name} (profile={settings.name})")
+                await self.client.create_collection(
+                    collection_name=name,
+                    **self._create_kwargs(dim, dtype, settings)
+                )
+            else:
+                self._check_vector_size(name, await self.client.get_collection(name), dim)
+                logger.info(f"Qdrant collection already exists: {name}")
+                if profile and settings.name != "default":
+                    logger.info(f"Applying profile '{settings.name}' to collection: {name}")
+                    await self.client.update_collection(collection_name=name, **settings.update_kwargs())
+        except Exception as e:
+            logger.error(f"Failed to create or verify collection '{name}': {e}")
+            raise
+
+    async def recreate(self, name: str, dim: int, dtype: str = "float32", profile: Optional[str] = None):
+        try:
+            settings = self._resolve_profile(profile)
+            logger.info(f"Recreating collection: {name} (dim={dim}, dtype={dtype}, profile={settings.name})")
+            await self.client.recreate_collection(
+                collection_name=name,
+                **self._create_kwargs(dim, dtype, settings)
             )
+        except Exception as e:
+            logger.error(f"Failed to recreate collection '{name}': {e}")
+            raise
+
+    async def upsert(self, name: str, vectors, payloads, start_id: int = None):
+        try:
+            points = self._points(vectors, payloads)
+            await self.client.upsert(collection_name=name, points=points, wait=True)
+            logger.info(f"Upserted {len(points.ids)} points into '{name}' (hash IDs)")
+        except Exception as e:
+            logger.error(f"Failed to upsert points to collection '{name}': {e}")
+            raise
 
+    async def existing_ids(self, name: str, ids: Sequence[str], batch_size: int = 1000) -> Set[str]:
+        found: Set[str] = set()
+        try:
+            for start in range(0, len(ids), batch_size):
+                points = await self.client.retrieve(
+                    collection_name=name,
+                    ids=list(ids[start:start + batch_size]),
+                    with_payload=False,
+                    with_vectors=False,
+                )
+                found.update(str(p.id) for p in points)
+        except Exception as e:
+            logger.error(f"Failed to look up existing ids in '{name}': {e}")
+            raise
+        return found
+
+    async def get_payloads(
+        self, name: str, ids: Sequence[str], payload_fields: Optional[Sequence[str]] = None, batch_size: int = 1000
+    ) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        try:
+            for start in range(0, len(ids), batch_size):
+                points = await self.client.retrieve(
+                    collection_name=name,
+                    ids=list(ids[start:start + batch_size]),
+                    with_payload=self._payload_selector(payload_fields),
+                    with_vectors=False,
+                )
+                found.update((str(p.id), p.payload or {}) for p in points)
+        except Exception as e:
+            logger.error(f"Failed to retrieve payloads from '{name}': {e}")
+            raise
+        return found
+
+    async def set_payloads(self, name: str, payloads: Dict[str, Dict[str, Any]], batch_size: int = 256) -> None:
+        try:
+            for operations in self._set_payload_operations(payloads, batch_size):
+                await self.client.batch_update_points(collection_name=name, update_operations=operations, wait=True)
+            logger.info(f"Updated payloads of {len(payloads)} points in '{name}'")
+        except Exception as e:
+            logger.error(f"Failed to set payloads in collection '{name}': {e}")
+            raise
+
+    async def search(self, name: str, vector, top_k: int = 5, payload_fields: Optional[Sequence[str]] = None):
+        try:
+            results = await self.client.query_points(
+                collection_name=name,
+                query=models.NearestQuery(nearest=self._to_vector(vector)),
+                limit=top_k,
+                with_vectors=False,
+                with_payload=self._payload_selector(payload_fields),
+                search_params=self.profile.search_params(),
+            )
             return results.points
         except Exception as e:
             logger.error(f"Qdrant search failed for collection '{name}': {e}")
             return []   # safer fallback
+
+    async def search_batch(
+        self, name: str, vectors, top_k: int = 5, batch_size: int = 256,
+        payload_fields: Optional[Sequence[str]] = None,
+    ):
+        results = []
+        try:
+            for requests in self._query_requests(vectors, top_k, batch_size, payload_fields):
+                responses = await self.client.query_batch_points(collection_name=name, requests=requests)
+                results.extend(r.points for r in responses)
+            return results
+        except Exception as e:
+            logger.error(f"Qdrant batch search failed for collection '{name}': {e}")
+            return results + [[] for _ in range(len(vectors) - len(results))]
@@ -0,0 +1,40 @@
+from typing import Any, Dict, List, Optional, Protocol, Sequence, Set, runtime_checkable
+
+@runtime_checkable
+class VectorStore(Protocol):
+    """
+    What Retriever, the ingestion pipeline and the API need from a vector
+    index. Implemented by QdrantIndex (remote) and LocalIndex (in-process).
+
+    - collections hold COSINE vectors; point ids come from payload['id']
+      and upserting an existing id overwrites it
+    - search / search_batch return hits with .id, .score and .payload,
+      best first; search_batch returns one hit list per query, in order
+    - payload_fields limits the returned payload keys (None = full payload)
+    - set_payloads sets the given keys on existing points, other keys are kept
+    """
+
+    def ensure_collection(self, name: str, dim: int, dtype: str = "float32", profile: Optional[str] = None): ...
+
+    def recreate(self, name: str, dim: int, dtype: str = "float32", profile: Optional[str] = None): ...
+
+    def upsert(self, name: str, vectors, payloads, start_id: int = None): ...
+
+    def existing_ids(self, name: str, ids: Sequence[str], batch_size: int = 1000) -> Set[str]: ...
+
+    def get_payloads(
+        self, name: str, ids: Sequence[str], payload_fields: Optional[Sequence[str]] = None, batch_size: int = 1000
+    ) -> Dict[str, Dict[str, Any]]: ...
+
+    def set_payloads(self, name: str, payloads: Dict[str, Dict[str, Any]]) -> None: ...
+
+    def search(
+        self, name: str, vector, top_k: int = 5, payload_fields: Optional[Sequence[str]] = None
+    ) -> List[Any]: ...
+
+    def search_batch(
+        self, name: str, vectors, top_k: int = 5, batch_size: int = 256,
+        payload_fields: Optional[Sequence[str]] = None,
+    ) -> List[List[Any]]: ...
+
+    def close(self) -> None: ...
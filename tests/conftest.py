@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from ragchat.storage import qdrant_index
+from ragchat.storage.qdrant_index import QdrantIndex
+
+@pytest.fixture
+def memory_index(monkeypatch):
+    """QdrantIndex backed by qdrant-client's in-process (":memory:") mode."""
+    client = QdrantClient(":memory:")
+    monkeypatch.setattr(qdrant_index, "acquire_client", lambda *args: client)
+    index = QdrantIndex(url="http://qdrant.test", transport="rest", pool_size=0, profile="default")
+    yield index
+    client.close()
+
+@pytest.fixture
+def local_index(tmp_path):
+    from ragchat.storage.local_index import LocalIndex
+
+    index = LocalIndex(str(tmp_path / "local_index"))
+    yield index
+    index.close()
+
+class FakeTokenizer:
+    """Whitespace tokenizer with [CLS] / [SEP] (the fields TextEmbedder reads)."""
+
+    def __call__(self, texts, add_special_tokens=True, truncation=False, max_length=None):
+        input_ids = []
+        for text in texts:
+            ids = [1] + [hash(w) % 1000 + 2 for w in text.split()] + [2]
+            input_ids.append(ids[:max_length] if truncation and max_length else ids)
+        return {"input_ids": input_ids}
+
+class FakeBackend:
+    """Deterministic stand-in for the model: one vector per text, recording each encode call."""
+
+    def __init__(self, dim=8, max_seq_length=32):
+        self.dim = dim
+        self.max_seq_length = max_seq_length
+        self.tokenizer = FakeTokenizer()
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        self.calls.append(list(texts))
+        out = np.stack([
+            np.random.default_rng(sum(t.encode("utf-8")) + len(t)).standard_normal(self.dim).astype(np.float32)
+            for t in texts
+        ])
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    """TextEmbedder(...) built in a test loads this backend instead of a model."""
+    from ragchat.core import embeddings
+
+    backend = FakeBackend()
+    monkeypatch.setattr(embeddings, "load_backend", lambda *args, **kwargs: backend)
+    return backend
@@ -0,0 +1,95 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import numpy as np
+import pytest
+from ragchat.core import backends
+from ragchat.core.backends import ONNX_CONFIG_FILE, ONNX_INT8_FILE, OnnxBackend, load_backend
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# stands in for onnxruntime: the "graph" returns (sum of ids, tokens, 1) per text
+FAKE_ORT = textwrap.dedent("""
+    import numpy as np
+
+    class SessionOptions:
+        graph_optimization_level = None
+        intra_op_num_threads = 0
+
+    class GraphOptimizationLevel:
+        ORT_ENABLE_ALL = "all"
+
+    class InferenceSession:
+        def __init__(self, path, options, providers):
+            self.path = path
+
+        def run(self, outputs, feeds):
+            ids, mask = feeds["input_ids"], feeds["attention_mask"]
+            out = np.stack([(ids * mask).sum(1), mask.sum(1), np.ones(len(ids))], axis=1)
+            return [out.astype(np.float32)]
+""")
+
+@pytest.fixture
+def onnx_dir(tmp_path, monkeypatch):
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+
+    words = "مرحبا بكم في النص التجريبي".split()
+    vocab = {"[PAD]": 0, "[UNK]": 1, "[CLS]": 2, "[SEP]": 3, **{w: i + 4 for i, w in enumerate(words)}}
+    tok = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tok.pre_tokenizer = pre_tokenizers.Whitespace()
+    tok.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", 2), ("[SEP]", 3)]
+    )
+    model_dir = tmp_path / "onnx"
+    PreTrainedTokenizerFast(
+        tokenizer_object=tok, unk_token="[UNK]", pad_token="[PAD]", cls_token="[CLS]", sep_token="[SEP]"
+    ).save_pretrained(str(model_dir))
+    (model_dir / ONNX_CONFIG_FILE).write_text(json.dumps({"dim": 3, "max_seq_length": 8, "quantized": True}))
+    (model_dir / ONNX_INT8_FILE).write_bytes(b"")
+
+    fake = tmp_path / "fake_modules"
+    fake.mkdir()
+    (fake / "onnxruntime.py").write_text(FAKE_ORT)
+    monkeypatch.syspath_prepend(str(fake))
+    monkeypatch.delitem(sys.modules, "onnxruntime", raising=False)
+    return str(model_dir)
+
+def test_onnx_backend_batches_and_normalizes(onnx_dir):
+    backend = load_backend("onnx", "unused", "cpu", onnx_dir=onnx_dir)
+
+    vectors = backend.encode(["مرحبا بكم", "في", "النص التجريبي في"], batch_size=2, show_progress_bar=False)
+
+    assert backend.quantized and backend.dim == 3 and backend.max_seq_length == 8
+    assert vectors.shape == (3, 3) and vectors.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+    # tokens counted with [CLS]/[SEP], padding masked out
+    expected = np.array([[2 + 4 + 5 + 3, 4, 1]], dtype=np.float32)
+    np.testing.assert_allclose(vectors[0], (expected / np.linalg.norm(expected))[0], rtol=1e-6)
+    assert backend.encode([], batch_size=2).shape == (0, 3)
+
+def test_onnx_backend_does_not_import_torch(onnx_dir, tmp_path):
+    script = textwrap.dedent(f"""
+        import sys
+        from ragchat.core.embeddings import TextEmbedder
+        embedder = TextEmbedder("unused", backend="onnx", onnx_dir={onnx_dir!r}, cache_size=0, as_numpy=True)
+        assert embedder.device == "cpu"
+        assert embedder.embed_batch(["مرحبا بكم"]).shape == (1, 3)
+        assert "torch" not in sys.modules, "torch was imported"
+        assert "sentence_transformers" not in sys.modules
+    """)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(tmp_path / "fake_modules"), REPO]))
+    result = subprocess.run([sys.executable, "-c", script], cwd=REPO, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+def test_missing_export_and_unknown_backend(tmp_path, onnx_dir):
+    with pytest.raises(FileNotFoundError):
+        OnnxBackend(str(tmp_path / "missing"))
+    with pytest.raises(ValueError):
+        load_backend("tensorrt", "unused", "cpu")
+
+def test_torch_backend_imports_lazily():
+    assert not hasattr(backends, "torch")
+    assert not hasattr(backends, "SentenceTransformer")
@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from ragchat.core.batching import MicroBatcher
+
+def _encode(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return [f"vec:{t}" for t in texts]
+    return encode
+
+def test_concurrent_calls_share_one_encode():
+    calls = []
+    release = threading.Event()
+
+    def slow_encode(texts):
+        release.wait(5)  # hold the first flush so the others queue up
+        return _encode(calls)(texts)
+
+    batcher = MicroBatcher(slow_encode, max_batch_size=8, max_wait_ms=50)
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            futures = [pool.submit(batcher.embed, f"t{i}", 5) for i in range(8)]
+            release.set()
+            results = [f.result() for f in futures]
+    finally:
+        batcher.close()
+
+    assert results == [f"vec:t{i}" for i in range(8)]
+    assert sum(len(c) for c in calls) == 8
+    assert len(calls) < 8
+    stats = batcher.stats()
+    assert stats["requests"] == 8 and stats["batches"] == len(calls)
+
+def test_flushes_at_max_batch_size():
+    calls = []
+    batcher = MicroBatcher(_encode(calls), max_batch_size=3, max_wait_ms=200)
+    futures = [batcher.submit(f"t{i}") for i in range(7)]
+    assert [f.result(5) for f in futures] == [f"vec:t{i}" for i in range(7)]
+    batcher.close()
+
+    assert all(len(c) <= 3 for c in calls)
+    assert [t for c in calls for t in c] == [f"t{i}" for i in range(7)]
+
+def test_encode_error_reaches_every_caller():
+    def failing(texts):
+        raise RuntimeError("model crashed")
+
+    batcher = MicroBatcher(failing, max_batch_size=4, max_wait_ms=20)
+    futures = [batcher.submit("a"), batcher.submit("b")]
+    for f in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            f.result(5)
+    batcher.close()
+
+def test_close_drains_queue_then_rejects():
+    calls = []
+    batcher = MicroBatcher(_encode(calls), max_batch_size=2, max_wait_ms=1000)
+    futures = [batcher.submit(f"t{i}") for i in range(5)]
+    batcher.close()
+
+    assert [f.result(1) for f in futures] == [f"vec:t{i}" for i in range(5)]
+    with pytest.raises(RuntimeError):
+        batcher.submit("late")
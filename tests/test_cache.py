@@ -0,0 +1,32 @@
+import pytest
+from ragchat.core import cache as cache_module
+from ragchat.core.cache import EmbeddingCache
+
+def test_lru_eviction_and_stats():
+    cache = EmbeddingCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 3, 1, 1)
+    assert stats["hit_rate"] == 0.75
+
+def test_ttl_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = EmbeddingCache(max_size=4, ttl=10)
+    cache.put("a", 1)
+
+    now[0] += 5
+    assert cache.get("a") == 1
+    now[0] += 6
+    assert cache.get("a") is None
+    assert len(cache) == 0 and cache.stats()["evictions"] == 1
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        EmbeddingCache(max_size=0)
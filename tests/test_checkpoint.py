@@ -0,0 +1,61 @@
+import json
+import os
+from ragchat.storage.checkpoint import IngestCheckpoint, checkpoint_path_for, drop_ids
+
+def test_commit_and_resume(tmp_path):
+    path = str(tmp_path / "docs.json")
+    checkpoint = IngestCheckpoint(path, "docs", fingerprint="ds|model|384")
+    checkpoint.reset()
+    checkpoint.commit(0, ["a", "b"])
+    checkpoint.commit(5, ["c"])
+
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    assert state["committed"] == 3
+    assert "last_batch" not in state
+
+    resumed = IngestCheckpoint(path, "docs", fingerprint="ds|model|384")
+    assert resumed.load() == {"a", "b", "c"}
+
+def test_torn_last_id_is_ignored(tmp_path):
+    path = str(tmp_path / "docs.json")
+    checkpoint = IngestCheckpoint(path, "docs")
+    checkpoint.reset()
+    checkpoint.commit(0, ["a", "b"])
+    with open(f"{path}.ids", "a", encoding="utf-8") as f:
+        f.write("partial-i")
+
+    assert IngestCheckpoint(path, "docs").load() == {"a", "b"}
+
+def test_other_fingerprint_starts_fresh(tmp_path):
+    path = str(tmp_path / "docs.json")
+    checkpoint = IngestCheckpoint(path, "docs", fingerprint="ds|model-a|384")
+    checkpoint.reset()
+    checkpoint.commit(0, ["a"])
+
+    assert IngestCheckpoint(path, "docs", fingerprint="ds|model-b|384").load() == set()
+    assert not os.path.exists(f"{path}.ids")
+
+def test_shards_have_separate_checkpoints(tmp_path):
+    directory = str(tmp_path)
+    assert checkpoint_path_for(directory, "docs", 0, 100, 100) == os.path.join(directory, "docs.json")
+    first = checkpoint_path_for(directory, "docs", 0, 50, 100)
+    second = checkpoint_path_for(directory, "docs", 50, 100, 100)
+    assert len({first, second, os.path.join(directory, "docs.json")}) == 3
+
+    shard0 = IngestCheckpoint(first, "docs", fingerprint="ds|model|384|rows=0-50")
+    shard1 = IngestCheckpoint(second, "docs", fingerprint="ds|model|384|rows=50-100")
+    for checkpoint in (shard0, shard1):
+        checkpoint.reset()
+    shard0.commit(0, ["a"])
+    shard1.commit(0, ["b"])
+
+    # --force in shard 0 resets only shard 0
+    IngestCheckpoint(first, "docs", fingerprint="ds|model|384|rows=0-50").reset()
+    assert IngestCheckpoint(first, "docs", fingerprint="ds|model|384|rows=0-50").load() == set()
+    assert IngestCheckpoint(second, "docs", fingerprint="ds|model|384|rows=50-100").load() == {"b"}
+
+def test_drop_ids():
+    texts, payloads = drop_ids(["x", "y", "z"], [{"id": "a"}, {"id": "b"}, {"id": "c"}], {"b"})
+    assert texts == ["x", "z"]
+    assert [p["id"] for p in payloads] == ["a", "c"]
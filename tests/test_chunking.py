@@ -0,0 +1,79 @@
+import json
+import math
+import pytest
+from ragchat.data.preprocessing import chunk_contexts, model_max_seq_length, preprocess_batch
+from ragchat.data.utils import chunk_sentences, fit_token_budget, iter_token_chunks, split_into_sentences
+
+class PieceTokenizer:
+    """One token per started 4 characters of each word, plus [CLS] / [SEP]."""
+    model_max_length = 512
+
+    def __call__(self, texts, add_special_tokens=True):
+        single = isinstance(texts, str)
+        ids = [[0] * sum(math.ceil(len(w) / 4) for w in t.split()) for t in ([texts] if single else texts)]
+        if add_special_tokens:
+            ids = [[101] + x + [102] for x in ids]
+        return {"input_ids": ids[0] if single else ids}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+def _count(text):
+    return sum(math.ceil(len(w) / 4) for w in text.split())
+
+def test_sentence_groups():
+    sentences = split_into_sentences("أ. ب! ج؟ د. هـ")
+    assert sentences == ["أ", "ب", "ج", "د", "هـ"]
+    assert chunk_sentences(sentences, group_size=2) == ["أ ب", "ج د", "هـ"]
+
+def test_token_chunks_pack_sentences_under_budget():
+    sentences = ["aaaa bbbb", "cccc", "dddd eeee ffff", "gggg"]
+    chunks = list(iter_token_chunks(sentences, _count, max_tokens=3))
+    assert chunks == ["aaaa bbbb cccc", "dddd eeee ffff", "gggg"]
+
+def test_token_chunks_overlap():
+    chunks = list(iter_token_chunks(["aaaa", "bbbb", "cccc", "dddd"], _count, max_tokens=2, overlap_tokens=1))
+    assert chunks == ["aaaa bbbb", "bbbb cccc", "cccc dddd"]
+
+def test_long_sentence_splits_on_words():
+    chunks = list(iter_token_chunks(["aaaa bbbb cccc dddd eeee"], _count, max_tokens=2))
+    assert chunks == ["aaaa bbbb", "cccc dddd", "eeee"]
+
+def test_word_longer_than_budget_is_split_at_token_level():
+    word = "x" * 30  # 8 tokens
+    chunks = list(iter_token_chunks([f"aaaa {word} bbbb"], _count, max_tokens=3))
+
+    assert all(_count(c) <= 3 for c in chunks)
+    assert "".join(chunks).replace(" ", "") == f"aaaa{word}bbbb"
+    assert chunks[0] == "aaaa"
+    assert chunks[1] == "x" * 12
+
+def test_fit_token_budget_clamps_to_max_seq_length():
+    tokenizer = PieceTokenizer()
+    assert fit_token_budget(256, tokenizer, max_seq_length=128) == 126
+    assert fit_token_budget(100, tokenizer, max_seq_length=128) == 100
+    assert fit_token_budget(1000, tokenizer) == 510
+    with pytest.raises(ValueError):
+        fit_token_budget(10, tokenizer, max_seq_length=2)
+
+def test_chunk_contexts_modes():
+    contexts = ["aaaa bbbb. cccc. dddd"]
+    assert chunk_contexts(contexts, group_size=2) == [["aaaa bbbb cccc", "dddd"]]
+    assert chunk_contexts(contexts, tokenizer=PieceTokenizer(), max_tokens=2) == [["aaaa bbbb", "cccc dddd"]]
+
+def test_preprocess_batch_normalizes_and_chunks():
+    batch = {
+        "context": ["ذَهَبَ الطالب. ثم عاد"],
+        "question": ["لماذا؟"],
+        "answers": [{"text": ["عادَ"], "answer_start": [0]}],
+    }
+    out = preprocess_batch(batch, tokenizer=PieceTokenizer(), max_tokens=512)
+
+    assert out["context"] == ["ذهب الطالب. ثم عاد"]
+    assert out["answers"][0]["text"] == ["عاد"]
+    assert out["chunks"] == [["ذهب الطالب ثم عاد"]]
+
+def test_model_max_seq_length_from_local_model(tmp_path):
+    (tmp_path / "sentence_bert_config.json").write_text(json.dumps({"max_seq_length": 128}))
+    assert model_max_seq_length(str(tmp_path)) == 128
+    assert model_max_seq_length(str(tmp_path / "missing")) is None
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+from ragchat.data.dedup import collect_sources, dedup_exact, dedup_near, dedup_stream, merge_late_sources
+from ragchat.data.near_dedup import NearDuplicateIndex
+from ragchat.data.utils import make_hash_id
+
+BASE = (
+    "تأسست جامعة القاهرة في عام ألف وتسعمائة وثمانية وكانت تعرف باسم الجامعة المصرية "
+    "ثم تغير اسمها عدة مرات حتى استقر على اسمها الحالي وتضم اليوم عشرات الكليات والمعاهد "
+    "ويدرس فيها مئات الآلاف من الطلاب القادمين من مختلف المحافظات والدول العربية"
+)
+OTHER = "يقع نهر النيل في شمال شرق أفريقيا ويعد من أطول الأنهار في العالم ويمر بعدة دول"
+
+def _record(text, example_id, question=None):
+    key = make_hash_id(text)
+    return text, {"id": key, "hash": key, "original_example_id": example_id, "question": question}
+
+def _batch(*records):
+    return [r[0] for r in records], [r[1] for r in records]
+
+def test_dedup_exact_keeps_first_and_merges_sources():
+    texts, payloads = _batch(_record(OTHER, 1, "q1"), _record(BASE, 2, "q2"), _record(OTHER, 3, "q3"))
+
+    out_texts, out_payloads = dedup_exact(texts, payloads)
+
+    assert out_texts == [OTHER, BASE]
+    assert out_payloads[0]["original_example_ids"] == [1, 3]
+    assert out_payloads[0]["questions"] == ["q1", "q3"]
+    assert out_payloads[1]["original_example_ids"] == [2]
+
+def test_dedup_exact_merges_existing_lists_and_skips_missing_sources(caplog):
+    first = {"hash": "h", "id": "h", "original_example_ids": [1, 2], "question": None, "source": "a"}
+    second = {"hash": "h", "id": "h", "original_example_id": 2, "question": "q", "source": "b"}
+    third = {"hash": "h", "id": "h", "original_example_id": 5, "question": None, "source": "c"}
+
+    with caplog.at_level("INFO", logger="ragchat"):
+        out_texts, out_payloads = dedup_exact(["t", "t", "t"], [first, second, third])
+
+    assert out_texts == ["t"]
+    assert out_payloads[0]["source"] == "a"
+    assert out_payloads[0]["original_example_ids"] == [1, 2, 5]
+    assert out_payloads[0]["questions"] == ["q"]
+    assert "2 encoder calls saved" in caplog.text
+    # the input payload is not mutated
+    assert first["original_example_ids"] == [1, 2]
+
+def test_dedup_exact_custom_fields_and_empty_input():
+    texts, payloads = _batch(_record(OTHER, 1), _record(OTHER, 2))
+
+    _, out_payloads = dedup_exact(texts, payloads, merge_fields=("original_example_id",))
+
+    assert out_payloads[0]["original_example_ids"] == [1, 2]
+    assert "questions" not in out_payloads[0]
+    assert dedup_exact([], []) == ([], [])
+
+def test_streaming_exact_dedup_matches_in_memory():
+    records = [_record(OTHER, 1, "q1"), _record(BASE, 2, "q2"), _record(OTHER, 3, "q3")]
+    sources = collect_sources(
+        (p["hash"], {"original_example_id": p["original_example_id"], "question": p["question"]}) for _, p in records
+    )
+
+    streamed = list(dedup_stream(iter(records), sources))
+
+    assert [t for t, _ in streamed] == [OTHER, BASE]
+    assert streamed[0][1]["original_example_ids"] == [1, 3]
+    assert streamed[0][1]["questions"] == ["q1", "q3"]
+
+def test_dedup_near_merges_within_a_batch():
+    index = NearDuplicateIndex(threshold=0.8)
+    texts, payloads = _batch(_record(BASE, 1, "q1"), _record(OTHER, 2), _record(BASE + " الكبرى", 3, "q3"))
+
+    out_texts, out_payloads = dedup_near(texts, payloads, index)
+
+    assert out_texts == [BASE, OTHER]
+    assert out_payloads[0]["original_example_ids"] == [1, 3]
+    assert out_payloads[0]["questions"] == ["q1", "q3"]
+    assert out_payloads[0]["near_duplicates"] == [payloads[2]["hash"]]
+
+def test_dedup_near_collects_cross_batch_sources_in_late():
+    index = NearDuplicateIndex(threshold=0.8)
+    late = {}
+    first = _batch(_record(BASE, 1, "q1"))
+    second = _batch(_record(BASE + " الكبرى", 2, "q2"), _record(OTHER, 3))
+
+    assert dedup_near(*first, index, late=late)[0] == [BASE]
+    out_texts, _ = dedup_near(*second, index, late=late)
+
+    assert out_texts == [OTHER]
+    kept = first[1][0]["hash"]
+    assert late == {
+        kept: {"original_example_ids": [2], "questions": ["q2"], "near_duplicates": [second[1][0]["hash"]]}
+    }
+
+def test_dedup_near_without_late_drops_cross_batch_sources():
+    index = NearDuplicateIndex(threshold=0.8)
+    dedup_near(*_batch(_record(BASE, 1)), index)
+
+    out_texts, out_payloads = dedup_near(*_batch(_record(BASE + " الكبرى", 2)), index)
+
+    assert out_texts == [] and out_payloads == []
+
+@pytest.fixture(params=["qdrant", "local"])
+def store(request, memory_index, local_index):
+    return memory_index if request.param == "qdrant" else local_index
+
+def test_merge_late_sources_extends_stored_point(store):
+    store.ensure_collection("docs", dim=2)
+    index = NearDuplicateIndex(threshold=0.8)
+    late = {}
+    first_texts, first_payloads = dedup_near(*_batch(_record(BASE, 1, "q1")), index, late=late)
+    store.upsert("docs", np.ones((1, 2), dtype=np.float32), first_payloads)
+    dedup_near(*_batch(_record(BASE + " الكبرى", 2, "q2")), index, late=late)
+    dedup_near(*_batch(_record(BASE + " الجديدة", 3, "q1")), index, late=late)
+
+    assert merge_late_sources(store, "docs", late) == 1
+
+    kept = first_payloads[0]["id"]
+    payload = store.get_payloads("docs", [kept])[kept]
+    assert payload["original_example_ids"] == [1, 2, 3]
+    assert payload["questions"] == ["q1", "q2"]
+    assert len(payload["near_duplicates"]) == 2
+    # the rest of the payload is untouched
+    assert payload["original_example_id"] == 1
@@ -0,0 +1,100 @@
+import threading
+from datasets import Dataset
+from ragchat.cli.embed_contexts_cli import iter_chunks, store_documents
+from ragchat.core.embeddings import TextEmbedder
+from ragchat.core.retriever import CHUNK_FIELDS, Retriever
+from ragchat.data.utils import make_hash_id
+from ragchat.storage.doc_store import DocStore
+
+def _store(tmp_path):
+    return DocStore(str(tmp_path / "docs" / "store.sqlite"))
+
+def test_documents_are_stored_once_and_examples_replaced(tmp_path):
+    store = _store(tmp_path)
+
+    store.put_documents([("d1", "النص الأول", "arcd"), ("d1", "نص آخر", "api"), ("d2", "النص الثاني", None)])
+    store.put_examples([(0, "d1", "سؤال", None), (0, "d1", "سؤال", "جواب"), (1, "d2", None, None)])
+
+    assert store.get_documents(["d1", "missing", None, "d1"]) == {"d1": "النص الأول"}
+    assert store.get_examples([0, None]) == {0: {"doc_id": "d1", "question": "سؤال", "answer_text": "جواب"}}
+    assert store.get_documents([]) == {} and store.get_examples([]) == {}
+    assert store.count() == {"documents": 2, "examples": 2}
+    store.close()
+
+def test_large_lookups_are_split_under_the_parameter_limit(tmp_path):
+    store = _store(tmp_path)
+    store.put_examples((i, f"d{i % 7}", f"q{i}", None) for i in range(2500))
+
+    found = store.get_examples(range(2500))
+
+    assert len(found) == 2500 and found[2499]["question"] == "q2499"
+    store.close()
+
+def test_each_thread_gets_its_own_connection(tmp_path):
+    store = _store(tmp_path)
+    store.put_documents([("main", "من الخيط الرئيسي", None)])
+    seen = {}
+
+    def worker():
+        store.put_documents([("worker", "من خيط آخر", None)])
+        seen.update(store.get_documents(["main"]))
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+    assert seen == {"main": "من الخيط الرئيسي"}
+    assert store.get_documents(["worker"]) == {"worker": "من خيط آخر"}
+    assert len(store._connections) == 2
+    store.close()
+    assert store._connections == []
+    # usable again after close: a fresh connection is opened
+    assert store.count()["documents"] == 2
+
+def _split():
+    context = "القاهرة عاصمة مصر. وهي أكبر مدنها"
+    return Dataset.from_dict({
+        "context": [context, context, "الرياض عاصمة السعودية"],
+        "question": ["ما عاصمة مصر؟", "ما أكبر مدن مصر؟", "ما عاصمة السعودية؟"],
+        "answers": [{"text": ["القاهرة"]}, {"text": []}, {"text": ["الرياض"]}],
+        "chunks": [["القاهرة عاصمة مصر"], ["وهي أكبر مدنها"], ["الرياض عاصمة السعودية"]],
+    })
+
+def test_store_documents_dedups_contexts_with_absolute_example_ids(tmp_path):
+    store = _store(tmp_path)
+
+    assert store_documents(_split(), store, offset=10, read_batch=2) == 3
+
+    assert store.count() == {"documents": 2, "examples": 3}
+    examples = store.get_examples([10, 11, 12])
+    assert examples[11] == {"doc_id": examples[10]["doc_id"], "question": "ما أكبر مدن مصر؟", "answer_text": None}
+    assert store.get_documents([examples[12]["doc_id"]]) == {examples[12]["doc_id"]: "الرياض عاصمة السعودية"}
+
+def test_retriever_hydrates_compact_payloads(tmp_path, fake_backend, local_index):
+    store = _store(tmp_path)
+    split = _split()
+    store_documents(split, store)
+    items = list(iter_chunks(split, compact=True))
+    texts = [t for t, _ in items]
+    # a point written before compact payloads existed stays as it was
+    legacy = {"id": make_hash_id("نص قديم"), "context_text": "نص قديم", "chunk_index": 0, "raw_context": "سياق قديم"}
+    embedder = TextEmbedder("fake-model", backend="onnx", micro_batch=False, token_budget=0, as_numpy=True)
+    local_index.ensure_collection("docs", embedder.dim)
+    local_index.upsert("docs", embedder.embed_batch(texts + ["نص قديم"]), [p for _, p in items] + [legacy])
+
+    retriever = Retriever(embedder, local_index, "docs", top_k=1, doc_store=store, payload_fields=None)
+    hit = retriever.retrieve(texts[1])[0]
+    assert (hit["chunk"], hit["raw_context"]) == ("وهي أكبر مدنها", "القاهرة عاصمة مصر. وهي أكبر مدنها")
+    assert (hit["question"], hit["answer"]) == ("ما أكبر مدن مصر؟", None)
+    assert retriever.retrieve("نص قديم")[0]["raw_context"] == "سياق قديم"
+
+    batches = retriever.retrieve_batch(texts)
+    assert [hits[0]["question"] for hits in batches] == list(split["question"])
+
+    # chunk-only retrieval does not touch the store
+    lookups = []
+    store.get_documents = store.get_examples = lambda ids: lookups.append(list(ids)) or {}
+    chunk_only = Retriever(embedder, local_index, "docs", top_k=1, doc_store=store, payload_fields=CHUNK_FIELDS)
+    assert chunk_only.retrieve(texts[0])[0]["raw_context"] is None
+    assert lookups == []
+    store.close()
@@ -0,0 +1,75 @@
+from multiprocessing import dummy
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from ragchat.core import embed_pool
+from ragchat.core.embed_pool import EmbeddingPool
+
+@pytest.fixture
+def thread_pool(monkeypatch, fake_backend):
+    """Run the pool's workers as threads so they share the patched fake backend."""
+    context = SimpleNamespace(Pool=dummy.Pool)
+    monkeypatch.setattr(embed_pool, "mp", SimpleNamespace(get_context=lambda method: context))
+    return fake_backend
+
+def _pool(**kwargs):
+    kwargs.setdefault("backend", "onnx")
+    kwargs.setdefault("token_budget", 0)
+    kwargs.setdefault("output_dim", 0)
+    return EmbeddingPool(2, "fake-model", threads_per_worker=1, **kwargs)
+
+def test_needs_a_worker():
+    with pytest.raises(ValueError):
+        EmbeddingPool(0, "fake-model")
+
+def test_imap_keeps_input_order(thread_pool):
+    pool = _pool()
+    batches = [[f"نص {i} {j}" for j in range(3)] for i in range(5)]
+
+    out = list(pool.imap(batches))
+    pool.close()
+
+    assert [len(v) for v in out] == [3] * 5
+    for batch, vectors in zip(batches, out):
+        np.testing.assert_allclose(vectors, thread_pool.encode(batch), atol=1e-6)
+    assert sum(s["texts"] for s in pool.stats().values()) == 15
+
+def test_imap_reads_input_lazily(thread_pool):
+    pool = _pool()
+    read = []
+
+    def batches():
+        for i in range(10):
+            read.append(i)
+            yield [f"نص {i}"]
+
+    it = pool.imap(batches(), max_pending=2)
+    next(it)
+    # two submitted up front, one refill after the first result
+    assert read == [0, 1, 2]
+    assert len(list(it)) == 9
+    pool.close()
+
+def test_empty_batch_yields_empty_matrix(thread_pool):
+    pool = _pool(output_dim=4)
+
+    (out,) = list(pool.imap([[]]))
+    pool.close()
+
+    assert out.shape == (0, 4)
+
+def test_store_holds_full_vectors_and_only_misses_reach_workers(thread_pool, tmp_path):
+    pool = _pool(store_dir=str(tmp_path), output_dim=4, output_dtype="float16")
+
+    first = next(pool.imap([["أ ب", "ج د", "أ ب"]]))
+    # the duplicate inside the batch is embedded once
+    assert thread_pool.calls == [["أ ب", "ج د"]]
+    assert first.shape == (3, 4) and first.dtype == np.float16
+    np.testing.assert_array_equal(first[0], first[2])
+
+    second = next(pool.imap([["ج د", "ه و"]]))
+    pool.close()
+
+    assert thread_pool.calls[-1] == ["ه و"]
+    np.testing.assert_array_equal(second[0], first[1])
+    assert len(pool.store) == 3 and pool.store.dim == thread_pool.dim
@@ -0,0 +1,94 @@
+import multiprocessing as mp
+import os
+import numpy as np
+from ragchat.storage.embedding_store import EmbeddingStore
+
+MODEL = "org/model-name"
+
+def _vectors(n, dim=4, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+def test_round_trip_and_reopen(tmp_path):
+    store = EmbeddingStore(str(tmp_path), MODEL)
+    vectors = _vectors(3)
+    store.put_many(["a", "b", "a"], np.concatenate([vectors[:2], vectors[2:]]))
+
+    assert len(store) == 2
+    found = store.get_many(["a", "b", "missing"])
+    assert set(found) == {"a", "b"}
+    np.testing.assert_array_equal(found["a"], vectors[0])
+
+    reopened = EmbeddingStore(str(tmp_path), MODEL)
+    np.testing.assert_array_equal(reopened.get_many(["b"])["b"], vectors[1])
+    assert os.path.basename(reopened.dir) == "org__model-name"
+
+def test_float16_storage(tmp_path):
+    store = EmbeddingStore(str(tmp_path), MODEL, dtype="float16")
+    vectors = _vectors(2)
+    store.put_many(["a", "b"], vectors)
+
+    got = store.get_many(["a"])["a"]
+    assert got.dtype == np.float32
+    np.testing.assert_allclose(got, vectors[0], rtol=1e-3)
+
+def test_torn_index_line_is_dropped_not_completed(tmp_path):
+    store = EmbeddingStore(str(tmp_path), MODEL)
+    vectors = _vectors(200)
+    store.put_many([f"k{i}" for i in range(200)], vectors)
+    # a writer crashed while writing "torn\t123\n": only "torn\t12" reached the file
+    with open(store.index_path, "ab") as f:
+        f.write(b"torn\t12")
+
+    reopened = EmbeddingStore(str(tmp_path), MODEL)
+    assert "torn" not in reopened
+    with open(store.index_path, "rb") as f:
+        assert f.read().endswith(b"\n")
+
+    extra = _vectors(1, seed=1)
+    reopened.put_many(["new"], extra)
+    assert "torn" not in EmbeddingStore(str(tmp_path), MODEL)
+    np.testing.assert_array_equal(reopened.get_many(["new"])["new"], extra[0])
+
+def test_writer_drops_torn_line_left_after_open(tmp_path):
+    store = EmbeddingStore(str(tmp_path), MODEL)
+    store.put_many(["a"], _vectors(1))
+    with open(store.index_path, "ab") as f:
+        f.write(b"torn\t0")
+
+    store.put_many(["b"], _vectors(1, seed=1))
+
+    with open(store.index_path, "rb") as f:
+        lines = f.read().splitlines()
+    assert [line.split(b"\t")[0] for line in lines] == [b"a", b"b"]
+
+def test_partial_vector_row_is_truncated(tmp_path):
+    store = EmbeddingStore(str(tmp_path), MODEL)
+    store.put_many(["a"], _vectors(1))
+    with open(store.vectors_path, "ab") as f:
+        f.write(b"\0\0\0")
+
+    reopened = EmbeddingStore(str(tmp_path), MODEL)
+    reopened.put_many(["b"], _vectors(1, seed=1))
+
+    np.testing.assert_array_equal(reopened.get_many(["b"])["b"], _vectors(1, seed=1)[0])
+
+def _put_worker(root, worker):
+    store = EmbeddingStore(root, MODEL)
+    for batch in range(10):
+        keys = [f"w{worker}-{batch}-{i}" for i in range(5)]
+        store.put_many(keys, np.full((5, 4), worker * 100 + batch, dtype=np.float32))
+
+def test_concurrent_writers_keep_rows_consistent(tmp_path):
+    procs = [mp.Process(target=_put_worker, args=(str(tmp_path), w)) for w in range(3)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+    store = EmbeddingStore(str(tmp_path), MODEL)
+    keys = [f"w{w}-{b}-{i}" for w in range(3) for b in range(10) for i in range(5)]
+    found = store.get_many(keys)
+    assert len(found) == len(keys)
+    for key, vector in found.items():
+        worker, batch = (int(x) for x in key[1:].split("-")[:2])
+        assert (vector == worker * 100 + batch).all()
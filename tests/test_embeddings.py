@@ -0,0 +1,59 @@
+import numpy as np
+from ragchat.core.embeddings import TextEmbedder
+
+def _embedder(**kwargs):
+    kwargs.setdefault("backend", "onnx")
+    kwargs.setdefault("micro_batch", False)
+    kwargs.setdefault("token_budget", 0)
+    return TextEmbedder("fake-model", **kwargs)
+
+def test_query_cache_serves_repeats(fake_backend):
+    embedder = _embedder(cache_size=8, as_numpy=True)
+
+    first = embedder.embed_text("سؤال")
+    second = embedder.embed_text("سؤال")
+
+    assert len(fake_backend.calls) == 1
+    np.testing.assert_array_equal(first, second)
+    assert not second.flags.writeable
+    assert embedder.cache_stats()["hits"] == 1
+
+def test_cache_keeps_full_vectors_and_reduces_on_return(fake_backend):
+    embedder = _embedder(cache_size=8, as_numpy=True, output_dim=4, output_dtype="float16")
+
+    reduced = embedder.embed_text("سؤال")
+    cached, _ = embedder.cache._data["سؤال"]
+
+    assert cached.shape == (fake_backend.dim,) and cached.dtype == np.float32
+    assert reduced.shape == (4,) and reduced.dtype == np.float16
+    expected = cached[:4] / np.linalg.norm(cached[:4])
+    np.testing.assert_allclose(reduced, expected, atol=1e-3)
+    # a hit goes through the same reduction
+    np.testing.assert_array_equal(embedder.embed_text("سؤال"), reduced)
+    assert len(fake_backend.calls) == 1
+
+def test_embed_batch_bypasses_query_cache(fake_backend):
+    embedder = _embedder(cache_size=8)
+
+    vectors = embedder.embed_batch(["نص أول", "نص ثان"])
+
+    assert len(vectors) == 2 and len(vectors[0]) == fake_backend.dim
+    assert len(embedder.cache) == 0
+
+def test_bucketing_respects_budget_and_batch_size(fake_backend):
+    embedder = _embedder(as_numpy=True, token_budget=24)
+    texts = [" ".join(["كلمة"] * n) for n in (1, 6, 2, 6, 1, 1, 1, 1, 1, 1)]
+
+    vectors = embedder.embed_batch(texts, batch_size=4)
+
+    # longest first; padded size (texts * longest incl. [CLS]/[SEP]) <= 24, at most 4 texts
+    assert [len(call) for call in fake_backend.calls] == [3, 4, 3]  # [3, 7] without the batch_size cap
+    assert [c.count("كلمة") for c in fake_backend.calls[0]] == [6, 6, 2]
+    # results come back in input order
+    np.testing.assert_array_equal(vectors, fake_backend.encode(texts))
+
+def test_no_budget_keeps_caller_batches(fake_backend):
+    embedder = _embedder(as_numpy=True, token_budget=0)
+    embedder.embed_batch([f"نص {i}" for i in range(5)], batch_size=2)
+
+    assert len(fake_backend.calls) == 1  # the backend batches internally
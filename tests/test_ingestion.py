@@ -0,0 +1,117 @@
+import threading
+import time
+import pytest
+from ragchat.core.ingestion import IngestionPipeline
+
+class RecordingIndex:
+    """upsert() records (vectors, payloads); optionally blocks or fails."""
+
+    def __init__(self, delay=0.0, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.upserts = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, name, vectors, payloads, start_id=None):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if self.fail_on is not None and payloads[0]["id"] == self.fail_on:
+                raise RuntimeError("qdrant down")
+            with self._lock:
+                self.upserts.append((name, list(vectors), payloads))
+        finally:
+            with self._lock:
+                self.active -= 1
+
+def _batches(n, size=2):
+    for b in range(n):
+        ids = [f"{b}-{i}" for i in range(size)]
+        yield [f"نَص  {i}" for i in ids], [{"id": i} for i in ids]
+
+def _echo(batches):
+    for texts in batches:
+        yield [[len(t)] for t in texts]
+
+def test_rejects_bad_sizes():
+    with pytest.raises(ValueError):
+        IngestionPipeline(RecordingIndex(), "docs", _echo, upload_workers=0)
+
+def test_uploads_every_batch_with_normalized_texts():
+    index = RecordingIndex()
+    seen, committed, progressed = [], {}, []
+
+    def embed(batches):
+        for texts in batches:
+            seen.append(texts)
+            yield [[len(t)] for t in texts]
+
+    pipeline = IngestionPipeline(
+        index, "docs", embed, on_commit=lambda batch_no, ids: committed.setdefault(batch_no, ids)
+    )
+    stats = pipeline.run(_batches(5), progress=progressed.append)
+
+    assert seen[0] == ["نص 0-0", "نص 0-1"]
+    assert stats["batches"] == 5 and stats["points"] == 10
+    assert committed == {b: [f"{b}-0", f"{b}-1"] for b in range(5)}
+    assert sum(progressed) == 10
+    uploaded = sorted(p["id"] for _, _, payloads in index.upserts for p in payloads)
+    assert uploaded == sorted(f"{b}-{i}" for b in range(5) for i in range(2))
+    # vectors stay aligned with their payloads
+    for name, vectors, payloads in index.upserts:
+        assert name == "docs" and len(vectors) == len(payloads)
+
+def test_uploads_overlap_up_to_upload_workers():
+    index = RecordingIndex(delay=0.02)
+
+    IngestionPipeline(index, "docs", _echo, upload_workers=3).run(_batches(9))
+
+    assert len(index.upserts) == 9
+    assert 1 < index.max_active <= 3
+
+def test_slow_uploads_throttle_embedding():
+    index = RecordingIndex(delay=0.02)
+    ahead = []
+
+    def embed(batches):
+        for texts in batches:
+            ahead.append(len(ahead) - len(index.upserts))
+            yield [[0]] * len(texts)
+
+    IngestionPipeline(index, "docs", embed, upload_workers=1, queue_size=1).run(_batches(8))
+
+    # embedded but not yet uploaded: at most queue_size + upload_workers
+    assert max(ahead) <= 2
+
+def test_upload_error_is_reraised_after_the_barrier():
+    index = RecordingIndex(fail_on="1-0")
+    committed = []
+
+    with pytest.raises(RuntimeError, match="qdrant down"):
+        IngestionPipeline(
+            index, "docs", _echo, upload_workers=1, on_commit=lambda n, ids: committed.append(n)
+        ).run(_batches(50))
+
+    assert 1 not in committed
+    # the stop flag ends the run long before the end of the input
+    assert len(index.upserts) < 50
+    assert index.active == 0
+
+def test_reader_and_embed_errors_are_reraised():
+    def broken_reader():
+        yield from _batches(1)
+        raise ValueError("bad row")
+
+    with pytest.raises(ValueError, match="bad row"):
+        IngestionPipeline(RecordingIndex(), "docs", _echo).run(broken_reader())
+
+    def broken_embed(batches):
+        next(iter(batches))
+        raise RuntimeError("model crashed")
+
+    with pytest.raises(RuntimeError, match="model crashed"):
+        IngestionPipeline(RecordingIndex(), "docs", broken_embed).run(_batches(3))
@@ -0,0 +1,91 @@
+import numpy as np
+from ragchat.storage.local_index import LocalIndex
+
+def _clustered(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = np.eye(dim, dtype=np.float32)
+    return centers[np.arange(n) % dim] + 0.05 * rng.standard_normal((n, dim)).astype(np.float32)
+
+def _payloads(n, offset=0):
+    return [{"id": f"c{i}", "text": f"chunk {i}"} for i in range(offset, offset + n)]
+
+def test_round_trip(tmp_path, local_index):
+    local_index.ensure_collection("docs", dim=3)
+    payloads = [{"id": f"c{i}", "text": f"chunk {i}", "source": "test"} for i in range(3)]
+    local_index.upsert("docs", np.eye(3, dtype=np.float32), payloads)
+    assert local_index.count("docs") == 3
+
+    # same id overwrites vector and payload instead of adding a row
+    local_index.upsert("docs", [[0.0, 1.0, 1.0]], [{"id": "c0", "text": "updated", "source": "test"}])
+    assert local_index.count("docs") == 3
+    assert local_index.existing_ids("docs", ["c0", "c9"]) == {"c0"}
+
+    hits = local_index.search("docs", [0.0, 0.0, 2.0], top_k=2)
+    assert [h.id for h in hits] == ["c2", "c0"]
+    assert abs(hits[0].score - 1.0) < 1e-5
+    assert hits[1].payload["text"] == "updated"
+
+    batch = local_index.search_batch("docs", [[0.0, 1.0, 0.0], [0.0, 0.0, 1.0]], top_k=1, payload_fields=["text"])
+    assert [[h.id for h in hits] for hits in batch] == [["c1"], ["c2"]]
+    assert batch[0][0].payload == {"text": "chunk 1"}
+
+    # reopening from disk sees the same points
+    reopened = LocalIndex(local_index.root)
+    try:
+        assert reopened.count("docs") == 3
+        assert reopened.search("docs", [0.0, 1.0, 1.0], top_k=1)[0].payload["text"] == "updated"
+    finally:
+        reopened.close()
+
+def test_ivf_is_trained_by_upsert_not_search(tmp_path, monkeypatch):
+    index = LocalIndex(str(tmp_path), ivf_lists=4, ivf_probe=2, ivf_min_rows=64)
+    index.ensure_collection("docs", dim=8)
+    index.upsert("docs", _clustered(32), _payloads(32))
+    ivf_path = tmp_path / "docs" / "ivf.npz"
+    assert not ivf_path.exists()
+
+    trained = []
+    monkeypatch.setattr(
+        "ragchat.storage.local_index._Collection.train_ivf",
+        lambda self, lists, seed=1: trained.append(self.count),
+    )
+    index.search("docs", _clustered(1)[0], top_k=3)
+    assert trained == []
+
+    # the upsert that crosses ivf_min_rows trains, searches never do
+    index.upsert("docs", _clustered(32, seed=1), _payloads(32, offset=32))
+    assert trained == [64]
+    index.search_batch("docs", _clustered(4), top_k=3)
+    assert trained == [64]
+    index.close()
+
+def test_ivf_search_and_build(tmp_path):
+    index = LocalIndex(str(tmp_path), ivf_lists=8, ivf_probe=8, ivf_min_rows=64)
+    index.ensure_collection("docs", dim=8)
+    vectors = _clustered(128)
+    index.upsert("docs", vectors, _payloads(128))
+    assert (tmp_path / "docs" / "ivf.npz").exists()
+    assert not index.build("docs")
+    assert index.build("docs", force=True)
+
+    # probing every list is exact
+    hits = index.search_batch("docs", vectors[:5], top_k=1)
+    assert [h[0].id for h in hits] == [f"c{i}" for i in range(5)]
+    index.close()
+
+def test_sees_recreate_by_another_index(tmp_path):
+    server = LocalIndex(str(tmp_path))
+    other = LocalIndex(str(tmp_path))
+    server.ensure_collection("docs", dim=3)
+    server.upsert("docs", np.eye(3, dtype=np.float32), _payloads(3))
+    assert server.count("docs") == 3
+
+    # another process wipes the collection with a new dimension
+    other.recreate("docs", dim=4)
+    other.upsert("docs", [[0.0, 0.0, 0.0, 1.0]], [{"id": "n0", "text": "new"}])
+
+    assert server.count("docs") == 1
+    hits = server.search("docs", [0.0, 0.0, 0.0, 1.0], top_k=3)
+    assert [(h.id, h.payload["text"]) for h in hits] == [("n0", "new")]
+    server.close()
+    other.close()
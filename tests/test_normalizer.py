@@ -0,0 +1,63 @@
+import random
+import re
+from ragchat.data.utils import NormalizedText, mark_normalized, normalize_arabic_text, normalize_batch
+
+def _reference_normalize(text):
+    """The regex-chain normalizer this module replaced (kept here as the spec)."""
+    if not text:
+        return ""
+    text = re.sub(r"[\ud800-\udfff]", "", text)
+    text = re.sub(r"[\x00-\x1F\x7F]", " ", text)
+    text = re.sub(r"[\u0610-\u061A\u064B-\u065F\u06D6-\u06ED]", "", text)
+    text = re.sub(r"ـ+", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+SENTENCES = [
+    "ذَهَبَ الطَّالِبُ إِلَى المَدْرَسَةِ.",
+    "القاهرة هي عاصمة مصر، وأكبر مدنها.",
+    "كـــــتاب\tجديد\n\nفي المكتبة",
+    "  مرحبا   بالعالم  ",
+    "Python 3.11 و NumPy",
+    "سؤال؟ جواب! نعم.",
+    "\x00\x07نص\x1b مع\x7f محارف تحكم\x1c\x1f",
+    "ۖ علامات ۗ قرآنية ۚ",
+    "non breaking spaces　here",
+    "\ud800surrogate\udfff",
+    "",
+]
+
+# characters the normalizer treats specially, plus ordinary letters
+ALPHABET = (
+    [chr(c) for c in range(0x0621, 0x064B)]
+    + [chr(c) for c in range(0x0610, 0x061B)]
+    + [chr(c) for c in range(0x064B, 0x0660)]
+    + [chr(c) for c in range(0x06D6, 0x06EE)]
+    + ["ـ", "\ud800", "\udfff", " ", " ", "　", "\x85"]
+    + ["\ue000", "\uffff", "😀", "𝒜"]
+    + [chr(c) for c in range(0x00, 0x20)] + ["\x7f"]
+    + list("abc XYZ 019.!?،؟")
+)
+
+def _random_corpus(n=2000, seed=7):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 40))) for _ in range(n)]
+
+def test_matches_reference_normalizer():
+    for text in SENTENCES + _random_corpus():
+        assert normalize_arabic_text(text) == _reference_normalize(text), repr(text)
+
+def test_returns_marked_text_and_is_idempotent():
+    out = normalize_arabic_text(SENTENCES[0])
+    assert isinstance(out, NormalizedText)
+    assert normalize_arabic_text(out) is out
+    assert isinstance(normalize_arabic_text(""), NormalizedText)
+    assert isinstance(normalize_arabic_text(None), NormalizedText)
+    assert mark_normalized("نص") == "نص" and isinstance(mark_normalized("نص"), NormalizedText)
+
+def test_failure_returns_empty_normalized_text():
+    # not a str: translate is missing, the error is logged
+    out = normalize_arabic_text(12345)
+    assert out == "" and isinstance(out, NormalizedText)
+
+def test_normalize_batch():
+    assert normalize_batch(SENTENCES[:3]) == [_reference_normalize(s) for s in SENTENCES[:3]]
@@ -0,0 +1,60 @@
+import os
+from datasets import Dataset, DatasetDict, load_from_disk
+from ragchat.data import preprocessing
+from ragchat.data.preprocessing import preprocess_arcd
+
+def _raw(tmp_path, rows=6):
+    split = Dataset.from_dict({
+        "id": [str(i) for i in range(rows)],
+        "context": [f"الجملة الأُولى {i}. الجملة الثانية. الجملة الثالثة" for i in range(rows)],
+        "question": [f"ما هُوَ {i}؟" for i in range(rows)],
+        "answers": [{"text": [f"الجَواب {i}"], "answer_start": [0]} for i in range(rows)],
+    })
+    path = str(tmp_path / "raw")
+    DatasetDict({"train": split, "validation": split.select(range(2))}).save_to_disk(path)
+    return path
+
+def _run(raw, tmp_path, out="clean", **kwargs):
+    kwargs.setdefault("max_tokens", 0)
+    kwargs.setdefault("group_size", 2)
+    out_dir = str(tmp_path / out)
+    preprocess_arcd(in_dir=raw, out_dir=out_dir, cache_dir=str(tmp_path / "cache"), **kwargs)
+    return load_from_disk(out_dir)
+
+def test_preprocess_arcd_normalizes_and_chunks_every_split(tmp_path):
+    ds = _run(_raw(tmp_path), tmp_path)
+
+    assert set(ds) == {"train", "validation"}
+    row = ds["train"][0]
+    assert row["question"] == "ما هو 0؟"
+    assert row["answers"]["text"] == ["الجواب 0"]
+    assert row["chunks"] == ["الجملة الأولى 0 الجملة الثانية", "الجملة الثالثة"]
+    assert len(ds["validation"]) == 2
+
+def test_cached_split_is_reused(tmp_path, monkeypatch):
+    raw = _raw(tmp_path)
+    first = _run(raw, tmp_path)
+    assert any(name.startswith("train-") for name in os.listdir(tmp_path / "cache"))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached split was reprocessed")
+
+    monkeypatch.setattr(preprocessing, "preprocess_batch", fail)
+    second = _run(raw, tmp_path, out="again")
+
+    assert second["train"]["chunks"] == first["train"]["chunks"]
+
+def test_changed_options_miss_the_cache(tmp_path):
+    raw = _raw(tmp_path)
+    _run(raw, tmp_path, group_size=2)
+    ds = _run(raw, tmp_path, out="grouped", group_size=3)
+
+    assert ds["train"][0]["chunks"] == ["الجملة الأولى 0 الجملة الثانية الجملة الثالثة"]
+
+def test_num_proc_matches_single_process(tmp_path):
+    raw = _raw(tmp_path)
+    single = _run(raw, tmp_path, out="single", batch_size=2)
+    multi = _run(raw, tmp_path / "multi", num_proc=2, batch_size=2)
+
+    assert multi["train"]["chunks"] == single["train"]["chunks"]
+    assert multi["validation"]["question"] == single["validation"]["question"]
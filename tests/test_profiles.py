@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from qdrant_client.http import models
+from ragchat.data.utils import make_hash_id
+from ragchat.storage.profiles import PROFILES, get_profile
+
+def _spy(monkeypatch, client, method):
+    calls = []
+    original = getattr(client, method)
+
+    def spy(**kwargs):
+        calls.append(kwargs)
+        return original(**kwargs)
+
+    monkeypatch.setattr(client, method, spy)
+    return calls
+
+def test_get_profile():
+    assert get_profile(None) is get_profile("") is PROFILES["default"]
+    assert get_profile("balanced").name == "balanced"
+    with pytest.raises(ValueError, match="low-memory"):
+        get_profile("fast")
+
+def test_default_profile_keeps_server_defaults():
+    default = get_profile("default")
+
+    assert default.create_kwargs() == {"hnsw_config": None, "quantization_config": None, "on_disk_payload": None}
+    assert default.search_params() is None
+    # moving back to default switches quantization off
+    assert default.update_kwargs()["quantization_config"] == models.Disabled.DISABLED
+
+def test_quantized_profiles():
+    low_latency, low_memory = get_profile("low-latency"), get_profile("low-memory")
+
+    assert isinstance(low_latency.quantization_config(), models.ScalarQuantization)
+    assert isinstance(low_memory.quantization_config(), models.BinaryQuantization)
+    assert low_memory.hnsw_config() == models.HnswConfigDiff(m=16, ef_construct=100, on_disk=True)
+    params = low_memory.search_params()
+    assert params.hnsw_ef == 64
+    assert params.quantization == models.QuantizationSearchParams(rescore=True, oversampling=3.0)
+    update = get_profile("balanced").update_kwargs()
+    assert update["vectors_config"] == {"": models.VectorParamsDiff(on_disk=True)}
+    assert update["collection_params"] == models.CollectionParamsDiff(on_disk_payload=True)
+
+def test_ensure_collection_creates_with_profile_and_updates_on_request(memory_index, monkeypatch):
+    created = _spy(monkeypatch, memory_index.client, "create_collection")
+    updated = _spy(monkeypatch, memory_index.client, "update_collection")
+
+    memory_index.ensure_collection("docs", dim=4, profile="low-memory")
+    memory_index.ensure_collection("docs", dim=4)
+    memory_index.ensure_collection("docs", dim=4, profile="default")
+    assert updated == []
+    memory_index.ensure_collection("docs", dim=4, profile="balanced")
+
+    assert created[0]["vectors_config"].on_disk is True
+    assert isinstance(created[0]["quantization_config"], models.BinaryQuantization)
+    assert created[0]["on_disk_payload"] is True
+    assert len(updated) == 1
+    assert isinstance(updated[0]["quantization_config"], models.ScalarQuantization)
+
+# local mode searches exactly and warns that search_params are ignored
+@pytest.mark.filterwarnings("ignore:Local mode performs exact")
+def test_searches_send_the_index_profile_params(memory_index, monkeypatch):
+    memory_index.profile = get_profile("low-latency")
+    memory_index.ensure_collection("docs", dim=3)
+    payloads = [{"id": make_hash_id(str(i)), "n": i} for i in range(3)]
+    memory_index.upsert("docs", np.eye(3, dtype=np.float32), payloads)
+    single = _spy(monkeypatch, memory_index.client, "query_points")
+    batched = _spy(monkeypatch, memory_index.client, "query_batch_points")
+
+    hits = memory_index.search("docs", [0.0, 1.0, 0.0], top_k=1)
+    batch = memory_index.search_batch("docs", np.eye(3, dtype=np.float32), top_k=1)
+
+    assert hits[0].payload["n"] == 1 and [h[0].payload["n"] for h in batch] == [0, 1, 2]
+    expected = get_profile("low-latency").search_params()
+    assert single[0]["search_params"] == expected
+    assert all(r.params == expected for r in batched[0]["requests"])
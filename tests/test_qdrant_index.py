@@ -0,0 +1,163 @@
+import asyncio
+import httpx
+import numpy as np
+import pytest
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http import models
+from ragchat.data.utils import make_hash_id
+from ragchat.storage import qdrant_index
+from ragchat.storage.qdrant_index import AsyncQdrantIndex, QdrantIndex
+
+def _payloads(n, **extra):
+    return [{"id": make_hash_id(f"doc {i}"), "text": f"doc {i}", **extra} for i in range(n)]
+
+def test_to_matrix_converts_arrays_in_one_call(memory_index):
+    vectors = np.arange(6, dtype=np.float64).reshape(2, 3) / 3
+
+    matrix = memory_index._to_matrix(vectors)
+
+    assert matrix == np.asarray(vectors, dtype=np.float32).tolist()
+    assert all(type(x) is float for row in matrix for x in row)
+    assert memory_index._to_matrix([np.ones(3), np.zeros(3)]) == [[1.0] * 3, [0.0] * 3]
+    assert memory_index._to_matrix([(1, 2), [3, 4]]) == [[1, 2], [3, 4]]
+
+def test_points_is_one_columnar_batch(memory_index):
+    payloads = _payloads(3)
+
+    batch = memory_index._points(np.eye(3, dtype=np.float32), payloads)
+
+    assert isinstance(batch, models.Batch)
+    assert batch.ids == [p["id"] for p in payloads]
+    assert batch.payloads == payloads
+    with pytest.raises(ValueError):
+        memory_index._points(np.eye(2, dtype=np.float32), payloads)
+
+def test_upsert_ndarray_round_trip(memory_index):
+    memory_index.ensure_collection("docs", dim=3)
+    payloads = _payloads(3)
+    memory_index.upsert("docs", np.eye(3, dtype=np.float32), payloads)
+
+    hits = memory_index.search("docs", np.array([0, 0, 1], dtype=np.float32), top_k=1)
+
+    assert [str(h.id) for h in hits] == [payloads[2]["id"]]
+    assert hits[0].payload["text"] == "doc 2"
+
+def test_ensure_collection_rejects_other_dim(memory_index):
+    memory_index.ensure_collection("docs", dim=3)
+    with pytest.raises(ValueError):
+        memory_index.ensure_collection("docs", dim=4)
+
+class CountingClient:
+    """Stands in for QdrantClient: records its options and close() calls."""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.closed = 0
+
+    def close(self):
+        self.closed += 1
+
+def test_client_kwargs_per_transport():
+    rest = qdrant_index._client_kwargs("http://q", None, "rest", 5.0, 8, QdrantClient)
+    grpc = qdrant_index._client_kwargs("http://q", None, "grpc", 5.0, 0, QdrantClient)
+
+    assert rest["prefer_grpc"] is False
+    assert isinstance(rest["limits"], httpx.Limits) and rest["limits"].max_keepalive_connections == 8
+    assert grpc["prefer_grpc"] is True and "limits" not in grpc
+    with pytest.raises(ValueError, match="transport"):
+        qdrant_index._client_kwargs("http://q", None, "udp", 5.0, 0, QdrantClient)
+
+def test_clients_are_shared_per_configuration_and_reference_counted(monkeypatch):
+    monkeypatch.setattr(qdrant_index, "QdrantClient", CountingClient)
+    monkeypatch.setattr(qdrant_index, "_shared_clients", {})
+
+    first = QdrantIndex(url="http://q", transport="rest", pool_size=4)
+    second = QdrantIndex(url="http://q", transport="rest", pool_size=4)
+    other = QdrantIndex(url="http://q", transport="grpc", pool_size=4)
+    client = first.client
+
+    assert second.client is client and other.client is not client
+    first.close()
+    first.close()  # a second close is a no-op
+    assert client.closed == 0
+    second.close()
+    assert client.closed == 1
+    assert QdrantIndex(url="http://q", transport="rest", pool_size=4).client is not client
+    other.close()
+
+def test_async_index_mirrors_the_sync_api(monkeypatch):
+    monkeypatch.setattr(qdrant_index, "AsyncQdrantClient", lambda **kwargs: AsyncQdrantClient(":memory:"))
+    payloads = _payloads(3)
+
+    async def scenario():
+        index = AsyncQdrantIndex(url="http://qdrant.test", transport="rest", pool_size=2, profile="default")
+        try:
+            await index.ensure_collection("docs", dim=3)
+            await index.upsert("docs", np.eye(3, dtype=np.float32), payloads)
+            ids = [p["id"] for p in payloads]
+            existing = await index.existing_ids("docs", ids[:2] + [make_hash_id("missing")], batch_size=1)
+            await index.set_payloads("docs", {ids[0]: {"text": "updated"}})
+            stored = await index.get_payloads("docs", ids, payload_fields=["text"])
+            hits = await index.search("docs", [0.0, 0.0, 1.0], top_k=1)
+            batch = await index.search_batch("docs", np.eye(3, dtype=np.float32), top_k=1, batch_size=2)
+            with pytest.raises(ValueError):
+                await index.ensure_collection("docs", dim=4)
+            return ids, existing, stored, hits, batch
+        finally:
+            await index.aclose()
+
+    ids, existing, stored, hits, batch = asyncio.run(scenario())
+
+    assert existing == set(ids[:2])
+    assert stored[ids[0]] == {"text": "updated"} and stored[ids[2]] == {"text": "doc 2"}
+    assert [str(h.id) for h in hits] == [ids[2]]
+    assert [[str(h.id) for h in hits] for hits in batch] == [[i] for i in ids]
+
+def test_search_batch_matches_single_searches_in_input_order(memory_index, monkeypatch):
+    memory_index.ensure_collection("docs", dim=3)
+    memory_index.upsert("docs", np.eye(3, dtype=np.float32), _payloads(3))
+    queries = np.array([[0, 0, 1], [1, 0, 0], [0, 1, 0], [0, 0.2, 1]], dtype=np.float32)
+    calls = []
+    query_batch_points = memory_index.client.query_batch_points
+
+    def counting(collection_name, requests):
+        calls.append(len(requests))
+        return query_batch_points(collection_name=collection_name, requests=requests)
+
+    monkeypatch.setattr(memory_index.client, "query_batch_points", counting)
+    batch = memory_index.search_batch("docs", queries, top_k=2, batch_size=3)
+
+    assert calls == [3, 1]
+    assert [[str(h.id) for h in hits] for hits in batch] == [
+        [str(h.id) for h in memory_index.search("docs", q, top_k=2)] for q in queries
+    ]
+
+def test_search_batch_pads_failed_requests_with_empty_results(memory_index, monkeypatch):
+    memory_index.ensure_collection("docs", dim=3)
+    memory_index.upsert("docs", np.eye(3, dtype=np.float32), _payloads(3))
+    query_batch_points = memory_index.client.query_batch_points
+    calls = []
+
+    def fail_second(collection_name, requests):
+        calls.append(len(requests))
+        if len(calls) == 2:
+            raise RuntimeError("timeout")
+        return query_batch_points(collection_name=collection_name, requests=requests)
+
+    monkeypatch.setattr(memory_index.client, "query_batch_points", fail_second)
+    batch = memory_index.search_batch("docs", np.eye(3, dtype=np.float32), top_k=1, batch_size=2)
+
+    assert [len(hits) for hits in batch] == [1, 1, 0]
+
+def test_search_projects_payload_fields(memory_index):
+    memory_index.ensure_collection("docs", dim=3)
+    memory_index.upsert("docs", np.eye(3, dtype=np.float32), _payloads(3, raw_context="نص طويل", chunk_index=0))
+    query = np.array([1, 0, 0], dtype=np.float32)
+
+    projected = memory_index.search("docs", query, top_k=1, payload_fields=["text", "chunk_index"])
+    full = memory_index.search("docs", query, top_k=1)
+    batch = memory_index.search_batch("docs", [query], top_k=1, payload_fields=["text"])
+
+    assert projected[0].payload == {"text": "doc 0", "chunk_index": 0}
+    assert full[0].payload["raw_context"] == "نص طويل"
+    assert batch[0][0].payload == {"text": "doc 0"}
@@ -0,0 +1,72 @@
+import logging
+import numpy as np
+import pytest
+from datasets import Dataset, DatasetDict
+from typer.testing import CliRunner
+from ragchat.cli.embed_contexts_cli import load_dataset_split
+from ragchat.core.reduction import DimReducer, fit_pca
+from ragchat.evaluation import reduction_cli
+
+def _vectors(n=64, dim=16, seed=0):
+    x = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+def test_truncate_renormalizes():
+    x = _vectors()
+    out = DimReducer("truncate", output_dim=4)(x)
+    assert out.shape == (64, 4) and out.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(out, axis=1), 1.0, rtol=1e-5)
+    np.testing.assert_allclose(out, x[:, :4] / np.linalg.norm(x[:, :4], axis=1, keepdims=True), rtol=1e-5)
+
+def test_inactive_reducer_is_identity_and_float16_halves_bytes():
+    x = _vectors()
+    full = DimReducer()
+    assert not full.active and full.out_dim(16) == 16
+    np.testing.assert_array_equal(full(x), x)
+    half = DimReducer(dtype="float16")
+    assert half.active and half(x).dtype == np.float16
+
+def test_pca_round_trip(tmp_path):
+    path = str(tmp_path / "pca.npz")
+    x = _vectors()
+    fit_pca(x, 8, path)
+
+    reducer = DimReducer("pca", output_dim=4, pca_path=path)
+    out = reducer(x)
+    assert out.shape == (64, 4)
+    np.testing.assert_allclose(np.linalg.norm(out, axis=1), 1.0, rtol=1e-5)
+    with pytest.raises(ValueError):
+        DimReducer("pca", output_dim=16, pca_path=path)
+    with pytest.raises(ValueError):
+        DimReducer("pca", output_dim=4)
+
+def _arcd(tmp_path):
+    def split(tag):
+        return Dataset.from_dict({
+            "question": [f"سؤال {tag} {i}" for i in range(4)],
+            "chunks": [[f"مقطع {tag} {i}", f"مقطع {tag} {i} ثان"] for i in range(4)],
+        })
+    path = str(tmp_path / "arcd")
+    DatasetDict({"train": split("train"), "validation": split("validation")}).save_to_disk(path)
+    return path
+
+def test_load_dataset_split_order(tmp_path):
+    path = _arcd(tmp_path)
+    assert load_dataset_split(path)["question"][0] == "سؤال train 0"
+    assert load_dataset_split(path, ("validation", "test"))["question"][0] == "سؤال validation 0"
+    assert load_dataset_split(path, ("test",))["question"][0] == "سؤال train 0"
+
+def test_evaluate_reports_through_logger(tmp_path, fake_backend, caplog):
+    path = _arcd(tmp_path)
+    with caplog.at_level(logging.INFO, logger="ragchat"):
+        result = CliRunner().invoke(
+            reduction_cli.app, ["evaluate", "--ds-path", path, "--n", "4", "--k", "2", "--dims", "4",
+                                "--pca-path", str(tmp_path / "missing.npz")]
+        )
+
+    assert result.exit_code == 0, result.output
+    report = [r.getMessage() for r in caplog.records]
+    assert any("Recall@2 on 4 questions / 8 chunks" in m for m in report)
+    assert any(m.startswith("truncate float32") for m in report)
+    assert any(m.startswith("pca float32") and "skipped" in m for m in report)
+    assert "Recall@" not in result.stdout
@@ -0,0 +1,78 @@
+import logging
+import numpy as np
+import pytest
+from ragchat.cli.embed_contexts_cli import prepare_qdrant
+from ragchat.config import RAGSettings
+from ragchat.core.ingestion import IngestionPipeline
+from ragchat.core.registry import ModelRegistry
+from ragchat.core.retriever import Retriever
+from ragchat.data.utils import make_hash_id
+from ragchat.storage.local_index import LocalIndex
+
+TEXTS = ["القاهرة عاصمة مصر", "الرياض عاصمة السعودية", "بغداد عاصمة العراق"]
+
+@pytest.fixture
+def registry():
+    registry = ModelRegistry()
+    yield registry
+    registry.teardown()
+
+@pytest.fixture
+def local_backend(monkeypatch, tmp_path):
+    monkeypatch.setattr(RAGSettings, "vector_backend", "local")
+    monkeypatch.setattr(RAGSettings, "local_index_dir", str(tmp_path / "index"))
+
+def _embedder(registry, **kwargs):
+    return registry.embedder("fake-model", backend="onnx", micro_batch=False, token_budget=0, **kwargs)
+
+def test_instances_are_shared_per_config(registry):
+    created = []
+    factory = lambda **config: created.append(config) or object()
+
+    first = registry._get("thing", factory, {"a": 1})
+    assert registry._get("thing", factory, {"a": 1}) is first
+    assert registry._get("thing", factory, {"a": 2}) is not first
+    assert created == [{"a": 1}, {"a": 2}]
+
+def test_embedder_defaults_to_numpy(registry, fake_backend):
+    embedder = _embedder(registry)
+    assert embedder is _embedder(registry)
+    assert isinstance(embedder.embed_text("سؤال"), np.ndarray)
+    assert isinstance(_embedder(registry, as_numpy=False).embed_text("سؤال"), list)
+
+def test_local_backend_logs_ignored_qdrant_args(registry, local_backend, caplog):
+    with caplog.at_level(logging.INFO, logger="ragchat"):
+        index = registry.index("http://qdrant:6333", "secret")
+        again = registry.index("http://qdrant:6333", "secret")
+
+    assert isinstance(index, LocalIndex) and again is index
+    assert index.root == RAGSettings.local_index_dir
+    assert sum("ignoring the Qdrant url" in r.getMessage() for r in caplog.records) == 1
+
+def test_local_backend_options(registry, local_backend):
+    index = registry.index(ivf_min_rows=10)
+    assert index.ivf_min_rows == 10
+    with pytest.raises(ValueError, match="transport"):
+        registry.index(transport="grpc")
+
+# callers of the shared (numpy) embedder
+
+def test_prepare_collection_with_numpy_embedder(registry, fake_backend, local_backend):
+    embedder, index = _embedder(registry), registry.index()
+
+    assert prepare_qdrant(embedder, index, "docs", force=False) == fake_backend.dim
+    assert index.count("docs") == 0
+
+def test_ingest_and_retrieve_with_numpy_embedder(registry, fake_backend, local_backend):
+    embedder, index = _embedder(registry), registry.index()
+    prepare_qdrant(embedder, index, "docs", force=False)
+    payloads = [{"id": make_hash_id(t), "context_text": t, "chunk_index": 0} for t in TEXTS]
+
+    pipeline = IngestionPipeline(index, "docs", lambda batches: (embedder.embed_batch(b) for b in batches))
+    stats = pipeline.run([(TEXTS[:2], payloads[:2]), (TEXTS[2:], payloads[2:])])
+    assert stats["points"] == 3 and index.count("docs") == 3
+
+    retriever = Retriever(embedder, index, "docs", top_k=1)
+    assert retriever.retrieve(TEXTS[1])[0]["chunk"] == TEXTS[1]
+    batches = retriever.retrieve_batch(TEXTS)
+    assert [hits[0]["chunk"] for hits in batches] == TEXTS
@@ -0,0 +1,74 @@
+from ragchat.core.embeddings import TextEmbedder
+from ragchat.core.retriever import SOURCE_FIELDS, Retriever
+from ragchat.data.utils import make_hash_id
+
+TEXTS = ["القاهرة عاصمة مصر", "الرياض عاصمة السعودية", "بغداد عاصمة العراق", "دمشق عاصمة سوريا"]
+
+def _retriever(index, **kwargs):
+    embedder = TextEmbedder("fake-model", backend="onnx", micro_batch=False, token_budget=0, as_numpy=True)
+    index.ensure_collection("docs", embedder.dim)
+    payloads = [
+        {"id": make_hash_id(t), "context_text": t, "chunk_index": i, "question": f"سؤال {i}", "answer_text": t.split()[0]}
+        for i, t in enumerate(TEXTS)
+    ]
+    index.upsert("docs", embedder.embed_batch(TEXTS), payloads)
+    return Retriever(embedder, index, "docs", top_k=2, **kwargs)
+
+def test_retrieve_batch_embeds_once_and_keeps_query_order(memory_index, fake_backend):
+    retriever = _retriever(memory_index, payload_fields=None)
+    fake_backend.calls.clear()
+    queries = ["دمشق   عاصمة سوريا", "القاهرة عاصمة مصر", "بغداد عاصمة العراق"]
+
+    batches = retriever.retrieve_batch(queries, batch_size=2)
+
+    assert fake_backend.calls == [["دمشق عاصمة سوريا", "القاهرة عاصمة مصر", "بغداد عاصمة العراق"]]
+    assert [hits[0]["chunk"] for hits in batches] == [TEXTS[3], TEXTS[0], TEXTS[2]]
+    assert all(len(hits) == 2 for hits in batches)
+    assert batches[1][0] == retriever.retrieve(queries[1])[0]
+
+def test_retrieve_batch_edge_cases(memory_index, fake_backend, monkeypatch):
+    retriever = _retriever(memory_index)
+
+    assert retriever.retrieve_batch([]) == []
+    monkeypatch.setattr(retriever.embedder, "embed_batch", lambda texts: [])
+    assert retriever.retrieve_batch(["سؤال", "آخر"]) == [[], []]
+
+def test_request_fields_add_references_only_for_hydrated_fields(memory_index, fake_backend):
+    assert _retriever(memory_index)._request_fields() == ["context_text", "chunk_index"]
+    assert _retriever(memory_index, payload_fields=SOURCE_FIELDS)._request_fields() == [
+        "context_text", "chunk_index", "question", "answer_text", "doc_id", "original_example_id",
+    ]
+    assert _retriever(memory_index, payload_fields=None)._request_fields() is None
+
+def test_default_retriever_fetches_chunk_fields_only(memory_index, fake_backend):
+    hit = _retriever(memory_index).retrieve(TEXTS[0])[0]
+
+    assert (hit["chunk"], hit["chunk_index"]) == (TEXTS[0], 0)
+    assert hit["question"] is None and hit["answer"] is None and hit["raw_context"] is None
+
+def test_source_fields_hydrate_examples_without_document_lookups(local_index, fake_backend):
+    class Store:
+        def __init__(self):
+            self.calls = []
+
+        def get_examples(self, ids):
+            self.calls.append("examples")
+            return {int(i): {"doc_id": "d", "question": "ما عاصمة مصر؟", "answer_text": "القاهرة"} for i in ids}
+
+        def get_documents(self, ids):
+            self.calls.append("documents")
+            return {}
+
+    store = Store()
+    embedder = TextEmbedder("fake-model", backend="onnx", micro_batch=False, token_budget=0, as_numpy=True)
+    local_index.ensure_collection("docs", embedder.dim)
+    compact = {
+        "id": make_hash_id(TEXTS[0]), "doc_id": "d", "original_example_id": 4, "context_text": TEXTS[0], "chunk_index": 0,
+    }
+    local_index.upsert("docs", embedder.embed_batch(TEXTS[:1]), [compact])
+
+    retriever = Retriever(embedder, local_index, "docs", top_k=1, doc_store=store, payload_fields=SOURCE_FIELDS)
+    hit = retriever.retrieve(TEXTS[0])[0]
+
+    assert (hit["question"], hit["answer"], hit["raw_context"]) == ("ما عاصمة مصر؟", "القاهرة", None)
+    assert store.calls == ["examples"]
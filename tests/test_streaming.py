@@ -0,0 +1,75 @@
+import pytest
+from datasets import Dataset
+from ragchat.cli.embed_answers_cli import iter_answers
+from ragchat.cli.embed_contexts_cli import iter_chunks
+from ragchat.data.streaming import count_list_items, filter_batches, iter_columns, rebatch, select_rows
+
+@pytest.fixture
+def split():
+    return Dataset.from_dict({
+        "chunks": [["أ", "ب"], [], ["ج"], ["د", "هـ", "و"], ["ز"]],
+        "question": [f"سؤال {i}" for i in range(5)],
+        "context": [f"سياق {i}" for i in range(5)],
+        "answers": [
+            {"text": ["جواب 0"]}, {"text": []}, {"text": ["جواب 2"]}, {"text": ["جواب 3", "آخر"]}, {"text": []},
+        ],
+    })
+
+def test_select_rows_whole_split_is_not_copied(split):
+    subset, offset = select_rows(split)
+    assert subset is split and offset == 0
+
+def test_select_rows_shards_cover_the_range(split):
+    shards = [select_rows(split, start=1, shard_index=k, num_shards=3) for k in range(3)]
+
+    assert [offset for _, offset in shards] == [1, 3, 4]
+    assert [s["question"] for s, _ in shards] == [["سؤال 1", "سؤال 2"], ["سؤال 3"], ["سؤال 4"]]
+    subset, offset = select_rows(split, start=3, stop=99)
+    assert offset == 3 and len(subset) == 2
+    with pytest.raises(ValueError):
+        select_rows(split, shard_index=2, num_shards=2)
+
+def test_iter_columns_skips_missing_columns(split):
+    batches = list(iter_columns(split, ["question", "missing"], read_batch=2))
+
+    assert [len(b["question"]) for b in batches] == [2, 2, 1]
+    assert set(batches[0]) == {"question"}
+
+def test_count_list_items(split):
+    assert count_list_items(split, "chunks", read_batch=2) == 7
+    assert count_list_items(split, "answers", field="text") == 4
+    assert count_list_items(split, "answers", field="text", rows_only=True) == 3
+
+def test_rebatch_and_filter_batches():
+    items = [(str(i), {"id": i}) for i in range(5)]
+    batches = list(rebatch(items, 2))
+    assert [texts for texts, _ in batches] == [["0", "1"], ["2", "3"], ["4"]]
+
+    dropped = []
+
+    def odd_only(texts, payloads):
+        kept = [k for k, p in enumerate(payloads) if p["id"] % 2]
+        return [texts[k] for k in kept], [payloads[k] for k in kept]
+
+    kept = list(filter_batches(iter(batches), odd_only, on_drop=dropped.append))
+
+    # the all-even last batch is not passed on
+    assert kept == [(["1"], [{"id": 1}]), (["3"], [{"id": 3}])]
+    assert sum(dropped) == 3
+
+def test_iter_chunks_keeps_absolute_example_ids(split):
+    subset, offset = select_rows(split, start=2)
+
+    items = list(iter_chunks(subset, offset, read_batch=2))
+
+    assert [text for text, _ in items] == ["ج", "د", "هـ", "و", "ز"]
+    assert [p["original_example_id"] for _, p in items] == [2, 3, 3, 3, 4]
+    assert items[1][1]["chunk_index"] == 0 and items[3][1]["chunk_index"] == 2
+    assert items[0][1]["answer_text"] == "جواب 2" and items[4][1]["answer_text"] is None
+    compact = dict(iter_chunks(subset, offset, compact=True))
+    assert "raw_context" not in compact["ج"] and compact["ج"]["doc_id"]
+
+def test_iter_answers_skips_rows_without_answers(split):
+    items = list(iter_answers(split, offset=10, read_batch=2))
+
+    assert [(text, p["original_example_id"]) for text, p in items] == [("جواب 0", 10), ("جواب 2", 12), ("جواب 3", 13)]